@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import './App.css';
 import 'bootstrap/dist/css/bootstrap.min.css';
 // Importing the speech recognition module		
@@ -16,6 +16,22 @@ function App() {
   const [error, setError] = useState('');
   const [imageSearchResults, setImageSearchResults] = useState([]);
   const [isListening, setIsListening] = useState(false);
+  // Keep the shown order up to date from the server's change stream instead of re-polling
+  const watchedOrderNo = orderStatus ? orderStatus.order_no : null;
+  useEffect(() => {
+    if (!watchedOrderNo || !window.EventSource) {
+      return undefined;
+    }
+    const source = new EventSource('http://localhost:5000/api/order-status/stream?orderNo=' + encodeURIComponent(watchedOrderNo));
+    source.addEventListener('order-update', (event) => {
+      const update = JSON.parse(event.data);
+      if (update.order) {
+        setOrderStatus(update.order);
+      }
+    });
+    return () => source.close();
+  }, [watchedOrderNo]);
+
   const handleSearch = () => {
     if (searchType === 'product' && !query) {
       alert('Please enter a search term for products.');
@@ -0,0 +1,86 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+ACCESS_LOG = 'logs/access.jsonl'
+
+# Keys of the JSON responses whose list holds the results
+RESULT_KEYS = ('search_results', 'suggestions', 'orders', 'functions')
+
+
+def normalize_params(args, body=None):
+    """Request parameters as logged: query arguments (sorted, whitespace collapsed) and the JSON body."""
+    params = {key: ' '.join(values[0].split()) if len(values) == 1 else [' '.join(value.split()) for value in values]
+              for key, values in sorted(args.lists())}
+    if body is not None:
+        params['body'] = body
+    return params
+
+
+def count_results(status, body):
+    """Number of results in a JSON response body (0 for errors)."""
+    if status >= 400 or body is None:
+        return 0
+    if isinstance(body, list):
+        return len(body)
+    if isinstance(body, dict):
+        for key in RESULT_KEYS:
+            if isinstance(body.get(key), list):
+                return len(body[key])
+    return 1
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def most_frequent(records, count, methods=('GET', 'POST')):
+    """The `count` most frequent distinct (method, path, params) requests of a log, most frequent first."""
+    frequency = Counter(json.dumps([record['method'], record['path'], record['params']], sort_keys=True)
+                        for record in records if record['method'] in methods and record['status'] < 500)
+    return [json.loads(key) for key, _ in frequency.most_common(count)]
+
+
+class AccessLog:
+    """Structured access log: one JSON record per request, appended to a JSONL file.
+
+    write() only queues the record; a daemon thread appends queued records in
+    batches, so requests never wait on the disk. Records are dropped (and
+    counted) when the queue is full, e.g. while the disk is stalled.
+    """
+
+    def __init__(self, path=ACCESS_LOG, max_queued=10000, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.records = queue.Queue(max_queued)
+        self.dropped = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, name='access-log-writer', daemon=True)
+        self.thread.start()
+
+    def write(self, record):
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            while True:
+                lines = [json.dumps(self.records.get(), ensure_ascii=False, default=str)]
+                deadline = time.monotonic() + self.flush_interval
+                # Batch whatever arrives within the flush interval into one write
+                while len(lines) < 1000:
+                    try:
+                        lines.append(json.dumps(self.records.get(timeout=max(deadline - time.monotonic(), 0)),
+                                                ensure_ascii=False, default=str))
+                    except queue.Empty:
+                        break
+                f.write('\n'.join(lines) + '\n')
+                f.flush()
@@ -1,30 +1,113 @@
 import os
-import cv2
 import numpy as np
 import pandas as pd
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, make_response, request, send_from_directory, stream_with_context
 from flask_cors import CORS
 from PIL import Image
 from io import BytesIO
-from sklearn.metrics.pairwise import cosine_similarity
 import requests
 import re
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-import speech_recognition as sr
-
-# Download necessary NLTK data
-import nltk
-nltk.download('punkt')
-nltk.download('stopwords')
+import time
+import heapq
+import importlib
+import functools
+import json
+import threading
+from collections import namedtuple
+from warmup import Subsystems
+from response_cache import ResponseCache
+from metrics import Metrics
+from profiler import SORT_KEYS, RequestProfiler
+from access_log import ACCESS_LOG, AccessLog, count_results, normalize_params
+from search_index import ensure_nltk_data, preprocess_text
+from catalog import ProductRecords, parse_categories
+from shared_catalog import SharedCatalog
+from recommendations import RECOMMENDATION_ORDERS, CategoryRecommendationIndex, recommendation_scores
+from order_store import OrderStore
+from ranking import SEARCH_RANKERS, BM25Ranker
+from semantic_index import SemanticIndex
+from suggest_index import PrefixSuggestIndex, normalize_query
+from intent_engine import IntentEngine
+from image_index import ImageDescriptorIndex, decode_image, describe_image, describe_image_file, match_descriptors
+from image_matcher import ImageMatchPool, match_names
+from download_images import load_manifest, product_ids
+from hot_reload import poll_for_changes
 
 app = Flask(__name__)
 CORS(app)
 
-# Load the products CSV and orders data
-products_df = pd.read_csv('data/amazon-products.csv')
-orders_df = pd.read_excel('data/orders_data.xlsx')
+# Image search cascade: number of images the signature prefilter passes on to ORB
+# verification (0 verifies every image) and an optional verification time budget
+app.config['IMAGE_SHORTLIST_SIZE'] = int(os.environ.get('IMAGE_SHORTLIST_SIZE', 100))
+app.config['IMAGE_VERIFY_BUDGET_MS'] = int(os.environ.get('IMAGE_VERIFY_BUDGET_MS', 0))
+# Worker processes used for ORB verification (0 runs it in the request thread), and how
+# many similar images end the verification early (0 checks the whole shortlist)
+app.config['IMAGE_MATCH_WORKERS'] = int(os.environ.get('IMAGE_MATCH_WORKERS', os.cpu_count() or 1))
+app.config['IMAGE_EARLY_STOP'] = int(os.environ.get('IMAGE_EARLY_STOP', 0))
+# How often (seconds) the app checks for a new image index generation written by image_index.py
+app.config['IMAGE_INDEX_POLL_INTERVAL'] = int(os.environ.get('IMAGE_INDEX_POLL_INTERVAL', 5))
+# Limits for uploaded images: request size (Flask answers 413 above it), decoded pixel
+# count, and the longest side the query image is shrunk to before ORB extraction
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+app.config['IMAGE_MAX_PIXELS'] = int(os.environ.get('IMAGE_MAX_PIXELS', 40_000_000))
+app.config['IMAGE_WORKING_SIZE'] = int(os.environ.get('IMAGE_WORKING_SIZE', 1024))
+# Most order numbers accepted by one /api/order-status/batch call, and how often
+# (seconds) /api/order-status/stream sends a keep-alive when nothing changes
+app.config['MAX_BATCH_ORDERS'] = int(os.environ.get('MAX_BATCH_ORDERS', 1000))
+app.config['ORDER_STREAM_KEEPALIVE'] = int(os.environ.get('ORDER_STREAM_KEEPALIVE', 15))
+# Ranker for /api/search: 'legacy' (shared token count), 'bm25', 'semantic' (title embeddings) or
+# 'hybrid' (embeddings blended with the token count), and whether BM25 also scores category names
+app.config['SEARCH_RANKER'] = os.environ.get('SEARCH_RANKER', 'legacy')
+app.config['SEARCH_BM25_CATEGORIES'] = os.environ.get('SEARCH_BM25_CATEGORIES', '0') == '1'
+# Weight of the embedding score in the hybrid ranker, and IVF partitions scanned per query
+app.config['SEMANTIC_WEIGHT'] = float(os.environ.get('SEMANTIC_WEIGHT', 0.5))
+app.config['SEMANTIC_NPROBE'] = int(os.environ.get('SEMANTIC_NPROBE', 8))
+# Default order of category recommendations: 'sentiment', 'rating' or 'blended'
+app.config['RECOMMENDATION_ORDER'] = os.environ.get('RECOMMENDATION_ORDER', 'sentiment')
+# Response cache: most entries kept, and seconds an entry lives per endpoint (0 disables caching it)
+app.config['CACHE_MAX_ITEMS'] = int(os.environ.get('CACHE_MAX_ITEMS', 1024))
+app.config['CACHE_TTL_SEARCH'] = int(os.environ.get('CACHE_TTL_SEARCH', 300))
+app.config['CACHE_TTL_COMPARE'] = int(os.environ.get('CACHE_TTL_COMPARE', 300))
+app.config['CACHE_TTL_ORDER_STATUS'] = int(os.environ.get('CACHE_TTL_ORDER_STATUS', 30))
+# Products returned per name by /api/compare-products (best rated first)
+app.config['COMPARE_TOP_K'] = int(os.environ.get('COMPARE_TOP_K', 10))
+# Completions returned by /api/suggest unless a limit is given (at most SUGGEST_MAX_LIMIT), and
+# an optional JSON file of {query: times searched} that is suggested ahead of product titles
+app.config['SUGGEST_LIMIT'] = int(os.environ.get('SUGGEST_LIMIT', 8))
+app.config['SUGGEST_MAX_LIMIT'] = int(os.environ.get('SUGGEST_MAX_LIMIT', 20))
+app.config['POPULAR_QUERIES_PATH'] = os.environ.get('POPULAR_QUERIES_PATH', 'data/popular_queries.json')
+# FAQ replies for /api/intent, and the confidence (0-100) from which a query is answered
+# as an intent instead of being searched as a product
+app.config['INTENT_REPLIES_PATH'] = os.environ.get('INTENT_REPLIES_PATH', 'intent_replies.json')
+app.config['INTENT_THRESHOLD'] = int(os.environ.get('INTENT_THRESHOLD', 75))
+# Per-endpoint/per-stage latency metrics for /api/metrics and the Server-Timing header
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+# Profiling of a sampled fraction of requests (0 disables it), 'cprofile' or 'sample' (stack sampler),
+# and the window (seconds) /api/debug/profile reports over. Requests sending X-Profile: <PROFILE_TOKEN>
+# are always profiled, and only they can read the reports (without a token there are none).
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+app.config['PROFILE_MODE'] = os.environ.get('PROFILE_MODE', 'cprofile')
+app.config['PROFILE_WINDOW'] = int(os.environ.get('PROFILE_WINDOW', 600))
+app.config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN', '')
+# Structured access log (one JSON line per request) that benchmarks/replay.py re-issues
+app.config['ACCESS_LOG_ENABLED'] = os.environ.get('ACCESS_LOG_ENABLED', '0') == '1'
+app.config['ACCESS_LOG_PATH'] = os.environ.get('ACCESS_LOG_PATH', ACCESS_LOG)
+# Subsystems loaded in the background at startup, and reported by /api/ready; the
+# others load on their first request (e.g. WARM_UP=orders for an order-status worker).
+# The query encoder is warmed up by default only when the configured ranker uses it.
+default_warm_up = 'orders,intents,nltk,catalog,images,suggest' \
+    + (',semantic' if app.config['SEARCH_RANKER'] in ('semantic', 'hybrid') else '')
+app.config['WARM_UP'] = [name for name in os.environ.get('WARM_UP', default_warm_up).split(',') if name]
+
+# Request counters and latency histograms (see metrics.py); stages are timed with `with metrics.span(...)`
+metrics = Metrics()
+
+# Parts of the app loaded on first use, or ahead of it by the warm-up thread (see warmup.py)
+subsystems = Subsystems(span=metrics.span)
+
+# int8 title embeddings written by semantic_index.py; without a current index the
+# semantic and hybrid rankers fall back to the legacy one
+semantic_index = SemanticIndex()
 
 # Directory where images are downloaded
 image_dir = "data/downloaded_images"
@@ -33,6 +116,325 @@ image_dir = "data/downloaded_images"
 if not os.path.exists(image_dir):
     os.makedirs(image_dir)
 
+# Thumbnails written by download_images.py, served by /api/thumbnails
+thumbnail_dir = os.path.join(image_dir, 'thumbnails')
+
+# Everything the catalog endpoints read: one catalog generation, what is derived from it, and
+# the image index it is matched against. bm25_ranker, suggest_index and the image fields stay
+# None until their subsystem loads.
+CatalogState = namedtuple('CatalogState', [
+    'generation', 'products_df', 'product_records', 'search_index', 'sentiment_scores', 'rating_values',
+    'category_index', 'semantic_ready', 'product_image_names', 'product_thumbnail_urls',
+    'bm25_ranker', 'suggest_index', 'image_index', 'product_image_rows', 'image_candidate_positions',
+], defaults=[None] * 5)
+
+# The current CatalogState (None until the catalog loads). A new state is built on the side and
+# swapped in with one assignment; writers hold catalog_lock so they never drop each other's fields.
+catalog = None
+catalog_lock = threading.Lock()
+
+# The catalog state a request works with. It is read once, on first use, so the cache key and
+# the response of a request always come from the same generation.
+def current_catalog():
+    if 'catalog' not in g:
+        g.catalog = catalog
+    return g.catalog
+
+# Build everything derived from a catalog generation, keeping what `previous` had loaded
+def build_catalog_state(generation, products_df, search_index, previous=None):
+    # Image file name of each product, from the download manifest (see download_images.py).
+    # Products missing from it fall back to the old title-based file names.
+    image_manifest = load_manifest(image_dir)
+    product_image_names = [
+        image_manifest[product_id]['file'] if product_id in image_manifest else f"{str(title)[:50].replace(' ', '_')}.jpg"
+        for product_id, title in zip(product_ids(products_df), products_df['title'])
+    ]
+    thumbnail_files = set(os.listdir(thumbnail_dir)) if os.path.isdir(thumbnail_dir) else set()
+
+    semantic_ready = semantic_index.is_current(products_df['title'])
+    if semantic_index.manifest is not None and not semantic_ready:
+        print("Semantic index is stale, run semantic_index.py to rebuild it. Falling back to lexical search.")
+
+    state = CatalogState(
+        generation=generation,
+        products_df=products_df,
+        # Slim per-product records that result dicts are built from
+        product_records=ProductRecords(products_df),
+        # Title search index saved with the catalog generation, instead of scanning every product per request
+        search_index=search_index,
+        # Sentiment scores every ranker uses to break ties, and ratings that order comparisons
+        sentiment_scores=products_df['sentiment_score'].to_numpy(),
+        rating_values=products_df['rating_value'].to_numpy(),
+        # Pre-sorted top products per category, so recommendations are a dictionary lookup
+        category_index=CategoryRecommendationIndex(products_df['category_list'], products_df['sentiment_score'],
+                                                   products_df['rating_value']),
+        semantic_ready=semantic_ready,
+        product_image_names=product_image_names,
+        product_thumbnail_urls=[
+            f"/api/thumbnails/{product_image_name}" if product_image_name in thumbnail_files else None
+            for product_image_name in product_image_names
+        ],
+    )
+    if previous is not None and previous.bm25_ranker is not None:
+        state = state._replace(bm25_ranker=build_bm25_ranker(products_df))
+    if previous is not None and previous.suggest_index is not None:
+        state = state._replace(suggest_index=build_suggest_index(products_df))
+    if previous is not None and previous.image_index is not None:
+        state = state._replace(**build_image_state(product_image_names, previous.image_index))
+    return state
+
+# BM25 weights over titles (and optionally categories) for the bm25 ranker
+def build_bm25_ranker(products_df):
+    return BM25Ranker(products_df['title_tokens'],
+                      products_df['category_list'] if app.config['SEARCH_BM25_CATEGORIES'] else None)
+
+# Prefix index of titles and popular queries for /api/suggest, titles weighted by blended rating and sentiment
+def build_suggest_index(products_df):
+    popular_queries = None
+    if os.path.exists(app.config['POPULAR_QUERIES_PATH']):
+        with open(app.config['POPULAR_QUERIES_PATH']) as f:
+            popular_queries = json.load(f)
+    weights = recommendation_scores(products_df['sentiment_score'], products_df['rating_value'])['blended']
+    return PrefixSuggestIndex(products_df['title'].array, weights, popular_queries)
+
+# An image index, the products that share each of its images, and the positions worth matching against
+def build_image_state(product_image_names, image_index):
+    product_image_rows = {}
+    for row_id, product_image_name in enumerate(product_image_names):
+        if product_image_name in image_index:
+            product_image_rows.setdefault(product_image_name, []).append(row_id)
+    return {
+        'image_index': image_index,
+        'product_image_rows': product_image_rows,
+        'image_candidate_positions': sorted(image_index.positions[name] for name in product_image_rows),
+    }
+
+def swap_catalog(products_df, search_index, generation):
+    global catalog
+    with catalog_lock:
+        catalog = build_catalog_state(generation, products_df, search_index, catalog)
+    response_cache.invalidate('search', 'compare-products')
+    print(f"Serving catalog generation {generation} ({len(products_df)} products)")
+
+# Enriched catalog and title search index that every worker process maps from shared files (see shared_catalog.py)
+shared_catalog = SharedCatalog()
+
+# NLTK data is checked on disk; the tokenizer and stopword list are loaded by a first call
+def load_nltk():
+    ensure_nltk_data()
+    preprocess_text('warm up')
+
+# Attach to the shared catalog and follow the new generations build_catalog.py publishes.
+# Publishing it from the raw CSV tokenizes titles and scores reviews, which needs the NLTK data.
+def load_catalog_state():
+    subsystems['nltk'].ensure()
+    shared_catalog.load()
+    swap_catalog(shared_catalog.products_df, shared_catalog.search_index, shared_catalog.generation)
+    shared_catalog.watch(swap_catalog)
+
+# Orders indexed by order number, served from a Parquet cache and hot-reloaded when the spreadsheet changes
+def load_orders():
+    global order_store
+    order_store = OrderStore()
+    order_store.watch()
+
+# FAQ intents matched fuzzily, hot-reloaded when intent_replies.json changes
+def load_intents():
+    global intent_engine
+    intent_engine = IntentEngine(app.config['INTENT_REPLIES_PATH'], app.config['INTENT_THRESHOLD'])
+    intent_engine.watch()
+
+def load_bm25():
+    global catalog
+    subsystems['catalog'].ensure()
+    with catalog_lock:
+        catalog = catalog._replace(bm25_ranker=build_bm25_ranker(catalog.products_df))
+
+def load_suggest():
+    global catalog
+    subsystems['catalog'].ensure()
+    with catalog_lock:
+        catalog = catalog._replace(suggest_index=build_suggest_index(catalog.products_df))
+
+# Open the ORB descriptor index read-only and follow the generations `python image_index.py`
+# writes. Only it writes the index, so workers starting together never race to describe the same images.
+def load_images():
+    subsystems['catalog'].ensure()
+    image_index = ImageDescriptorIndex()
+    stale = image_index.stale(image_dir)
+    if stale:
+        print(f"{stale} images changed since the image index was built, run image_index.py to update it.")
+    swap_image_index(image_index)
+    poll_for_changes('image-index-watcher', app.config['IMAGE_INDEX_POLL_INTERVAL'], reload_image_index,
+                     'reload the image index')
+
+def swap_image_index(image_index):
+    global catalog
+    with catalog_lock:
+        catalog = catalog._replace(**build_image_state(catalog.product_image_names, image_index))
+
+# Open a newer generation of the image index on the side, then swap it in with the state derived from it
+def reload_image_index():
+    current = catalog.image_index
+    if not current.outdated():
+        return
+    image_index = ImageDescriptorIndex(current.index_dir)
+    if image_index.generation > current.generation:
+        swap_image_index(image_index)
+        print(f"Serving image index generation {image_index.generation} ({len(image_index)} images)")
+
+# Query encoder of the semantic and hybrid rankers (torch and a transformers model), when there is an index
+def load_semantic():
+    if semantic_index.manifest is not None:
+        semantic_index.load_encoder()
+
+# SpeechRecognition is only imported by workers that serve voice search
+def load_speech():
+    importlib.import_module('speech_recognition')
+
+subsystems.register('nltk', load_nltk)
+subsystems.register('catalog', load_catalog_state)
+subsystems.register('orders', load_orders)
+subsystems.register('intents', load_intents)
+subsystems.register('bm25', load_bm25)
+subsystems.register('suggest', load_suggest)
+subsystems.register('images', load_images)
+subsystems.register('semantic', load_semantic)
+subsystems.register('speech', load_speech)
+
+# Worker processes for ORB verification, started on the first image search
+image_match_pool = ImageMatchPool(app.config['IMAGE_MATCH_WORKERS']) if app.config['IMAGE_MATCH_WORKERS'] else None
+
+# Time every request, and report its stages in a Server-Timing header
+@app.before_request
+def start_request_timer():
+    if app.config['METRICS_ENABLED']:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request.environ['metrics.timer'] = metrics.start(endpoint, request.method)
+
+@app.after_request
+def finish_request_timer(response):
+    timing = request.environ.pop('metrics.timer', None)
+    if timing is not None:
+        timer, token = timing
+        total = metrics.finish(timer, token, response.status_code)
+        response.headers['Server-Timing'] = timer.server_timing(total)
+    return response
+
+# Per-endpoint profiles of sampled requests (see profiler.py), served by /api/debug/profile
+profiler = RequestProfiler(app.config['PROFILE_SAMPLE_RATE'], app.config['PROFILE_MODE'], app.config['PROFILE_WINDOW'],
+                           token=app.config['PROFILE_TOKEN'])
+
+@app.before_request
+def start_profile():
+    if profiler.enabled and profiler.wants(request.headers.get('X-Profile')):
+        profile = profiler.start()
+        if profile is not None:
+            request.environ['profiler.profile'] = profile
+
+# Teardown runs even when the request failed or an after_request hook raised
+@app.teardown_request
+def finish_profile(error=None):
+    profile = request.environ.pop('profiler.profile', None)
+    if profile is not None:
+        profiler.finish(request.url_rule.rule if request.url_rule is not None else 'unmatched', profile)
+
+# Request records written by a background thread (see access_log.py)
+access_log = AccessLog(app.config['ACCESS_LOG_PATH']) if app.config['ACCESS_LOG_ENABLED'] else None
+
+@app.before_request
+def start_access_log():
+    if access_log is not None:
+        request.environ['access_log.start'] = time.perf_counter()
+
+@app.after_request
+def write_access_log(response):
+    start = request.environ.pop('access_log.start', None)
+    if start is None:
+        return response
+    latency_ms = (time.perf_counter() - start) * 1000
+    params = normalize_params(request.args, request.get_json(silent=True) if request.is_json else None)
+    if request.mimetype == 'multipart/form-data':
+        params['upload_bytes'] = request.content_length
+    body = None
+    if response.mimetype == 'application/json' and not response.is_streamed:
+        body = response.get_json(silent=True)
+    access_log.write({
+        'ts': time.time(),
+        'method': request.method,
+        'endpoint': request.url_rule.rule if request.url_rule is not None else 'unmatched',
+        'path': request.path,
+        'params': params,
+        'status': response.status_code,
+        'latency_ms': round(latency_ms, 3),
+        'results': count_results(response.status_code, body),
+    })
+    return response
+
+# Serialized responses of the read-only endpoints, keyed by their normalized request (see response_cache.py)
+response_cache = ResponseCache(app.config['CACHE_MAX_ITEMS'], {
+    'search': app.config['CACHE_TTL_SEARCH'],
+    'compare-products': app.config['CACHE_TTL_COMPARE'],
+    'order-status': app.config['CACHE_TTL_ORDER_STATUS'],
+})
+
+# Decorator that answers from the response cache. make_key() returns the normalized request,
+# or None for requests that should not be cached. Responses carry an ETag, so clients
+# revalidating with If-None-Match get an empty 304 when nothing changed.
+def cached(endpoint, make_key):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with metrics.span('cache'):
+                key = make_key()
+                entry = response_cache.get(endpoint, key) if key is not None else None
+            hit = entry is not None
+            if not hit:
+                response = make_response(view(*args, **kwargs))
+                if key is None or response.status_code not in (200, 404) or response.mimetype != 'application/json':
+                    return response
+                entry = response_cache.put(endpoint, key, response.get_data(), response.status_code)
+
+            response = Response(entry.body, status=entry.status, mimetype='application/json')
+            response.set_etag(entry.etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+# Searches are keyed by the lowercased query as searched. Its token set is not enough: phrase
+# matches depend on the exact wording ("usb" matches "USB-C Cable", "the usb" does not), and
+# whitespace is kept because both phrase and exact-title matches are sensitive to it.
+def search_cache_key():
+    query = request.args.get('query', '').strip()
+    if not query:
+        return None
+    ranker = requested_ranker()
+    return (current_catalog().generation, query.lower(), ranker,
+            request.args.get('recommend_by', app.config['RECOMMENDATION_ORDER']))
+
+def compare_cache_key():
+    product_names = (request.get_json(silent=True) or {}).get('products')
+    if not isinstance(product_names, list) or not all(isinstance(name, str) for name in product_names):
+        return None
+    return (current_catalog().generation, tuple(name.lower() for name in product_names))
+
+def order_status_cache_key():
+    return (order_store.generation, request.args.get('orderNo'))
+
+# Ranker for a search: the configured one unless the request asks for another. What it needs is
+# loaded here; BM25 weights before the request reads its catalog snapshot, so that snapshot includes them.
+def requested_ranker():
+    ranker = request.args.get('ranker', app.config['SEARCH_RANKER'])
+    if ranker not in SEARCH_RANKERS:
+        ranker = 'legacy'
+    if ranker == 'bm25':
+        subsystems['bm25'].ensure()
+    elif ranker in ('semantic', 'hybrid'):
+        subsystems['semantic'].ensure()
+    return ranker
+
 # Function to clean the data before sending to the frontend
 def cleanData(data):
     cleaned_data = []
@@ -57,6 +459,8 @@ def resize_image(image_path, size=(224, 224)):
 
 # Function to extract features from an image using ORB
 def extract_features(image_path):
+    import cv2
+
     image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
     if image is None:
         raise ValueError(f"Failed to load image at {image_path}")
@@ -66,55 +470,40 @@ def extract_features(image_path):
 
 # Function to compute similarity between two images
 def compare_images(image_path1, image_path2):
-    img1 = cv2.imread(image_path1, cv2.IMREAD_GRAYSCALE)
-    img2 = cv2.imread(image_path2, cv2.IMREAD_GRAYSCALE)
-
-    orb = cv2.ORB_create()
-    kp1, des1 = orb.detectAndCompute(img1, None)
-    kp2, des2 = orb.detectAndCompute(img2, None)
-
-    if des1 is None or des2 is None:
-        return 0
-
-    index_params = dict(algorithm=6, table_number=6, key_size=12, multi_probe_level=1)
-    search_params = dict(checks=50)
-
-    flann = cv2.FlannBasedMatcher(index_params, search_params)
-    matches = flann.knnMatch(des1, des2, k=2)
-
-    good_matches = []
-    for match_pair in matches:
-        if len(match_pair) == 2:  # Ensure there are at least two matches to unpack
-            m, n = match_pair
-            if m.distance < 0.7 * n.distance:
-                good_matches.append(m)
-
-    return len(good_matches)
-
-# Sentiment analysis using VADER
-sid = SentimentIntensityAnalyzer()
-
-def compute_sentiment_score(review_text):
-    if isinstance(review_text, str) and review_text.strip():
-        # Split the reviews if there are multiple, separated by commas
-        reviews = review_text.split(",") if "," in review_text else [review_text]
-        
-        # Calculate sentiment for each review
-        sentiment_scores = [sid.polarity_scores(review)['compound'] for review in reviews]
-        
-        # Calculate the average sentiment score
-        average_sentiment_score = np.mean(sentiment_scores)
-        return average_sentiment_score
-    else:
-        return 0.0  # Return a neutral sentiment score for invalid or empty text
-
-
-# Preprocess text (remove stopwords, tokenize, and lower case)
-def preprocess_text(text):
-    tokens = word_tokenize(text.lower())
-    stop_words = set(stopwords.words('english'))
-    tokens = [word for word in tokens if word not in stop_words and word.isalnum()]
-    return tokens
+    des1 = describe_image_file(image_path1)
+    des2 = describe_image_file(image_path2)
+    return match_descriptors(des1, des2)
+
+# Function to match a query image against the catalog: shortlist by global signature, then verify with ORB
+def find_similar_products(state, query_descriptors, shortlist_size=0, verify_budget_ms=0, early_stop=0):
+    """Return (row_id, similarity) pairs above the match threshold, best first."""
+    image_index = state.image_index
+    with metrics.span('shortlist'):
+        if shortlist_size:
+            positions = image_index.shortlist(query_descriptors, state.image_candidate_positions, shortlist_size)
+        else:
+            positions = state.image_candidate_positions
+    names = [image_index.entries[position] for position in positions]
+    deadline = time.perf_counter() + verify_budget_ms / 1000 if verify_budget_ms else None
+
+    # FLANN matching of the ORB descriptors
+    with metrics.span('match'):
+        if image_match_pool is not None:
+            image_matches = image_match_pool.match(image_index, query_descriptors, names, enough=early_stop, deadline=deadline)
+        else:
+            image_matches = match_names(image_index, query_descriptors, names, enough=early_stop, deadline=deadline)
+
+    matches = []
+    for product_image_name, similarity in image_matches:
+        matches.extend((row_id, similarity) for row_id in state.product_image_rows[product_image_name])
+
+    # Same order as a full scan: catalog order, then by similarity
+    matches.sort()
+    return sorted(matches, key=lambda match: match[1], reverse=True)
+
+# Function to get the local thumbnail URL of a product (None when it has no downloaded image)
+def get_thumbnail_url(state, row_id):
+    return state.product_thumbnail_urls[row_id]
 
 # Function to handle missing or invalid image URLs
 def get_image_url(image_url):
@@ -122,23 +511,32 @@ def get_image_url(image_url):
         return 'default_image.jpg'  # A placeholder image URL if invalid or NaN
     return image_url
 
-def get_product_data(product_names):
+def get_product_data(state, product_names, top_k=10):
+    """Products whose title has a requested name as a word: the top_k best rated per name, each product once."""
+    matched_names = {}
+    for product_name in dict.fromkeys(name.lower() for name in product_names):
+        # Case-insensitive word lookup in the prebuilt title index instead of scanning every title
+        matching_rows = np.asarray(state.search_index.title_word_matches(product_name), dtype=np.int64)
+
+        # Best rated first (unrated last), ties in catalog order
+        ratings = np.nan_to_num(state.rating_values[matching_rows], nan=-np.inf)
+        for row_id in matching_rows[np.argsort(-ratings, kind='stable')[:top_k]].tolist():
+            # A product matched by several names is listed once
+            matched_names.setdefault(row_id, []).append(product_name)
+
     comparison_data = []
-    for product_name in product_names:
-        # Use a case-insensitive match to find all relevant products
-        matching_products = products_df[products_df['title'].str.lower().apply(lambda x: product_name.lower() in x.split())]
-        
-        # Iterate through the matching products DataFrame
-        for _, row in matching_products.iterrows():
-            comparison_data.append({
-                'name': row['title'],  # Use the product title from the row
-                'price': row['initial_price'],
-                'rating': row['rating'],
-                'reviews': row['top_review'],
-                'url': row['url'],
-                'image_url': get_image_url(row['image_url']),
-                'availability': row['availability']
-            })
+    for row_id, names in matched_names.items():
+        row = state.product_records[row_id]
+        comparison_data.append({
+            'name': row.title,  # Use the product title from the row
+            'price': row.initial_price,
+            'rating': row.rating,
+            'reviews': row.top_review,
+            'url': row.url,
+            'image_url': get_image_url(row.image_url),
+            'availability': row.availability,
+            'matched_names': names
+        })
     return comparison_data
 
 
@@ -146,12 +544,16 @@ def get_product_data(product_names):
 
 # Route to handle product comparison
 @app.route('/api/compare-products', methods=['POST'])
+@subsystems.require('catalog')
+@cached('compare-products', compare_cache_key)
 def compare_products():
     # Get product names from the frontend (in a JSON format)
-    product_names = request.json.get('products')
+    product_names = (request.get_json(silent=True) or {}).get('products')
+    if not isinstance(product_names, list) or not all(isinstance(name, str) for name in product_names):
+        return jsonify({'error': 'A list of product names is required'}), 400
     
     # Call the comparison function
-    comparison_data = get_product_data(product_names)
+    comparison_data = get_product_data(current_catalog(), product_names, app.config['COMPARE_TOP_K'])
     
     # Return the data as JSON response
     return jsonify(comparison_data)
@@ -159,48 +561,70 @@ def compare_products():
 
 # Route to handle image search
 @app.route('/api/image-search', methods=['POST'])
+@subsystems.require('catalog', 'images')
 def image_search():
     if 'image' not in request.files:
         return jsonify({"error": "No image file provided"}), 400
 
-    file = request.files['image']
-    img = Image.open(file.stream)
-    img.save("temp_image.jpg")
+    # Decode the upload in memory; concurrent requests never share a file on disk
+    data = request.files['image'].read()
+    try:
+        # Only the header is parsed here, so oversized images are rejected before decoding
+        width, height = Image.open(BytesIO(data)).size
+    except Image.DecompressionBombError:
+        return jsonify({"error": "Image is too large"}), 413
+    except OSError:
+        return jsonify({"error": "Invalid image file"}), 400
+    if width * height > app.config['IMAGE_MAX_PIXELS']:
+        return jsonify({"error": "Image is too large"}), 413
+
+    with metrics.span('decode'):
+        query_image = decode_image(data, app.config['IMAGE_WORKING_SIZE'])
+    if query_image is None:
+        return jsonify({"error": "Invalid image file"}), 400
+
+    # Describe the uploaded image once (ORB extraction), then match it against the cached catalog descriptors
+    with metrics.span('describe'):
+        query_descriptors = describe_image(query_image)
+    state = current_catalog()
+    matches = find_similar_products(state, query_descriptors, app.config['IMAGE_SHORTLIST_SIZE'],
+                                    app.config['IMAGE_VERIFY_BUDGET_MS'], app.config['IMAGE_EARLY_STOP'])
 
     matched_products = []
-
-    # Compare uploaded image with all downloaded product images
-    for index, row in products_df.iterrows():
-        product_image_name = f"{row['title'][:50].replace(' ', '_')}.jpg"
-        product_image_path = os.path.join(image_dir, product_image_name)
-        
-        if not os.path.exists(product_image_path):
-            continue
-        
-        similarity = compare_images("temp_image.jpg", product_image_path)
-
-        if similarity > 50:  # Threshold can be adjusted
+    with metrics.span('results'):
+        for row_id, similarity in matches[:5]:
+            row = state.product_records[row_id]
             matched_products.append({
-                'title': row['title'],
-                'url': row['url'],
-                'initial_price':row['initial_price'],
-                'top_review': row['top_review'],
-                'image_url': get_image_url(row['image_url']),  # Handle image URL errors
-                'sentiment_score': row.get('sentiment_score', 0), 
+                'title': row.title,
+                'url': row.url,
+                'initial_price':row.initial_price,
+                'top_review': row.top_review,
+                'image_url': get_image_url(row.image_url),  # Handle image URL errors
+                'thumbnail_url': get_thumbnail_url(state, row_id),
+                'sentiment_score': row.sentiment_score, 
                 'similarity_score': similarity
             })
 
-    matched_products = sorted(matched_products, key=lambda x: x['similarity_score'], reverse=True)
-
     if matched_products:
-        return jsonify({'search_results': matched_products[:5]})
+        with metrics.span('serialize'):
+            return jsonify({'search_results': matched_products})
     
     return jsonify({'error': 'No matching products found'}), 404
 
 
+# Route to serve pre-generated product thumbnails from the local image store
+@app.route('/api/thumbnails/<path:file_name>', methods=['GET'])
+def get_thumbnail(file_name):
+    # Files are named by content hash, so they never change and can be cached for long
+    return send_from_directory(os.path.abspath(thumbnail_dir), file_name, max_age=30 * 24 * 3600)
+
+
 # Route for voice-based product search
 @app.route('/api/voice-search', methods=['POST'])
+@subsystems.require('speech')
 def voice_search():
+    import speech_recognition as sr
+
     recognizer = sr.Recognizer()
     audio_file = request.files.get('audio')
 
@@ -222,139 +646,275 @@ def voice_search():
     except sr.RequestError:
         return jsonify({'error': 'Error with the recognition service'}), 500
 
+# Function to rank the products matching a search, best first
+def rank_products(state, query, processed_query, ranker='legacy', k=5):
+    """Return up to k (row_id, match_score, relevance_score) tuples.
+
+    The legacy ranker orders by the number of shared title tokens, then by
+    sentiment, and has no relevance score. BM25 falls back to it when no
+    title term matches (e.g. a stopword-only phrase). The hybrid ranker
+    scores the lexical candidates plus the nearest titles by embedding.
+    """
+    query_tokens = set(processed_query)
+
+    title_tokens = state.products_df['title_tokens']
+    sentiment_scores = state.sentiment_scores
+
+    def shared_tokens(row_id):
+        return len(query_tokens.intersection(title_tokens.iat[row_id]))
+
+    if ranker == 'bm25':
+        ranked = state.bm25_ranker.top_k(processed_query, k, sentiment_scores)
+        if ranked:
+            return [(row_id, shared_tokens(row_id), score) for row_id, score in ranked]
+
+    if ranker == 'semantic' and state.semantic_ready:
+        return [(row_id, shared_tokens(row_id), score)
+                for row_id, score in semantic_index.search(query, k, app.config['SEMANTIC_NPROBE'])]
+
+    candidates = state.search_index.search(query, processed_query)
+    if ranker == 'hybrid' and state.semantic_ready:
+        neighbours = semantic_index.search(query, max(k, 50), app.config['SEMANTIC_NPROBE'])
+        row_ids = np.array(sorted(set(candidates).union(row_id for row_id, _ in neighbours)), dtype=np.int64)
+        if len(row_ids) == 0:
+            return []
+        # Token counts are only computed for the embedding neighbours the lexical search did not find
+        lexical = np.array([candidates[row_id] if row_id in candidates else shared_tokens(row_id)
+                            for row_id in row_ids.tolist()], dtype=np.float64)
+        weight = app.config['SEMANTIC_WEIGHT']
+        blended = weight * semantic_index.scores(query, row_ids) \
+            + (1 - weight) * np.minimum(lexical / max(len(query_tokens), 1), 1)
+        order = np.lexsort((row_ids, -sentiment_scores[row_ids], -blended))[:k]
+        return [(int(row_ids[i]), int(lexical[i]), float(blended[i])) for i in order]
+
+    # nlargest keeps catalog order among ties, like a stable sort would
+    ranked = heapq.nlargest(k, candidates.items(), key=lambda item: (item[1], sentiment_scores[item[0]]))
+    return [(row_id, match_score, None) for row_id, match_score in ranked]
+
+# Function to build the search result of one product
+def get_search_result(state, row_id, match_score, relevance_score=None):
+    row = state.product_records[row_id]
+    result = {
+        'title': row.title,
+        'url': row.url,
+        'initial_price':row.initial_price,
+        'image_url': get_image_url(row.image_url),  # Handle image URL errors
+        'thumbnail_url': get_thumbnail_url(state, row_id),
+        'sentiment_score': row.sentiment_score,  # Precomputed by the catalog build
+        'match_score': match_score,
+        'rating': row.rating,
+        'top_review': row.top_review,
+        'category': row.categories,
+    }
+    if relevance_score is not None:
+        result['relevance_score'] = relevance_score
+    return result
+
+# Route to answer a chat message from the FAQ intents; 'intent' is null when the message
+# matches no intent confidently enough and should be searched as a product instead
+@app.route('/api/intent', methods=['GET'])
+@subsystems.require('intents')
+def match_intent():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter is required'}), 400
+    match = intent_engine.match(query)
+    return jsonify({'query': query, 'intent': match.intent, 'reply': match.reply, 'score': match.score,
+                    'threshold': intent_engine.threshold})
+
+# Route to complete a partly typed search query (typeahead)
+@app.route('/api/suggest', methods=['GET'])
+@subsystems.require('catalog', 'suggest')
+def suggest():
+    prefix = normalize_query(request.args.get('q', ''))
+    limit = request.args.get('limit', app.config['SUGGEST_LIMIT'], type=int)
+    limit = min(max(limit, 1), app.config['SUGGEST_MAX_LIMIT'])
+    suggestions = current_catalog().suggest_index.complete(prefix, limit) if prefix else []
+    return jsonify({'query': prefix, 'suggestions': suggestions})
+
 # Route to search for products based on the query
 @app.route('/api/search', methods=['GET'])
+@subsystems.require('nltk', 'catalog')
+@cached('search', search_cache_key)
 def search_products():
     query = request.args.get('query', '').strip()
 
     if not query:
         return jsonify({'error': 'Query parameter is required'}), 400
 
-    # Preprocess the search query
-    processed_query = preprocess_text(query)
-    matched_products = []
-
-    # Search for matching products based on query
-    for index, row in products_df.iterrows():
-        product_title = row['title']
-        review_text = row['top_review']
-        
-        # Compute sentiment score
-        sentiment_score = compute_sentiment_score(review_text)
-        processed_title = preprocess_text(product_title)
-        matching_tokens = set(processed_query).intersection(set(processed_title))
-        match_score = len(matching_tokens)
-
-        # Exact match check
-        if query.lower() == product_title.lower():
-            matched_products = [{
-                'title': row['title'],
-                'url': row['url'],
-                'initial_price':row['initial_price'],
-                'image_url': get_image_url(row['image_url']),  # Handle image URL errors
-                'sentiment_score': sentiment_score,
-                'match_score': match_score,
-                'rating': row['rating'],
-                'top_review': row['top_review'],
-                'category': row['categories']
-            }]
-            break
-
-        # Partial or keyword match check
-        if match_score > 0 or re.search(r'\b' + re.escape(query.lower()) + r'\b', product_title.lower()):
-            matched_products.append({
-                'title': row['title'],
-                'url': row['url'],
-                'initial_price':row['initial_price'],
-                'image_url': get_image_url(row['image_url']),  # Handle image URL errors
-                'sentiment_score': sentiment_score,
-                'match_score': match_score,
-                'rating': row['rating'],
-                'top_review': row['top_review'],
-                'category': row['categories'],
-            })
-
-    # If only one product is found and it matches exactly
-    if matched_products and len(matched_products) == 1 and matched_products[0]['title'].lower() == query.lower():
-        return jsonify(matched_products)
+    ranker = requested_ranker()
+    state = current_catalog()
 
-    # Sort products by match score and sentiment score
-    matched_products = sorted(matched_products, key=lambda x: (x['match_score'], x['sentiment_score']), reverse=True)
+    # Preprocess the search query
+    with metrics.span('tokenize'):
+        processed_query = preprocess_text(query)
+
+    # Exact match check: a product titled exactly like the query is returned on its own
+    with metrics.span('exact_match'):
+        exact_row_id = state.search_index.exact_match(query)
+    if exact_row_id is not None:
+        match_score = state.search_index.match_scores(processed_query).get(exact_row_id, 0)
+        with metrics.span('serialize'):
+            return jsonify([get_search_result(state, exact_row_id, match_score)])
+
+    # Partial or keyword match check, ranked by the configured ranker (overridable per request)
+    with metrics.span('rank'):
+        ranked = rank_products(state, query, processed_query, ranker)
+    with metrics.span('results'):
+        matched_products = [get_search_result(state, row_id, match_score, relevance_score)
+                            for row_id, match_score, relevance_score in ranked]
 
     if matched_products:
         # Extract the category from the first matched product
         top_category = matched_products[0].get('category', '')
         
-        # Get product recommendations from the matched category, sorted by sentiment score
-        category_recommendations = get_category_recommendations(top_category)
-
-        return jsonify({
-            'search_results': matched_products[:5],  # Top 5 search results
-            'category_recommendations': category_recommendations  # Category-based recommendations
-        })
+        # Get product recommendations from the matched category, sorted by sentiment score unless asked otherwise
+        order = request.args.get('recommend_by', app.config['RECOMMENDATION_ORDER'])
+        if order not in RECOMMENDATION_ORDERS:
+            order = 'sentiment'
+        with metrics.span('recommendations'):
+            category_recommendations = get_category_recommendations(state, top_category, order)
+
+        with metrics.span('serialize'):
+            return jsonify({
+                'search_results': matched_products,  # Top 5 search results
+                'category_recommendations': category_recommendations  # Category-based recommendations
+            })
 
     return jsonify({'error': 'No products found'}), 404
-def get_category_recommendations(category):
+def get_category_recommendations(state, category, order='sentiment'):
 
-    """Get recommended products from the same category, sorted by sentiment score"""
+    """Get recommended products from the same category, sorted by sentiment score (or rating/blended)"""
 
     category_recommendations = []
 
-    
-
-    # Find products in the same category as the search result
-
-    for index, row in products_df.iterrows():
-
-        product_category = row['categories']
-
-        if category.lower() in product_category.lower():
-
-            sentiment_score = compute_sentiment_score(row['top_review'])
-
-            category_recommendations.append({
-
-                'title': row['title'],
-
-                'url': row['url'],
-                'initial_price':row['initial_price'],
-
-                'image_url': row['image_url'],
-
-                'sentiment_score': sentiment_score,
-
-                'rating': row['rating'],
-
-                'category': row['categories']
-
-            })
-
-
-
-    # Sort recommendations by sentiment score (descending order)
-
-    category_recommendations = sorted(category_recommendations, key=lambda x: x['sentiment_score'], reverse=True)
-
-
+    # Top products of the search result's category path, pre-sorted at load time
+    for row_id in state.category_index.recommend(parse_categories(category), order):
+        row = state.product_records[row_id]
+        category_recommendations.append({
+            'title': row.title,
+            'url': row.url,
+            'initial_price':row.initial_price,
+            'image_url': row.image_url,
+            'thumbnail_url': get_thumbnail_url(state, row_id),
+            'sentiment_score': row.sentiment_score,
+            'rating': row.rating,
+            'category': row.categories
+        })
 
-    return category_recommendations[:5]  # Return top 5 recommendations
+    return category_recommendations  # Return top 5 recommendations
 
 # Route to check the status of an order
 @app.route('/api/order-status', methods=['GET'])
+@subsystems.require('orders')
+@cached('order-status', order_status_cache_key)
 def get_order_status():
     order_no = request.args.get('orderNo')  # Use 'orderNo' from the query parameter
 
     if not order_no:
         return jsonify({'error': 'Order ID is required'}), 400
 
-    order_status = orders_df[orders_df['order_no'] == order_no]
+    order_details = order_store.get(order_no)
 
-    if not order_status.empty:
-        order_details = order_status.iloc[0].to_dict()
-        order_details = {key: (None if value is pd.NA or pd.isna(value) else value) for key, value in order_details.items()}
+    if order_details is not None:
         return jsonify(order_details)
     else:
         return jsonify({'error': 'Order not found'}), 404
 
+# Route to check the status of many orders in one round trip
+@app.route('/api/order-status/batch', methods=['POST'])
+@subsystems.require('orders')
+def get_order_status_batch():
+    order_nos = (request.get_json(silent=True) or {}).get('orderNos')
+
+    if not isinstance(order_nos, list) or not order_nos:
+        return jsonify({'error': 'A list of order numbers is required'}), 400
+    if len(order_nos) > app.config['MAX_BATCH_ORDERS']:
+        return jsonify({'error': f"At most {app.config['MAX_BATCH_ORDERS']} order numbers per request"}), 400
+
+    found, missing = order_store.get_many([str(order_no) for order_no in order_nos])
+    return jsonify({'orders': found, 'missing': missing})
+
+# Route to subscribe to status changes of orders (Server-Sent Events), instead of polling
+@app.route('/api/order-status/stream', methods=['GET'])
+@subsystems.require('orders')
+def stream_order_status():
+    order_nos = [order_no for value in request.args.getlist('orderNo') for order_no in value.split(',') if order_no]
+
+    if not order_nos:
+        return jsonify({'error': 'Order ID is required'}), 400
+
+    def event(name, data):
+        return f"event: {name}\ndata: {app.json.dumps(data)}\n\n"
+
+    def events():
+        generation = order_store.generation
+        last_seen, missing = order_store.get_many(order_nos)
+        yield event('snapshot', {'orders': last_seen, 'missing': missing})
+
+        while True:
+            new_generation = order_store.wait_for_change(generation, timeout=app.config['ORDER_STREAM_KEEPALIVE'])
+            if new_generation == generation:
+                yield ": keep-alive\n\n"
+                continue
+            generation = new_generation
+
+            # Push only the orders whose details changed in this reload
+            current, _ = order_store.get_many(order_nos)
+            for order_no in order_nos:
+                if current.get(order_no) != last_seen.get(order_no):
+                    yield event('order-update', {'order_no': order_no, 'order': current.get(order_no)})
+            last_seen = current
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Route to report which subsystems are loaded; 503 until the ones in WARM_UP are warm
+@app.route('/api/ready', methods=['GET'])
+def readiness():
+    status = subsystems.status()
+    ready = all(status[name]['state'] == 'warm' for name in app.config['WARM_UP'])
+    return jsonify({'ready': ready, 'subsystems': status}), 200 if ready else 503
+
+# Route to report the response cache's hit/miss counters and size per endpoint
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+# Route to expose request, stage latency and cache metrics in the Prometheus text format
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(response_cache.stats()), mimetype='text/plain; version=0.0.4')
+
+# Route to read the aggregated profiles: the profiled endpoints, or one endpoint's hottest functions
+# (format=json or text, sort=tottime, cumulative or calls) or its collapsed stacks (format=collapsed)
+@app.route('/api/debug/profile', methods=['GET'])
+def profile_report():
+    if not profiler.token:
+        return jsonify({'error': 'Profiling reports are disabled'}), 404
+    if request.headers.get('X-Profile') != profiler.token:
+        return jsonify({'error': 'Profile token required'}), 403
+
+    endpoint = request.args.get('endpoint')
+    if endpoint is None:
+        return jsonify({'mode': profiler.mode, 'sample_rate': profiler.sample_rate,
+                        'window_seconds': profiler.window_seconds, 'endpoints': profiler.endpoints()})
+    sort = request.args.get('sort', 'tottime')
+    if sort not in SORT_KEYS:
+        sort = 'tottime'
+    limit = request.args.get('limit', 30, type=int)
+    report_format = request.args.get('format', 'json')
+    if report_format == 'collapsed':
+        return Response(profiler.collapsed(endpoint), mimetype='text/plain')
+    if report_format == 'text':
+        return Response(profiler.text(endpoint, sort, limit), mimetype='text/plain')
+    return jsonify({'endpoint': endpoint, 'sort': sort, 'functions': profiler.table(endpoint, sort, limit)})
+
+# Load the WARM_UP subsystems in the background, so the server starts answering right away.
+# Image match workers started from `python app.py` import it again as __mp_main__ and load nothing.
+if __name__ != '__mp_main__':
+    subsystems.warm_up(app.config['WARM_UP'])
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Threaded so other endpoints keep answering while image searches wait on the match pool
+    app.run(debug=True, threaded=True)
@@ -0,0 +1,143 @@
+"""Resident memory and result-building latency of the full vs the compact catalog.
+
+Writes a synthetic enriched catalog (same columns as build_catalog.py output)
+and loads it in a fresh process per layout:
+
+    full     every column, text as Python object strings, rows read with iloc
+    compact  catalog.read_catalog (needed columns, categoricals, Arrow strings)
+             and ProductRecords
+
+Run from the repository root:
+
+    python -m benchmarks.catalog_memory --rows 1000000
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from catalog import Product, ProductRecords, read_catalog
+
+WORDS = ['wireless', 'smart', 'portable', 'classic', 'premium', 'phone', 'headphones', 'lamp', 'watch', 'charger',
+         'shoes', 'running', 'toy', 'car', 'laptop', 'stand', 'case', 'pro', 'max', 'lite', 'blue', 'red', 'steel']
+REVIEWS = ['Great product, love it', 'Terrible quality, broke fast', 'Works as described', 'Would not buy again',
+           'Amazing! Would buy again', 'Battery life could be better but overall solid value for the price']
+CATEGORIES = [['Electronics', 'Audio'], ['Shoes', 'Running'], ['Toys & Games', 'Vehicles'], ['Home', 'Lighting'],
+              ['Electronics', 'Computers', 'Accessories'], ['Sports', 'Outdoors']]
+AVAILABILITY = ['In Stock', 'Only 3 left in stock', 'Currently unavailable']
+
+
+def write_synthetic_catalog(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS, dtype=object)
+    lengths = rng.integers(3, 7, rows)
+    tokens = words[rng.integers(0, len(WORDS), lengths.sum())]
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    titles = [' '.join(tokens[offsets[i]:offsets[i + 1]]).title() + f' {i}' for i in range(rows)]
+    prices = np.round(rng.uniform(5, 500, rows), 2)
+    ratings = np.round(rng.uniform(1, 5, rows), 1)
+    category_ids = rng.integers(0, len(CATEGORIES), rows)
+    reviews = np.array([', '.join(rng.choice(REVIEWS, 3)) for _ in range(64)], dtype=object)
+
+    table = pa.table({
+        'asin': [f'B{i:09d}' for i in range(rows)],
+        'title': titles,
+        'initial_price': [f'[{price}]' for price in prices],
+        'rating': ratings,
+        'top_review': reviews[rng.integers(0, len(reviews), rows)],
+        'url': [f'https://example.com/p/{i}' for i in range(rows)],
+        'image_url': [f'https://example.com/img/{i}.jpg' for i in range(rows)],
+        'categories': [json.dumps(CATEGORIES[c]) for c in category_ids],
+        'availability': np.array(AVAILABILITY, dtype=object)[rng.integers(0, len(AVAILABILITY), rows)],
+        'row_hash': [hashlib.sha1(title.encode()).hexdigest() for title in titles],
+        'sentiment_score': np.round(rng.uniform(-1, 1, rows), 4),
+        'title_tokens': pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), pa.array(list(tokens), pa.string())),
+        'price_value': prices,
+        'rating_value': ratings,
+        'category_list': [CATEGORIES[c] for c in category_ids],
+    })
+    pq.write_table(table, path)
+
+
+# Current resident set size in MB (peak on systems without /proc)
+def resident_memory_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(layout, path, requests):
+    gc.collect()
+    before = resident_memory_mb()
+    start = time.perf_counter()
+    if layout == 'full':
+        pd.options.future.infer_string = False  # Object strings, as pandas 2.x reads them
+        products_df = pd.read_parquet(path)
+        get_record = products_df.iloc.__getitem__
+    else:
+        products_df = read_catalog(path)
+        get_record = ProductRecords(products_df).__getitem__
+    load_seconds = time.perf_counter() - start
+    pa.default_memory_pool().release_unused()
+    gc.collect()
+    memory = resident_memory_mb() - before
+
+    # Build the five result dicts of a search response, like /api/search does
+    rng = np.random.default_rng(1)
+    latencies = []
+    for row_ids in rng.integers(0, len(products_df), (requests, 5)):
+        start = time.perf_counter()
+        for row_id in row_ids:
+            row = get_record(row_id)
+            {field: row[field] if layout == 'full' else getattr(row, field) for field in Product._fields}
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {'layout': layout, 'memory_mb': memory, 'load_s': load_seconds,
+            'p50_ms': float(np.percentile(latencies, 50)), 'p95_ms': float(np.percentile(latencies, 95))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help="products in the synthetic catalog")
+    parser.add_argument('--requests', type=int, default=2000, help="simulated search responses per layout")
+    parser.add_argument('--catalog', help="existing enriched Parquet catalog to measure instead")
+    parser.add_argument('--measure', choices=['full', 'compact'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.catalog, args.requests)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.catalog
+        if path is None:
+            path = os.path.join(directory, 'catalog.parquet')
+            write_synthetic_catalog(path, args.rows)
+        print(f"{pq.ParquetFile(path).metadata.num_rows} products, {os.path.getsize(path) / 2 ** 20:.0f} MB on disk")
+        for layout in ('full', 'compact'):
+            # A fresh process per layout, so one layout's freed memory does not hide the other's
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.catalog_memory', '--measure', layout,
+                                     '--catalog', path, '--requests', str(args.requests)],
+                                    check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{layout:>8}: {result['memory_mb']:7.0f} MB resident  load {result['load_s']:5.1f} s  "
+                  f"5 results p50 {result['p50_ms']:.3f} ms  p95 {result['p95_ms']:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Time to first response of a freshly started app worker.
+
+Every scenario runs in a new process: it imports app.py, sends one request
+through the Flask test client and reports the time from the start of the
+import to the end of the import, to the first response, and to /api/ready
+answering 200.
+
+Run from the repository root (it loads app.py and its data):
+
+    python -m benchmarks.cold_start --repeat 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# name: (WARM_UP, method, path, request options)
+SCENARIOS = {
+    'order-status': ('orders', 'get', '/api/order-status', {'query_string': {'orderNo': '405-9763961-5211537'}}),
+    'search': ('orders,nltk,catalog,images', 'get', '/api/search', {'query_string': {'query': 'wireless phone'}}),
+    'search-no-warm-up': ('', 'get', '/api/search', {'query_string': {'query': 'wireless phone'}}),
+    'ready': ('orders,nltk,catalog,images', 'get', '/api/ready', {}),
+}
+
+
+def measure(scenario):
+    _, method, path, options = SCENARIOS[scenario]
+    start = time.perf_counter()
+    import app
+    imported = time.perf_counter() - start
+
+    client = app.app.test_client()
+    status = getattr(client, method)(path, **options).status_code
+    first_response = time.perf_counter() - start
+
+    while client.get('/api/ready').status_code != 200:
+        time.sleep(0.01)
+    ready = time.perf_counter() - start
+    return {'import_s': imported, 'first_response_s': first_response, 'ready_s': ready, 'status': status}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=3, help="fresh processes per scenario")
+    parser.add_argument('--measure', choices=list(SCENARIOS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure)))
+        return
+
+    for scenario in args.scenarios:
+        environment = dict(os.environ, WARM_UP=SCENARIOS[scenario][0])
+        results = []
+        for _ in range(args.repeat):
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.cold_start', '--measure', scenario],
+                                    env=environment, check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+        summary = {key: np.median([result[key] for result in results]) for key in ('import_s', 'first_response_s', 'ready_s')}
+        print(f"{scenario:>18}: import {summary['import_s']:5.2f} s  first response {summary['first_response_s']:5.2f} s "
+              f"(HTTP {results[-1]['status']})  ready {summary['ready_s']:5.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Recall@5 and latency of the image search cascade against the exhaustive ORB scan.
+
+Run from the repository root (it loads app.py and its data), after building
+the image index:
+
+    python image_index.py
+    python -m benchmarks.image_recall --queries 50 --shortlist 25 50 100
+"""
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+import app
+from image_index import describe_image, describe_image_file
+
+
+# Simulate a user photo of a catalog image: rescale, blur, shift brightness and crop
+def perturb(image, rng):
+    height, width = image.shape[:2]
+    scale = rng.uniform(0.7, 1.1)
+    image = cv2.resize(image, (max(int(width * scale), 32), max(int(height * scale), 32)))
+    image = cv2.GaussianBlur(image, (3, 3), 0)
+    image = cv2.convertScaleAbs(image, alpha=rng.uniform(0.8, 1.2), beta=rng.uniform(-20, 20))
+    height, width = image.shape[:2]
+    top, left = int(height * rng.uniform(0, 0.1)), int(width * rng.uniform(0, 0.1))
+    return image[top:height - top, left:width - left]
+
+
+def load_queries(count, query_dir=None, seed=0):
+    if query_dir:
+        names = sorted(os.listdir(query_dir))[:count]
+        return [describe_image_file(os.path.join(query_dir, name)) for name in names]
+    rng = np.random.default_rng(seed)
+    names = [app.catalog.image_index.entries[position] for position in app.catalog.image_candidate_positions]
+    chosen = rng.choice(len(names), min(count, len(names)), replace=False)
+    queries = []
+    for position in chosen:
+        image = cv2.imread(os.path.join(app.image_dir, names[position]), cv2.IMREAD_GRAYSCALE)
+        queries.append(describe_image(perturb(image, rng)))
+    return queries
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def summarize(latencies):
+    return f"mean {np.mean(latencies):7.1f} ms  p95 {np.percentile(latencies, 95):7.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=50, help="number of query images")
+    parser.add_argument('--query-dir', help="directory of real query photos (default: perturbed catalog images)")
+    parser.add_argument('--shortlist', type=int, nargs='+', default=[25, 50, 100], help="shortlist sizes to try")
+    parser.add_argument('--budget-ms', type=int, default=0, help="verification time budget")
+    parser.add_argument('--early-stop', type=int, default=0, help="stop verifying after this many similar images")
+    args = parser.parse_args()
+    app.subsystems['images'].ensure()
+
+    queries = [query for query in load_queries(args.queries, args.query_dir) if query is not None]
+    print(f"{len(queries)} queries against {len(app.catalog.image_candidate_positions)} catalog images")
+
+    exhaustive, latencies = [], []
+    for query in queries:
+        matches, elapsed = timed(app.find_similar_products, app.catalog, query, 0)
+        exhaustive.append({row_id for row_id, _ in matches[:5]})
+        latencies.append(elapsed)
+    print(f"exhaustive          {summarize(latencies)}")
+
+    for size in args.shortlist:
+        recalls, latencies = [], []
+        for query, expected in zip(queries, exhaustive):
+            matches, elapsed = timed(app.find_similar_products, app.catalog, query, size, args.budget_ms, args.early_stop)
+            latencies.append(elapsed)
+            if expected:
+                recalls.append(len(expected & {row_id for row_id, _ in matches[:5]}) / len(expected))
+        recall = np.mean(recalls) if recalls else float('nan')
+        print(f"shortlist {size:<9} {summarize(latencies)}  recall@5 {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
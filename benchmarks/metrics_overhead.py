@@ -0,0 +1,60 @@
+"""Latency overhead of the request metrics (METRICS_ENABLED) on /api/search.
+
+Sends the same searches through the Flask test client with metrics off and
+on, alternating rounds so both see the same warm caches and machine load.
+Uncached searches run every stage; cache hits are the cheapest requests, so
+they show the overhead at its largest share.
+
+Run from the repository root (it loads app.py and its data):
+
+    python -m benchmarks.metrics_overhead --queries 200 --rounds 5
+"""
+import argparse
+import time
+
+import numpy as np
+
+import app
+
+
+def load_queries(count, seed=0):
+    rng = np.random.default_rng(seed)
+    title_tokens = app.catalog.products_df['title_tokens']
+    return [' '.join(title_tokens.iat[row_id][:2]) for row_id in rng.integers(0, len(title_tokens), count)]
+
+
+def run(client, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        client.get('/api/search', query_string={'query': query})
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=200, help="searches per round")
+    parser.add_argument('--rounds', type=int, default=5, help="alternating off/on rounds")
+    args = parser.parse_args()
+    app.subsystems['nltk'].ensure()
+    app.subsystems['catalog'].ensure()
+
+    client = app.app.test_client()
+    queries = load_queries(args.queries)
+    for cached in (False, True):
+        app.response_cache.ttls['search'] = 300 if cached else 0
+        run(client, queries)  # Warm-up, and fills the cache for the cached runs
+        latencies = {False: [], True: []}
+        for _ in range(args.rounds):
+            for enabled in (False, True):
+                app.app.config['METRICS_ENABLED'] = enabled
+                latencies[enabled].extend(run(client, queries))
+        off, on = np.mean(latencies[False]), np.mean(latencies[True])
+        print(f"{'cache hit' if cached else 'uncached':>9}: off {off:.3f} ms  on {on:.3f} ms  "
+              f"overhead {(on - off) * 1000:+.1f} us ({(on - off) / off:+.1%})  "
+              f"p95 off {np.percentile(latencies[False], 95):.3f} ms  on {np.percentile(latencies[True], 95):.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
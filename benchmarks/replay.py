@@ -0,0 +1,176 @@
+"""Replay a captured access log (see access_log.py) against a running server.
+
+Requests are sent open-loop: each one is scheduled at its arrival time and
+sent then, whether or not the earlier ones have been answered, by up to
+--concurrency threads. Arrival times follow the log (sped up by --speed), or
+a fixed --rate per second (exponential gaps with --poisson). Latency is
+measured from the scheduled time, so the time a request waits because the
+server fell behind is counted too.
+
+--warm N first sends the N most frequent logged requests once, the way
+production traffic would have filled the response cache and loaded the
+lazy subsystems. Image searches are replayed with --image as the upload and
+skipped without it. Order-status streams never end, so they are skipped.
+
+Capture a log, then replay it:
+
+    ACCESS_LOG_ENABLED=1 python app.py
+    python -m benchmarks.replay logs/access.jsonl --url http://127.0.0.1:5000 --rate 50 --concurrency 16 --warm 100
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from access_log import most_frequent, read_records
+
+SKIPPED_ENDPOINTS = ('/api/order-status/stream', '/api/voice-search')
+
+
+def arrival_offsets(records, speed=1.0, rate=None, poisson=False, seed=0):
+    """Seconds from the start of the replay at which each record is sent."""
+    if rate:
+        if poisson:
+            offsets = np.cumsum(np.random.default_rng(seed).exponential(1 / rate, len(records)))
+            return offsets - offsets[0]
+        return np.arange(len(records)) / rate
+    timestamps = np.array([record['ts'] for record in records])
+    return (timestamps - timestamps[0]) / speed
+
+
+class Replayer:
+    """Sends logged requests to `base_url`, one pooled session per thread."""
+
+    def __init__(self, base_url, image=None, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.image = image
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def send(self, method, path, params):
+        """Send one request; returns its status code, or None when it failed to complete."""
+        query = {key: value for key, value in params.items() if key not in ('body', 'upload_bytes')}
+        options = {'params': query, 'timeout': self.timeout}
+        if 'body' in params:
+            options['json'] = params['body']
+        if 'upload_bytes' in params:
+            options['files'] = {'image': ('image.jpg', self.image, 'image/jpeg')}
+        try:
+            return self.session().request(method, self.base_url + path, **options).status_code
+        except requests.RequestException:
+            return None
+
+
+def replayable(record, image):
+    return record['endpoint'] not in SKIPPED_ENDPOINTS and ('upload_bytes' not in record['params'] or image is not None)
+
+
+def summarize(latencies, statuses):
+    errors = sum(status is None or status >= 500 for status in statuses)
+    if not latencies:
+        return {'requests': 0, 'errors': errors}
+    return {'requests': len(latencies), 'errors': errors,
+            'p50_ms': float(np.percentile(latencies, 50)), 'p95_ms': float(np.percentile(latencies, 95)),
+            'p99_ms': float(np.percentile(latencies, 99))}
+
+
+def describe(name, summary):
+    if not summary['requests']:
+        return f"{name}: no requests"
+    return (f"{name}: {summary['requests']:6d} requests  errors {summary['errors']:4d}  p50 {summary['p50_ms']:8.2f} ms  "
+            f"p95 {summary['p95_ms']:8.2f} ms  p99 {summary['p99_ms']:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', help="JSONL access log written with ACCESS_LOG_ENABLED=1")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="server to replay against")
+    parser.add_argument('--concurrency', type=int, default=8, help="requests in flight at most")
+    parser.add_argument('--speed', type=float, default=1.0, help="replay the logged arrival times this much faster")
+    parser.add_argument('--rate', type=float, help="fixed arrival rate (requests/s) instead of the logged times")
+    parser.add_argument('--poisson', action='store_true', help="exponential gaps between arrivals at --rate")
+    parser.add_argument('--limit', type=int, help="replay only the first LIMIT requests")
+    parser.add_argument('--warm', type=int, default=0, help="send the N most frequent requests once before the run")
+    parser.add_argument('--image', help="image uploaded for logged image searches")
+    parser.add_argument('--interval', type=float, default=5.0, help="seconds per line of the over-time report")
+    parser.add_argument('--output', help="write the summary as JSON")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    image = None
+    if args.image:
+        with open(args.image, 'rb') as f:
+            image = f.read()
+    records = read_records(args.log)
+    records.sort(key=lambda record: record['ts'])
+    replayed = [record for record in records if replayable(record, image)][:args.limit]
+    print(f"{len(records)} logged requests, replaying {len(replayed)}")
+    replayer = Replayer(args.url, image)
+
+    if args.warm:
+        warm_up = most_frequent(replayed, args.warm)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(lambda request: replayer.send(*request), warm_up))
+        print(f"Warmed up with the {len(warm_up)} most frequent requests in {time.perf_counter() - started:.1f} s")
+
+    offsets = arrival_offsets(replayed, args.speed, args.rate, args.poisson, args.seed)
+    results = []  # (scheduled offset, latency ms, status, endpoint)
+    lock = threading.Lock()
+
+    def send(record, offset, start):
+        status = replayer.send(record['method'], record['path'], record['params'])
+        latency = (time.perf_counter() - start - offset) * 1000
+        with lock:
+            results.append((offset, latency, status, record['endpoint']))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for record, offset in zip(replayed, offsets):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, record, offset, start)
+    elapsed = time.perf_counter() - start
+
+    results.sort(key=lambda result: result[0])
+    print(f"Sent {len(results)} requests in {elapsed:.1f} s ({len(results) / elapsed:.1f} req/s)")
+    print("Over time:")
+    windows = {}
+    for offset, latency, status, _ in results:
+        window = windows.setdefault(int(offset // args.interval), ([], []))
+        window[0].append(latency)
+        window[1].append(status)
+    over_time = []
+    for window, (latencies, statuses) in sorted(windows.items()):
+        summary = dict(summarize(latencies, statuses), start_s=window * args.interval)
+        over_time.append(summary)
+        print('  ' + describe(f"{window * args.interval:7.1f} s", summary))
+
+    print("By endpoint:")
+    by_endpoint = {}
+    for endpoint in sorted({result[3] for result in results}):
+        matching = [result for result in results if result[3] == endpoint]
+        by_endpoint[endpoint] = summarize([result[1] for result in matching], [result[2] for result in matching])
+        print('  ' + describe(f"{endpoint:>28}", by_endpoint[endpoint]))
+    overall = summarize([result[1] for result in results], [result[2] for result in results])
+    print('  ' + describe(f"{'all':>28}", overall))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'elapsed_s': elapsed, 'overall': overall, 'endpoints': by_endpoint, 'over_time': over_time,
+                       'config': {key: value for key, value in vars(args).items() if key != 'image'}}, f, indent=1)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
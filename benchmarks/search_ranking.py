@@ -0,0 +1,61 @@
+"""Latency and ranking quality of the /api/search rankers (legacy token overlap vs BM25).
+
+Queries are built from catalog titles: a few content words of a random
+product. A ranker scores a hit when that product is in its top 5, and its
+precision is the share of top-5 results whose title has every query word.
+
+Run from the repository root (it loads app.py and its data):
+
+    python -m benchmarks.search_ranking --queries 200 --words 2
+"""
+import argparse
+import time
+
+import numpy as np
+
+import app
+from ranking import SEARCH_RANKERS
+
+
+def load_queries(count, words, seed=0):
+    rng = np.random.default_rng(seed)
+    title_tokens = app.catalog.products_df['title_tokens']
+    queries = []
+    for row_id in rng.permutation(len(title_tokens)):
+        tokens = list(dict.fromkeys(title_tokens.iat[row_id]))
+        if len(tokens) < words:
+            continue
+        chosen = rng.choice(len(tokens), words, replace=False)
+        queries.append((int(row_id), [tokens[i] for i in sorted(chosen)]))
+        if len(queries) == count:
+            break
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=200, help="number of queries")
+    parser.add_argument('--words', type=int, default=2, help="title words per query")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    app.subsystems['bm25'].ensure()
+
+    queries = load_queries(args.queries, args.words, args.seed)
+    title_tokens = app.catalog.products_df['title_tokens']
+    print(f"{len(queries)} queries of {args.words} words over {len(title_tokens)} products")
+    for ranker in SEARCH_RANKERS:
+        latencies, hits, precision = [], 0, []
+        for source_row_id, tokens in queries:
+            start = time.perf_counter()
+            ranked = app.rank_products(app.catalog, ' '.join(tokens), tokens, ranker)
+            latencies.append((time.perf_counter() - start) * 1000)
+            row_ids = [row_id for row_id, _, _ in ranked]
+            hits += source_row_id in row_ids
+            if row_ids:
+                precision.append(np.mean([set(tokens) <= set(title_tokens.iat[row_id]) for row_id in row_ids]))
+        print(f"{ranker:>7}: mean {np.mean(latencies):6.2f} ms  p95 {np.percentile(latencies, 95):6.2f} ms  "
+              f"hit@5 {hits / len(queries):.3f}  precision@5 {np.mean(precision):.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""End-to-end latency of every app.py endpoint on synthetic data, checked against a baseline.
+
+Writes a synthetic catalog, order sheet and image store (see
+benchmarks/synthetic.py) into a scratch directory, builds the catalog
+artifact and the image index there, then starts a fresh process that imports app.py in that
+directory, loads every subsystem and drives each endpoint through the Flask
+test client. It records p50/p95/p99 latency, sequential throughput and
+errors per endpoint, the subsystem load times and the process's peak RSS.
+
+The response cache is disabled unless --cache is given, so repeated
+requests measure the work itself. /api/voice-search is not driven: it
+needs a microphone recording and Google's speech API.
+
+A result whose p95 latency (or peak RSS) exceeds the baseline's by more than
+--max-regression, and by more than --min-delta-ms, fails the run (exit code
+1). Record a baseline on the reference machine with --update-baseline.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --rows 10000 --requests 200 --output results.json
+    python -m benchmarks.suite --rows 10000 --requests 200 --baseline benchmarks/baseline.json --update-baseline
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INTENT_QUESTIONS = ['where is my order', "wheres my order??", 'track my shipment', 'cancel my order', 'hi',
+                    'how are you', 'what is your name', 'return item please', 'wireless headphones', 'red dress']
+
+# Subsystems loaded before measuring, so no request pays for a load
+SUBSYSTEMS = ('orders', 'intents', 'nltk', 'catalog', 'bm25', 'suggest', 'images')
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024  # Bytes on macOS, KiB on Linux
+
+
+def build_scenarios(app, rng, image_queries):
+    """name: function returning the next request as (method, path, test client options)."""
+    from benchmarks.synthetic import PRODUCTS
+
+    titles = app.catalog.products_df['title']
+    order_nos = list(app.order_store.orders)
+    product_names = [name for names, _ in PRODUCTS.values() for name in names]
+    thumbnails = sorted(os.listdir(app.thumbnail_dir)) if os.path.isdir(app.thumbnail_dir) else []
+
+    def title_words(count):
+        words = str(titles.iat[int(rng.integers(0, len(titles)))]).split()
+        start = int(rng.integers(0, max(len(words) - count, 0) + 1))
+        return ' '.join(words[start:start + count])
+
+    def order_no():
+        # One lookup in five is for an order that does not exist
+        return order_nos[int(rng.integers(0, len(order_nos)))] if rng.random() < 0.8 else '000-0000000-0000000'
+
+    scenarios = {
+        'search': lambda: ('get', '/api/search', {'query_string': {'query': title_words(2)}}),
+        'search-bm25': lambda: ('get', '/api/search', {'query_string': {'query': title_words(2), 'ranker': 'bm25'}}),
+        'suggest': lambda: ('get', '/api/suggest', {'query_string': {'q': title_words(1)[:int(rng.integers(2, 6))]}}),
+        'intent': lambda: ('get', '/api/intent', {'query_string': {'q': INTENT_QUESTIONS[int(rng.integers(0, len(INTENT_QUESTIONS)))]}}),
+        'compare-products': lambda: ('post', '/api/compare-products',
+                                     {'json': {'products': list(rng.choice(product_names, 2, replace=False))}}),
+        'order-status': lambda: ('get', '/api/order-status', {'query_string': {'orderNo': order_no()}}),
+        'order-status-batch': lambda: ('post', '/api/order-status/batch', {'json': {'orderNos': [order_no() for _ in range(50)]}}),
+        'order-status-stream': lambda: ('get', '/api/order-status/stream', {'query_string': {'orderNo': order_no()}}),
+        'ready': lambda: ('get', '/api/ready', {}),
+        'metrics': lambda: ('get', '/api/metrics', {}),
+    }
+    if image_queries:
+        scenarios['image-search'] = lambda: ('post', '/api/image-search', {
+            'data': {'image': (io.BytesIO(image_queries[int(rng.integers(0, len(image_queries)))]), 'photo.jpg')},
+            'content_type': 'multipart/form-data'})
+    if thumbnails:
+        scenarios['thumbnails'] = lambda: ('get', f'/api/thumbnails/{thumbnails[int(rng.integers(0, len(thumbnails)))]}', {})
+    return scenarios
+
+
+def send(client, method, path, options):
+    """Send one request and return its status; streams are read up to their first event."""
+    if path.endswith('/stream'):
+        response = getattr(client, method)(path, buffered=False, **options)
+        next(iter(response.response))
+        response.close()
+        return response.status_code
+    return getattr(client, method)(path, **options).status_code
+
+
+def measure(requests, image_requests, seed):
+    from benchmarks.synthetic import jpeg_bytes, photograph
+    from PIL import Image
+
+    start = time.perf_counter()
+    import app
+    import_seconds = time.perf_counter() - start
+    for name in SUBSYSTEMS:
+        app.subsystems[name].ensure()
+
+    rng = np.random.default_rng(seed)
+    image_names = sorted(app.catalog.product_image_rows or {})
+    image_queries = [jpeg_bytes(photograph(Image.open(os.path.join(app.image_dir, name)).convert('RGB'), seed + i))
+                     for i, name in enumerate(image_names[:20])]
+    client = app.app.test_client()
+
+    endpoints = {}
+    for name, next_request in build_scenarios(app, rng, image_queries).items():
+        count = image_requests if name == 'image-search' else requests
+        for _ in range(min(5, count)):
+            send(client, *next_request())  # Warm-up
+        latencies, errors = [], 0
+        for _ in range(count):
+            method, path, options = next_request()
+            started = time.perf_counter()
+            status = send(client, method, path, options)
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += status >= 500
+        endpoints[name] = {
+            'requests': count,
+            'errors': errors,
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'mean_ms': float(np.mean(latencies)),
+            'throughput_rps': count / (sum(latencies) / 1000),
+        }
+        print(f"{name:>20}: p50 {endpoints[name]['p50_ms']:8.2f} ms  p95 {endpoints[name]['p95_ms']:8.2f} ms  "
+              f"p99 {endpoints[name]['p99_ms']:8.2f} ms  {endpoints[name]['throughput_rps']:8.1f} req/s  "
+              f"errors {errors}", file=sys.stderr)
+
+    status = app.subsystems.status()
+    return {
+        'endpoints': endpoints,
+        'import_s': import_seconds,
+        'load_s': {name: status[name]['load_seconds'] for name in SUBSYSTEMS},
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def prepare(root, args):
+    """Write the synthetic data into `root` (unless it is already there) and build the catalog artifact."""
+    from benchmarks.synthetic import write_dataset
+
+    if not os.path.exists(os.path.join(root, 'data', 'amazon-products.csv')):
+        started = time.perf_counter()
+        write_dataset(root, args.rows, args.orders, args.images, args.seed)
+        print(f"Generated {args.rows} products, {args.orders} orders and {args.images} images "
+              f"in {time.perf_counter() - started:.1f} s")
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'build_catalog', '--no-publish'], cwd=root, env=environment(args),
+                   check=True, capture_output=True)
+    print(f"Built the catalog in {time.perf_counter() - started:.1f} s")
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'image_index'], cwd=root, env=environment(args), check=True,
+                   capture_output=True)
+    print(f"Built the image index in {time.perf_counter() - started:.1f} s")
+
+
+def environment(args):
+    env = dict(os.environ, WARM_UP='', PYTHONPATH=os.pathsep.join(filter(None, [REPOSITORY, os.environ.get('PYTHONPATH')])),
+               INTENT_REPLIES_PATH=os.path.join(REPOSITORY, 'intent_replies.json'))
+    if not args.cache:
+        env.update(CACHE_TTL_SEARCH='0', CACHE_TTL_COMPARE='0', CACHE_TTL_ORDER_STATUS='0')
+    return env
+
+
+def compare(results, baseline, max_regression, min_delta_ms):
+    """Regressions of `results` against `baseline`, as messages."""
+    regressions = []
+    for name, base in baseline['endpoints'].items():
+        current = results['endpoints'].get(name)
+        if current is None:
+            continue
+        limit = max(base['p95_ms'] * (1 + max_regression), base['p95_ms'] + min_delta_ms)
+        if current['p95_ms'] > limit:
+            regressions.append(f"{name}: p95 {current['p95_ms']:.2f} ms, baseline {base['p95_ms']:.2f} ms")
+        if current['errors'] > base['errors']:
+            regressions.append(f"{name}: {current['errors']} errors, baseline {base['errors']}")
+    if results['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + max_regression):
+        regressions.append(f"peak RSS {results['peak_rss_mb']:.0f} MB, baseline {baseline['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000, help="products in the synthetic catalog (1k to 1M)")
+    parser.add_argument('--orders', type=int, default=5000, help="rows in the synthetic order sheet")
+    parser.add_argument('--images', type=int, default=200, help="distinct synthetic product pictures")
+    parser.add_argument('--requests', type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument('--image-requests', type=int, default=20, help="measured requests for /api/image-search")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache', action='store_true', help="keep the response cache enabled")
+    parser.add_argument('--data-dir', help="reuse (or keep) the synthetic data in this directory")
+    parser.add_argument('--output', default='benchmark-results.json', help="JSON results file")
+    parser.add_argument('--baseline', help="results file to compare against")
+    parser.add_argument('--update-baseline', action='store_true', help="write the results to --baseline instead")
+    parser.add_argument('--max-regression', type=float, default=0.25, help="allowed relative p95/RSS increase")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="p95 increases below this never fail")
+    parser.add_argument('--measure', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.requests, args.image_requests, args.seed)))
+        return
+
+    config = {key: getattr(args, key) for key in ('rows', 'orders', 'images', 'requests', 'image_requests', 'seed', 'cache')}
+    with tempfile.TemporaryDirectory() as scratch:
+        root = args.data_dir or scratch
+        os.makedirs(root, exist_ok=True)
+        prepare(root, args)
+        # A fresh process, so peak RSS and load times are the app's own
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--measure', '--requests', str(args.requests),
+                                 '--image-requests', str(args.image_requests), '--seed', str(args.seed)],
+                                cwd=root, env=environment(args), check=True, stdout=subprocess.PIPE, text=True).stdout
+    results = dict(json.loads(output.strip().splitlines()[-1]), config=config,
+                   python=platform.python_version(), machine=platform.machine(), cpus=os.cpu_count())
+    print(f"Peak RSS {results['peak_rss_mb']:.0f} MB; loads: "
+          + ', '.join(f"{name} {seconds:.2f} s" for name, seconds in results['load_s'].items() if seconds is not None))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"Wrote {args.output}")
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f"Updated baseline {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['config'] != config:
+            parser.error(f"baseline was recorded with {baseline['config']}, not {config}")
+        regressions = compare(results, baseline, args.max_regression, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
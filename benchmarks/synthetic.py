@@ -0,0 +1,216 @@
+"""Synthetic data shaped like the app's inputs, for benchmarks.
+
+    catalog  data/amazon-products.csv: titles built from brands, adjectives
+             and product types, reviews of mixed sentiment, category lists,
+             prices in the export's mixed formats, some missing values
+    orders   data/orders_data.xlsx with the order sheet's columns
+    images   data/downloaded_images: drawn product pictures stored like
+             download_images.py does (content-hashed, thumbnails, manifest)
+
+Everything is generated from a seed, so two runs with the same arguments
+write the same data. Run from the repository root:
+
+    python -m benchmarks.synthetic --output /tmp/smart_bot_data --rows 100000 --orders 10000 --images 500
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageDraw, ImageEnhance
+
+from download_images import DERIVATIVE_SIZES, MANIFEST_NAME, resize_image, save_image
+
+BRANDS = ['Acme', 'Zento', 'Nordic', 'Lumo', 'Vexa', 'Orbit', 'Kiva', 'Pulse', 'Terra', 'Aster']
+ADJECTIVES = ['Wireless', 'Smart', 'Portable', 'Classic', 'Premium', 'Stainless', 'Leather', 'Cotton', 'Running',
+              "Men's", "Women's", 'Kids', 'Waterproof', 'Ergonomic', 'Compact', 'Red', 'Blue', 'Black']
+PRODUCTS = {
+    'Electronics': (['Phone', 'Headphones', 'Earbuds', 'Smart Watch', 'Charger', 'Laptop Stand', 'Speaker', 'Power Bank'],
+                    [['Electronics', 'Cell Phones & Accessories'], ['Electronics', 'Audio', 'Headphones'],
+                     ['Electronics', 'Computers', 'Accessories']]),
+    'Clothing': (['T-Shirt', 'Dress', 'Hoodie', 'Jacket', 'Socks', 'Jeans'],
+                 [['Clothing, Shoes & Jewelry', 'Women', 'Dresses'], ['Clothing, Shoes & Jewelry', 'Men', 'Shirts']]),
+    'Shoes': (['Sneakers', 'Running Shoes', 'Sandals', 'Boots'],
+              [['Clothing, Shoes & Jewelry', 'Shoes', 'Running'], ['Sports & Outdoors', 'Footwear']]),
+    'Home': (['Lamp', 'Water Bottle', 'Backpack', 'Coffee Mug', 'Desk Organizer', 'Pillow'],
+             [['Home & Kitchen', 'Lighting'], ['Home & Kitchen', 'Kitchen & Dining'], ['Home & Kitchen', 'Bedding']]),
+    'Toys': (['Toy Car', 'Puzzle', 'Building Blocks', 'Plush Bear'],
+             [['Toys & Games', 'Vehicles'], ['Toys & Games', 'Puzzles'], ['Toys & Games', 'Stuffed Animals']]),
+}
+VARIANTS = ['', '', 'Pro', 'Max', 'Lite', '2024', 'with Case', 'for Travel', '2 Pack', 'XL']
+REVIEW_OPENINGS = ['Great product, love it.', 'Terrible quality, broke after a week.', 'Works as described.',
+                   'Would not buy again.', 'Amazing! Would buy again.', 'Okay for the price.',
+                   'Exceeded my expectations.', 'Arrived damaged and support was unhelpful.']
+REVIEW_DETAILS = ['Battery life could be better', 'Fits perfectly', 'Shipping was fast', 'The color is off',
+                  'Very comfortable', 'Instructions were confusing', 'Solid build quality', 'My kids love it', '']
+AVAILABILITY = ['In Stock', 'Only 3 left in stock - order soon.', 'Currently unavailable.', 'In stock soon.']
+ORDER_STATUSES = ['Delivered to buyer', 'Shipped', 'Out for delivery', 'Returned to seller', 'Cancelled']
+CITIES = [('MUMBAI', 'MAHARASHTRA'), ('BENGALURU', 'KARNATAKA'), ('CHANDIGARH', 'CHANDIGARH'),
+          ('KOLKATA', 'WEST BENGAL'), ('NEW DELHI', 'DELHI'), ('PUNE', 'MAHARASHTRA')]
+
+
+def generate_catalog(rows, seed=0):
+    """A DataFrame with the columns of the raw amazon-products.csv export."""
+    rng = np.random.default_rng(seed)
+    kinds = list(PRODUCTS)
+    kind_ids = rng.integers(0, len(kinds), rows)
+    titles, categories = [], []
+    for kind_id, brand, adjective, second, variant, category_pick, product_pick in zip(
+            kind_ids, rng.integers(0, len(BRANDS), rows), rng.integers(0, len(ADJECTIVES), rows),
+            rng.integers(0, len(ADJECTIVES), rows), rng.integers(0, len(VARIANTS), rows),
+            rng.integers(0, 1 << 16, rows), rng.integers(0, 1 << 16, rows)):
+        names, category_lists = PRODUCTS[kinds[kind_id]]
+        words = [BRANDS[brand], ADJECTIVES[adjective]]
+        if second != adjective and second % 2:
+            words.append(ADJECTIVES[second])
+        words.append(names[product_pick % len(names)])
+        if VARIANTS[variant]:
+            words.append(VARIANTS[variant])
+        titles.append(' '.join(words))
+        categories.append(json.dumps(category_lists[category_pick % len(category_lists)]))
+
+    prices = np.round(rng.lognormal(3.5, 0.9, rows), 2)
+    price_formats = rng.integers(0, 3, rows)
+    initial_prices = [f'[{price}]' if form == 0 else (f'${price}' if form == 1 else str(price))
+                      for price, form in zip(prices, price_formats)]
+    ratings = np.round(np.clip(rng.normal(4.0, 0.8, rows), 1, 5), 1)
+    ratings[rng.random(rows) < 0.03] = np.nan
+
+    # A few hundred distinct reviews, reused like popular phrasing is
+    review_pool = [' '.join([REVIEW_OPENINGS[i % len(REVIEW_OPENINGS)], REVIEW_DETAILS[(i * 7) % len(REVIEW_DETAILS)],
+                             REVIEW_OPENINGS[(i * 3 + 1) % len(REVIEW_OPENINGS)]]).strip()
+                   for i in range(512)]
+    reviews = np.array(review_pool, dtype=object)[rng.integers(0, len(review_pool), rows)]
+    reviews[rng.random(rows) < 0.05] = None
+
+    return pd.DataFrame({
+        'asin': [f'B{i:09d}' for i in range(rows)],
+        'title': titles,
+        'initial_price': initial_prices,
+        'rating': ratings,
+        'top_review': reviews,
+        'url': [f'https://example.com/dp/B{i:09d}' for i in range(rows)],
+        'image_url': [f'https://example.com/images/{i}.jpg' for i in range(rows)],
+        'categories': categories,
+        'availability': np.array(AVAILABILITY, dtype=object)[rng.integers(0, len(AVAILABILITY), rows)],
+    })
+
+
+def generate_orders(count, catalog, seed=0):
+    """A DataFrame with the columns of orders_data.xlsx; descriptions are catalog titles."""
+    rng = np.random.default_rng(seed + 1)
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, count), unit='m')
+    cities = rng.integers(0, len(CITIES), count)
+    quantities = rng.integers(1, 4, count)
+    return pd.DataFrame({
+        'order_no': [f'{a:03d}-{b:07d}-{c:07d}' for a, b, c in
+                     zip(rng.integers(100, 1000, count), rng.integers(0, 10 ** 7, count), rng.integers(0, 10 ** 7, count))],
+        'order_date': [date.strftime('%a, %d %b, %Y, %I:%M %p IST') for date in dates],
+        'buyer': np.array(['Mr.', 'Ms.', 'Dr.', 'Priya', 'Rahul', 'Anita'], dtype=object)[rng.integers(0, 6, count)],
+        'ship_city': [CITIES[city][0] + ',' for city in cities],
+        'ship_state': [CITIES[city][1] for city in cities],
+        'sku': [f'SKU:  {code:010X}' for code in rng.integers(0, 1 << 40, count)],
+        'description': catalog['title'].to_numpy()[rng.integers(0, len(catalog), count)],
+        'quantity': quantities,
+        'item_total': [f'₹{total:,.2f}' for total in rng.uniform(99, 4999, count) * quantities],
+        'shipping_fee': np.where(rng.random(count) < 0.3, '₹84.96', None),
+        'cod': np.where(rng.random(count) < 0.2, 'Cash On Delivery', None),
+        'order_status': np.array(ORDER_STATUSES, dtype=object)[rng.integers(0, len(ORDER_STATUSES), count)],
+        'current_location': np.array(['Delivered', 'In transit', 'Local hub'], dtype=object)[rng.integers(0, 3, count)],
+        'delivery_date': dates + pd.to_timedelta(rng.integers(1, 8, count), unit='D'),
+    })
+
+
+def draw_product_image(seed, size=320):
+    """A product-like picture: a plain background with a few overlapping shapes."""
+    rng = np.random.default_rng(seed)
+    image = Image.new('RGB', (size, size), tuple(int(c) for c in rng.integers(180, 256, 3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(rng.integers(8, 20)):
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        x0, y0, x1, y1 = (int(v) for v in rng.integers(0, size, 4))
+        box = [min(x0, x1), min(y0, y1), max(x0, x1) + 8, max(y0, y1) + 8]
+        shape = rng.integers(0, 3)
+        if shape == 0:
+            draw.rectangle(box, fill=color)
+        elif shape == 1:
+            draw.ellipse(box, fill=color)
+        else:
+            draw.line(box, fill=color, width=int(rng.integers(2, 9)))
+    return image
+
+
+def photograph(image, seed):
+    """Simulate a user's photo of a product image: rescale, rotate, crop and change the brightness."""
+    rng = np.random.default_rng(seed)
+    width, height = image.size
+    scale = rng.uniform(0.7, 1.2)
+    image = image.resize((int(width * scale), int(height * scale)))
+    image = image.rotate(rng.uniform(-8, 8), expand=False, fillcolor=(255, 255, 255))
+    margin = int(image.size[0] * rng.uniform(0, 0.08))
+    image = image.crop((margin, margin, image.size[0] - margin, image.size[1] - margin))
+    return ImageEnhance.Brightness(image).enhance(rng.uniform(0.8, 1.2))
+
+
+def jpeg_bytes(image, quality=90):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def write_images(directory, catalog, count, seed=0):
+    """Draw `count` pictures and assign them to the catalog's products, like download_images.py stores them.
+
+    Products share pictures round-robin, as listings of the same item do. Returns the manifest.
+    """
+    for subdirectory in DERIVATIVE_SIZES:
+        os.makedirs(os.path.join(directory, subdirectory), exist_ok=True)
+    entries = []
+    for picture in range(count):
+        data = jpeg_bytes(draw_product_image(seed * 1_000_003 + picture))
+        digest = hashlib.sha256(data).hexdigest()
+        file_name = f'{digest}.jpg'
+        image = Image.open(io.BytesIO(data)).convert('RGB')
+        for subdirectory, size in DERIVATIVE_SIZES.items():
+            save_image(resize_image(image, size), os.path.join(directory, subdirectory, file_name))
+        with open(os.path.join(directory, file_name), 'wb') as f:
+            f.write(data)
+        entries.append({'file': file_name, 'sha256': digest})
+
+    manifest = {}
+    if entries:
+        for row_id, (product_id, image_url) in enumerate(zip(catalog['asin'], catalog['image_url'])):
+            manifest[product_id] = dict(entries[row_id % len(entries)], url=image_url)
+    with open(os.path.join(directory, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def write_dataset(root, rows, orders, images, seed=0):
+    """Write the catalog CSV, order sheet and images under `root`/data, laid out like the repository's data/."""
+    data_dir = os.path.join(root, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    catalog = generate_catalog(rows, seed)
+    catalog.to_csv(os.path.join(data_dir, 'amazon-products.csv'), index=False)
+    generate_orders(orders, catalog, seed).to_excel(os.path.join(data_dir, 'orders_data.xlsx'), index=False)
+    write_images(os.path.join(data_dir, 'downloaded_images'), catalog, images, seed)
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', required=True, help="directory to write data/ into")
+    parser.add_argument('--rows', type=int, default=10000, help="products in the catalog")
+    parser.add_argument('--orders', type=int, default=5000, help="rows in the order sheet")
+    parser.add_argument('--images', type=int, default=200, help="distinct product pictures")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_dataset(args.output, args.rows, args.orders, args.images, args.seed)
+    print(f"Wrote {args.rows} products, {args.orders} orders and {args.images} images to {args.output}/data")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+from multiprocessing import Pool
+
+import pandas as pd
+
+from catalog import CATALOG_PATH, DERIVED_COLUMNS, SOURCE_CSV, enrich_record, read_catalog, row_hash
+from hot_reload import replacing
+from search_index import ensure_nltk_data
+from shared_catalog import SharedCatalog, source_fingerprint
+
+CHUNK_SIZE = 2000
+
+
+def enrich_chunk(records):
+    return [enrich_record(*record) for record in records]
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Reuse the derived columns of rows whose content hash is unchanged since the last build
+def load_previous(output_path):
+    if not os.path.exists(output_path):
+        return {}
+    previous = pd.read_parquet(output_path, columns=['row_hash'] + DERIVED_COLUMNS)
+    previous = previous.drop_duplicates('row_hash')
+    return {values[0]: tuple(values[1:]) for values in previous.itertuples(index=False, name=None)}
+
+
+def build_catalog(source_csv=SOURCE_CSV, output_path=CATALOG_PATH, workers=None, full=False):
+    df = pd.read_csv(source_csv)
+    source_columns = list(df.columns)
+    df['row_hash'] = [row_hash(values) for values in df[source_columns].itertuples(index=False, name=None)]
+
+    previous = {} if full else load_previous(output_path)
+    derived = [previous.get(hash_value) for hash_value in df['row_hash']]
+    stale = [position for position, values in enumerate(derived) if values is None]
+    print(f"{len(df)} products, {len(df) - len(stale)} unchanged, {len(stale)} to enrich")
+
+    if stale:
+        records = list(zip(*(df[column].iloc[stale] for column in
+                             ['title', 'top_review', 'initial_price', 'rating', 'categories'])))
+        # Spread the NLTK/VADER work over all cores
+        with Pool(processes=workers or os.cpu_count()) as pool:
+            results = pool.imap(enrich_chunk, chunked(records, CHUNK_SIZE))
+            position_iter = iter(stale)
+            for chunk in results:
+                for values in chunk:
+                    derived[next(position_iter)] = values
+
+    for position, column in enumerate(DERIVED_COLUMNS):
+        df[column] = [values[position] for values in derived]
+
+    # Write to a temporary file first so a running app never reads a half-written artifact
+    with replacing(output_path) as temp_path:
+        df.to_parquet(temp_path, index=False)
+    print(f"Wrote {output_path}")
+    return output_path
+
+
+# Publish the artifact as a new shared generation, which running app workers swap to
+def publish_catalog(output_path=CATALOG_PATH):
+    generation = SharedCatalog().publish(read_catalog(output_path), source_fingerprint(output_path))
+    print(f"Published catalog generation {generation}")
+    return generation
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute sentiment, tokens, prices and categories for the catalog.")
+    parser.add_argument('--source', default=SOURCE_CSV, help="raw product CSV")
+    parser.add_argument('--output', default=CATALOG_PATH, help="enriched Parquet artifact")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--full', action='store_true', help="recompute every row, ignoring the previous artifact")
+    parser.add_argument('--no-publish', action='store_true', help="do not publish the artifact to running app workers")
+    args = parser.parse_args()
+    ensure_nltk_data()
+    build_catalog(args.source, args.output, args.workers, args.full)
+    if not args.no_publish:
+        publish_catalog(args.output)
@@ -0,0 +1,216 @@
+import ast
+import hashlib
+import json
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from search_index import preprocess_text
+
+# Raw product export and the enriched artifact built from it by build_catalog.py.
+# Bump CATALOG_VERSION whenever the derived columns change so old artifacts are rebuilt.
+SOURCE_CSV = 'data/amazon-products.csv'
+CATALOG_VERSION = 1
+CATALOG_PATH = f'data/catalog-v{CATALOG_VERSION}.parquet'
+
+# Columns added to the source columns by enrich_record
+DERIVED_COLUMNS = ['sentiment_score', 'title_tokens', 'price_value', 'rating_value', 'category_list']
+
+# Source columns the app reads; the rest of the export (and row_hash) is never loaded
+SERVED_COLUMNS = ['asin', 'title', 'url', 'initial_price', 'image_url', 'rating', 'top_review', 'categories',
+                  'availability']
+CATALOG_COLUMNS = SERVED_COLUMNS + DERIVED_COLUMNS
+
+# Text columns with few distinct values, stored once per value as categoricals
+CATEGORICAL_COLUMNS = ['categories', 'availability']
+LIST_COLUMNS = ['title_tokens', 'category_list']
+
+# The fields of a product that responses are built from
+Product = namedtuple('Product', ['title', 'url', 'initial_price', 'image_url', 'rating', 'top_review', 'categories',
+                                 'availability', 'sentiment_score'])
+
+NUMBER_RE = re.compile(r'-?\d+(?:\.\d+)?')
+
+_sid = None
+
+
+# Sentiment analysis using VADER
+def get_sentiment_analyzer():
+    global _sid
+    if _sid is None:
+        from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+        _sid = SentimentIntensityAnalyzer()
+    return _sid
+
+
+def compute_sentiment_score(review_text):
+    if isinstance(review_text, str) and review_text.strip():
+        sid = get_sentiment_analyzer()
+        # Split the reviews if there are multiple, separated by commas
+        reviews = review_text.split(",") if "," in review_text else [review_text]
+
+        # Calculate sentiment for each review
+        sentiment_scores = [sid.polarity_scores(review)['compound'] for review in reviews]
+
+        # Calculate the average sentiment score
+        average_sentiment_score = np.mean(sentiment_scores)
+        return average_sentiment_score
+    else:
+        return 0.0  # Return a neutral sentiment score for invalid or empty text
+
+
+# Turn values like 12.5, "[12.5]", "['$1,299.00']" into a float (NaN if there is no number)
+def parse_number(value):
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        return float('nan')
+    match = NUMBER_RE.search(value.replace(',', ''))
+    return float(match.group()) if match else float('nan')
+
+
+# Parse the stringified category list ('["Electronics", "Audio"]') into a list of names
+def parse_categories(value):
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(category) for category in value]
+    if not isinstance(value, str) or not value.strip():
+        return []
+    text = value.strip()
+    if text.startswith('['):
+        for parse in (json.loads, ast.literal_eval):
+            try:
+                parsed = parse(text)
+            except (ValueError, SyntaxError):
+                continue
+            if isinstance(parsed, (list, tuple)):
+                return [str(category).strip() for category in parsed if str(category).strip()]
+    return [category.strip(' \'"') for category in text.strip('[]').split(',') if category.strip(' \'"')]
+
+
+# Stable hash of a source row, used to skip rows that did not change between builds
+def row_hash(values):
+    joined = '\x1f'.join('' if pd.isna(value) else str(value) for value in values)
+    return hashlib.sha1(joined.encode('utf-8')).hexdigest()
+
+
+def enrich_record(title, top_review, initial_price, rating, categories):
+    """Compute the derived columns for one product."""
+    return (
+        float(compute_sentiment_score(top_review)),
+        preprocess_text(title) if isinstance(title, str) else [],
+        parse_number(initial_price),
+        parse_number(rating),
+        parse_categories(categories),
+    )
+
+
+# Strings stay in Arrow buffers but keep NaN for missing values, like the object columns they replace
+def string_dtype():
+    try:
+        return pd.StringDtype('pyarrow', na_value=np.nan)  # pandas >= 2.3
+    except TypeError:
+        return pd.StringDtype('pyarrow_numpy')
+
+
+# Compact pandas dtype of an Arrow column type (None keeps the default conversion:
+# NumPy arrays for numbers, categoricals for dictionary-encoded text)
+def pandas_dtype(arrow_type):
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return string_dtype()
+    if pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+
+def compact_catalog(df):
+    """Keep the CATALOG_COLUMNS of `df` in compact dtypes.
+
+    Low-cardinality text becomes categorical. Other text becomes Arrow-backed
+    strings instead of one Python object per cell. Token and category lists
+    become Arrow list columns. Numbers stay NumPy float64.
+    """
+    df = df[[column for column in CATALOG_COLUMNS if column in df.columns]].copy()
+    for column in df.columns:
+        if column in CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype('category')
+        elif column in LIST_COLUMNS:
+            df[column] = df[column].astype(pd.ArrowDtype(pa.list_(pa.string())))
+        elif pd.api.types.infer_dtype(df[column], skipna=True) == 'string':
+            df[column] = df[column].astype(string_dtype())
+    return df
+
+
+class ProductRecords:
+    """Product records by row id, read straight from the catalog columns.
+
+    products_df.iloc[row_id] assembles a whole-row Series on every call.
+    A record only reads the Product fields: numbers from NumPy arrays,
+    categoricals through their codes, and text from the Arrow-backed columns.
+    """
+
+    def __init__(self, products_df):
+        self.size = len(products_df)
+        self.readers = [self._reader(products_df[field]) for field in Product._fields]
+
+    @staticmethod
+    def _reader(column):
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Look the code up in the categories; code -1 (missing) picks the trailing NaN
+            codes = column.cat.codes.to_numpy()
+            categories = np.append(column.cat.categories.to_numpy(dtype=object), np.nan)
+            return lambda row_id: categories[codes[row_id]]
+        if pd.api.types.is_numeric_dtype(column):
+            return column.to_numpy().__getitem__
+        return column.array.__getitem__
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, row_id):
+        return Product._make([read(row_id) for read in self.readers])
+
+
+# Enrich a whole DataFrame in this process (used when no prebuilt artifact exists)
+def enrich_dataframe(df):
+    df = df.copy()
+    derived = [enrich_record(*values) for values in zip(
+        df['title'], df['top_review'], df['initial_price'], df['rating'], df['categories'])]
+    for position, column in enumerate(DERIVED_COLUMNS):
+        df[column] = [values[position] for values in derived]
+    return df
+
+
+# Read the columns the app needs from an enriched artifact, straight into the compact dtypes
+def read_catalog(catalog_path=CATALOG_PATH):
+    names = pq.read_schema(catalog_path).names
+    table = pq.read_table(catalog_path, columns=[column for column in CATALOG_COLUMNS if column in names],
+                          read_dictionary=[column for column in CATEGORICAL_COLUMNS if column in names])
+    return table.to_pandas(types_mapper=pandas_dtype)
+
+
+# The file load_catalog() reads: the artifact, or the raw CSV when the artifact is missing or older than it
+def catalog_source(catalog_path=CATALOG_PATH, source_csv=SOURCE_CSV):
+    if os.path.exists(catalog_path) and (
+            not os.path.exists(source_csv) or os.path.getmtime(catalog_path) >= os.path.getmtime(source_csv)):
+        return catalog_path
+    return source_csv
+
+
+def load_catalog(catalog_path=CATALOG_PATH, source_csv=SOURCE_CSV):
+    """Load the enriched catalog written by build_catalog.py.
+
+    Falls back to reading the raw CSV and enriching it in-process when the
+    artifact is missing or older than the CSV, so the app still starts.
+    """
+    if catalog_source(catalog_path, source_csv) == catalog_path:
+        return read_catalog(catalog_path)
+
+    print(f"Catalog artifact {catalog_path} is missing or stale, enriching {source_csv} in-process. "
+          f"Run build_catalog.py to speed up startup.")
+    return compact_catalog(enrich_dataframe(pd.read_csv(source_csv, usecols=lambda column: column in SERVED_COLUMNS)))
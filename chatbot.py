@@ -1,20 +1,29 @@
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
 from PIL import Image, ImageTk
-import requests
 import io
 import textwrap
 import speech_recognition as sr
-import json
+from image_cache import ThumbnailCache
+from ui_tasks import REQUEST_TIMEOUT, ETagCache, TaskRunner, create_session
 
 
 # Flask API URLs
-BASE_URL = 'http://127.0.0.1:5000/api'
+SERVER_URL = 'http://127.0.0.1:5000'
+BASE_URL = f'{SERVER_URL}/api'
+
+# Placeholder image, created once the Tk root exists
+placeholder_image = None
+
+# Shared pooled HTTP session for every call to the backend
+session = create_session()
+
+# Search and order-status results already shown are revalidated instead of downloaded again
+etag_cache = ETagCache(session)
 
 # Display loading message
 def display_loading_message(message_label):
     message_label.config(text="Loading...")
-    root.update_idletasks()
 
 # Clear loading message
 def clear_loading_message(message_label):
@@ -22,20 +31,20 @@ def clear_loading_message(message_label):
 
 # Clear search bar and order entry field when a new search is initiated
 def clear_search_inputs():
+    cancel_suggestions()
     search_entry.delete(0, tk.END)
     order_entry.delete(0, tk.END)
    
  
     
     
-def load_intent_replies():
-    try:
-        with open("intent_replies.json", "r") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        print("Error: intent_replies.json file not found.")
-        return {}
-    
+# Match a message against the FAQ intents on the server (see intent_engine.py); the result's
+# 'intent' is None when the message should be searched as a product instead
+def fetch_intent(query):
+    response = session.get(f"{BASE_URL}/intent", params={"q": query}, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
     # Handle FAQ (intent-based) search
 def handle_faq_search():
     query = search_entry.get().strip()
@@ -45,14 +54,15 @@ def handle_faq_search():
 
     user_query_label = tk.Label(scrollable_frame, text=f"You: {query}", font=("Arial", 12), wraplength=300, bg="#F0F0F0", fg="#000000", padx=10, pady=5)
     user_query_label.pack(anchor="e", pady=5)
+    clear_search_inputs()
 
-    intent_replies = load_intent_replies()
-    if query.lower() in intent_replies:
-        display_text_response(intent_replies[query.lower()])
-        clear_search_inputs()
-    else:
-        tk.Label(scrollable_frame, text="No response found for the searched query", font=("Arial", 14), fg="black").pack(anchor="w", pady=10)
-        clear_search_inputs()
+    def show_reply(match):
+        if match["intent"] is not None:
+            display_text_response(match["reply"])
+        else:
+            tk.Label(scrollable_frame, text="No response found for the searched query", font=("Arial", 14), fg="black").pack(anchor="w", pady=10)
+
+    task_runner.submit(lambda: fetch_intent(query), show_reply, show_network_error, channel="search")
 # Handle text search
 def handle_text_search(query):
     if query.strip():
@@ -70,29 +80,132 @@ def handle_text_search(query):
     search_entry.bind("<Return>", lambda event: handle_text_search(search_entry.get()))
     scrollable_frame.bind("<MouseWheel>", lambda event: scrollable_frame.yview_scroll(-1 * (event.delta // 120), "units"))
 
+    def show_results(response):
+        clear_loading_message(status_label)
+        if response.status_code == 200:
+            results = response.json()
+            # An exact title match comes back as a bare list
+            if isinstance(results, list):
+                results = {'search_results': results}
+            # Display search results heading
+            tk.Label(scrollable_frame, text="Search Results", font=("Arial", 14, "bold"), fg="BLACK").pack(anchor="w", pady=(10, 0))
+            display_product_results(results['search_results'])
+
+            # Display sentiment recommendations heading
+            if 'category_recommendations' in results:
+                display_category_recommendations(results['category_recommendations'])
+        else:
+            messagebox.showerror("Search Error", response.json().get("error", "No results found."))
+            tk.Label(scrollable_frame, text="No results found. Try another search !", font=("Arial", 14), fg="black").pack(anchor="w", pady=10)
 
+    # A newer search on the same channel supersedes this one
+    task_runner.submit(
+        lambda: etag_cache.get(f"{BASE_URL}/search", params={"query": query}, timeout=REQUEST_TIMEOUT),
+        show_results, show_network_error, channel="search")
 
-    response = requests.get(f"{BASE_URL}/search", params={"query": query})
+# Show a failed backend call (connection refused, timeout, ...) without freezing the UI
+def show_network_error(error):
     clear_loading_message(status_label)
-    if response.status_code == 200:
-        results = response.json()
-        # Display search results heading
-        tk.Label(scrollable_frame, text="Search Results", font=("Arial", 14, "bold"), fg="BLACK").pack(anchor="w", pady=(10, 0))
-        display_product_results(results['search_results'])
-        
-        # Display sentiment recommendations heading
-        if 'category_recommendations' in results:
-            display_category_recommendations(results['category_recommendations'])
-    else:
-        messagebox.showerror("Search Error", response.json().get("error", "No results found."))
-        tk.Label(scrollable_frame, text="No results found. Try another search !", font=("Arial", 14), fg="black").pack(anchor="w", pady=10)
+    messagebox.showerror("Network Error", f"An error occurred: {error}")
+
+# Typeahead: suggestions are requested once typing pauses for SUGGEST_DELAY_MS, on their own
+# channel, so a newer keystroke supersedes the request in flight and the entry never waits
+SUGGEST_DELAY_MS = 200
+SUGGEST_MIN_CHARS = 2
+pending_suggestion = None
+
+def schedule_suggestions(event):
+    global pending_suggestion
+    if event.keysym in ("Return", "Escape"):
         return
+    if pending_suggestion is not None:
+        root.after_cancel(pending_suggestion)
+    pending_suggestion = root.after(SUGGEST_DELAY_MS, request_suggestions)
+
+def request_suggestions():
+    global pending_suggestion
+    pending_suggestion = None
+    prefix = search_entry.get().strip()
+    if len(prefix) < SUGGEST_MIN_CHARS:
+        cancel_suggestions()
+        return
+    # Failed suggestions are not worth an error dialog; the list just stays hidden
+    task_runner.submit(
+        lambda: session.get(f"{BASE_URL}/suggest", params={"q": prefix}, timeout=REQUEST_TIMEOUT).json(),
+        show_suggestions, lambda error: hide_suggestions(), channel="suggest")
+
+def show_suggestions(data):
+    suggestions = [suggestion["text"] for suggestion in data.get("suggestions", [])]
+    if not suggestions or not search_entry.get().strip():
+        hide_suggestions()
+        return
+    suggestion_list.delete(0, tk.END)
+    for suggestion in suggestions:
+        suggestion_list.insert(tk.END, suggestion)
+    suggestion_list.config(height=len(suggestions))
+    suggestion_list.pack(after=search_entry, pady=(2, 0))
+
+def hide_suggestions():
+    suggestion_list.pack_forget()
+
+# Drop the pending and in-flight suggestion requests, e.g. when a search starts
+def cancel_suggestions():
+    global pending_suggestion
+    if pending_suggestion is not None:
+        root.after_cancel(pending_suggestion)
+        pending_suggestion = None
+    task_runner.cancel("suggest")
+    hide_suggestions()
+
+# Search for the clicked suggestion
+def choose_suggestion(event):
+    selection = suggestion_list.curselection()
+    if selection:
+        handle_text_search(suggestion_list.get(selection[0]))
 
 # Display text responses for intents
 def display_text_response(response):
     response_label = tk.Label(scrollable_frame, text=response, font=("Arial", 12), wraplength=300, bg="#DFF6FF", fg="#00509E", relief="solid", padx=10, pady=10)
     response_label.pack(anchor="w", pady=10)
 
+# Placeholder shown while a product thumbnail loads, or when it cannot be loaded
+def get_placeholder_image():
+    global placeholder_image
+    if placeholder_image is None:
+        placeholder = Image.open("noimages.jpg")
+        placeholder.thumbnail((100, 100))
+        placeholder_image = ImageTk.PhotoImage(placeholder)
+    return placeholder_image
+
+# Prefer the backend's pre-generated thumbnail, fall back to the remote product image
+def get_product_thumbnail_url(product):
+    if product.get('thumbnail_url'):
+        return SERVER_URL + product['thumbnail_url']
+    image_url = product.get('image_url')
+    if image_url and image_url.startswith(('http://', 'https://')):
+        return image_url
+    return None
+
+# Show a placeholder right away and swap in the thumbnail once it has loaded in the background
+def display_product_image(parent, product, **pack_options):
+    img_label = tk.Label(parent, image=get_placeholder_image())
+    img_label.image = get_placeholder_image()
+    img_label.pack(side="left", **pack_options)
+
+    url = get_product_thumbnail_url(product)
+    if not url:
+        return
+
+    def show_thumbnail(image_data):
+        # The results may have been cleared while the thumbnail was loading
+        if image_data is None or not img_label.winfo_exists():
+            return
+        img = ImageTk.PhotoImage(Image.open(io.BytesIO(image_data)))
+        img_label.config(image=img)
+        img_label.image = img
+
+    task_runner.submit(lambda: thumbnail_cache.get(url), show_thumbnail)
+
 # Display product results
 def display_product_results(products):
     
@@ -100,16 +213,7 @@ def display_product_results(products):
         result_frame = tk.Frame(scrollable_frame, borderwidth=2, relief="solid", padx=10, pady=10, height=200, bg="#FFFFFF")
         result_frame.pack(pady=10, padx=10, fill="x", anchor="w")  # Adjust height for more length
 
-        if product['image_url']:
-            image_response = requests.get(product['image_url'])
-            if image_response.status_code == 200:
-                image_data = image_response.content
-                image = Image.open(io.BytesIO(image_data))
-                image.thumbnail((100, 100))
-                img = ImageTk.PhotoImage(image)
-                img_label = tk.Label(result_frame, image=img)
-                img_label.image = img
-                img_label.pack(side="left")
+        display_product_image(result_frame, product)
 
         truncated_title = textwrap.shorten(product.get('title', 'No Title Available'), width=60)  # Default if title is missing
         truncated_review = textwrap.shorten(product.get('top_review', 'No Review Available'), width=100)  # Default review if missing
@@ -138,25 +242,7 @@ def display_category_recommendations(products):
         result_frame.pack(pady=10, padx=10, fill="x", anchor="w")
 
         # Display product image or placeholder
-        if product.get('image_url'):
-            try:
-                image_response = requests.get(product['image_url'], timeout=5)
-                image_response.raise_for_status()
-                image_data = image_response.content
-                image = Image.open(io.BytesIO(image_data))
-                image.thumbnail((100, 100))
-                img = ImageTk.PhotoImage(image)
-                img_label = tk.Label(result_frame, image=img)
-                img_label.image = img
-                img_label.pack(side="left", padx=(0, 10))
-            except (requests.RequestException, IOError):
-                # Default placeholder
-                placeholder = Image.open("noimages.jpg")
-                placeholder.thumbnail((100, 100))
-                img = ImageTk.PhotoImage(placeholder)
-                img_label = tk.Label(result_frame, image=img)
-                img_label.image = img
-                img_label.pack(side="left", padx=(0, 10))
+        display_product_image(result_frame, product, padx=(0, 10))
 
         # Product details
         truncated_title = textwrap.shorten(product.get('title', 'No Title Available'), width=60)
@@ -190,18 +276,22 @@ def handle_image_search():
 
     clear_search_inputs()  # Clear previous search inputs
     display_loading_message(status_label)
-    with open(file_path, "rb") as file:
-        response = requests.post(f"{BASE_URL}/image-search", files={"image": file})
-    clear_loading_message(status_label)
 
-    if response.status_code == 200:
-        results = response.json()
-        tk.Label(scrollable_frame, text="Image Search Results", font=("Arial", 14, "bold"), fg="black").pack(anchor="w", pady=(10, 0))
-        display_product_results(results['search_results'])
-    else:
-        messagebox.showerror("Search Error", response.json().get("error", "No results found."))
-        tk.Label(scrollable_frame, text="No results found. Try another search ", font=("Arial", 14), fg="black").pack(anchor="w", pady=10)
-        return
+    def upload_image():
+        with open(file_path, "rb") as file:
+            return session.post(f"{BASE_URL}/image-search", files={"image": file}, timeout=REQUEST_TIMEOUT)
+
+    def show_results(response):
+        clear_loading_message(status_label)
+        if response.status_code == 200:
+            results = response.json()
+            tk.Label(scrollable_frame, text="Image Search Results", font=("Arial", 14, "bold"), fg="black").pack(anchor="w", pady=(10, 0))
+            display_product_results(results['search_results'])
+        else:
+            messagebox.showerror("Search Error", response.json().get("error", "No results found."))
+            tk.Label(scrollable_frame, text="No results found. Try another search ", font=("Arial", 14), fg="black").pack(anchor="w", pady=10)
+
+    task_runner.submit(upload_image, show_results, show_network_error, channel="search")
     
 
                     
@@ -216,16 +306,19 @@ def handle_order_status_search(order_no):
 
     clear_search_inputs()  # Clear previous content
     display_loading_message(status_label)
-    response = requests.get(f"{BASE_URL}/order-status", params={"orderNo": order_no})
-    clear_loading_message(status_label)
 
-    if response.status_code == 200:
-        order_details = response.json()
-        display_order_details(order_details)
-    else:
-        messagebox.showerror("Order Status Error", response.json().get("error", "Order not found."))
-        tk.Label(scrollable_frame, text="No results found. Try a different order number!", font=("Arial", 14), fg="black").pack(anchor="w", pady=10)
-        return
+    def show_order(response):
+        clear_loading_message(status_label)
+        if response.status_code == 200:
+            order_details = response.json()
+            display_order_details(order_details)
+        else:
+            messagebox.showerror("Order Status Error", response.json().get("error", "Order not found."))
+            tk.Label(scrollable_frame, text="No results found. Try a different order number!", font=("Arial", 14), fg="black").pack(anchor="w", pady=10)
+
+    task_runner.submit(
+        lambda: etag_cache.get(f"{BASE_URL}/order-status", params={"orderNo": order_no}, timeout=REQUEST_TIMEOUT),
+        show_order, show_network_error, channel="order")
 
 # Function to clear chat history
 def clear_chat_history():
@@ -259,40 +352,40 @@ def display_order_details(details):
 
 # Voice search function
 def handle_voice_search():
-    recognizer = sr.Recognizer()
-    with sr.Microphone() as source:
-        try:
-            status_label.config(text="Listening...")
-            root.update_idletasks()
+    status_label.config(text="Listening...")
+
+    # Listening and recognition block for seconds, so they run on a worker thread
+    def listen():
+        recognizer = sr.Recognizer()
+        with sr.Microphone() as source:
             audio = recognizer.listen(source, timeout=5)
-            query = recognizer.recognize_google(audio)
-            status_label.config(text=f"You said: {query}")
-            search_entry.delete(0, tk.END)
-            search_entry.insert(0, query)
-
-            intent_replies = load_intent_replies()
-            if query.lower() in intent_replies:
-              display_text_response(intent_replies[query.lower()])
-              clear_search_inputs()
+        return recognizer.recognize_google(audio)
+
+    def handle_query(query):
+        status_label.config(text="")
+        search_entry.delete(0, tk.END)
+        search_entry.insert(0, query)
+
+        # Answer FAQ-like questions directly, search for anything else
+        def answer(match):
+            if match["intent"] is not None:
+                display_text_response(match["reply"])
+                clear_search_inputs()
             else:
                 handle_text_search(query)
-            
 
+        task_runner.submit(lambda: fetch_intent(query), answer, show_network_error, channel="search")
 
-        except sr.UnknownValueError:
-            status_label.config(text="Sorry, I couldn't understand that. Please try again.")
+    def handle_error(error):
+        status_label.config(text="")
+        if isinstance(error, sr.UnknownValueError):
             display_text_response("Sorry, I couldn't understand that.")
-        
-        except sr.RequestError:
+        elif isinstance(error, sr.RequestError):
             messagebox.showerror("Error", "Could not request results, please check your internet connection.")
-            status_label.config(text="Could not request results, please check your internet connection")
+        else:
+            display_text_response(f"Error: {str(error)}")
 
-        except Exception as e:
-            status_label.config(text=f"Error: {str(e)}")
-            display_text_response(f"Error: {str(e)}")
-            
-        finally:
-            status_label.config(text="")
+    task_runner.submit(listen, handle_query, handle_error, channel="voice")
 
             
 # Function to handle product comparison
@@ -314,23 +407,21 @@ def handle_product_comparison():
     # Display loading message
     display_loading_message(status_label)
 
-    # Make a POST request to the backend API for product comparison
-    try:
-        response = requests.post(f"{BASE_URL}/compare-products", json={"products": product_names})
+    def show_comparison(response):
         clear_loading_message(status_label)
-
         if response.status_code == 200:
             comparison_results = response.json()
             if not comparison_results:
                 messagebox.showinfo("No Results", "No products to compare. Please try different names.")
             else:
                 display_comparison_results(comparison_results)
-            
         else:
             messagebox.showerror("Comparison Error", response.json().get("error", "Unable to fetch comparison data."))
-    except requests.RequestException as e:
-        clear_loading_message(status_label)
-        messagebox.showerror("Network Error", f"An error occurred: {e}")
+
+    # Make a POST request to the backend API for product comparison
+    task_runner.submit(
+        lambda: session.post(f"{BASE_URL}/compare-products", json={"products": product_names}, timeout=REQUEST_TIMEOUT),
+        show_comparison, show_network_error, channel="search")
 
 # Function to display comparison results
 def display_comparison_results(products):
@@ -393,6 +484,11 @@ root.title("Smart Bot")
 root.geometry("1000x800")
 root.config(bg="#3B2F2F")
 
+# Backend calls, speech recognition and thumbnails run on worker threads; results come
+# back to the main loop through the task runner. Thumbnails go through a memory + disk cache.
+task_runner = TaskRunner(root)
+thumbnail_cache = ThumbnailCache(session=session)
+
 # Create a frame for the whole background (fill the entire window)
 background_frame = tk.Frame(root, bg="#3B2F2F")
 background_frame.pack(fill="both", expand=True)
@@ -423,6 +519,12 @@ general_search_label.pack(pady=(10, 0))
 # Product search box
 search_entry = tk.Entry(background_frame, font=("Arial", 12), bg="#F0F0F0", fg="#000000")
 search_entry.pack(pady=(10, 0))
+search_entry.bind("<KeyRelease>", schedule_suggestions)
+search_entry.bind("<Escape>", lambda event: cancel_suggestions())
+
+# Typeahead suggestions, shown under the search box while typing
+suggestion_list = tk.Listbox(background_frame, font=("Arial", 11), width=40, bg="#FFFFFF", fg="#000000", activestyle="none")
+suggestion_list.bind("<<ListboxSelect>>", choose_suggestion)
 
 # Frame for buttons
 button_frame = tk.Frame(background_frame, bg="#3B2F2F", padx=20, pady=20)
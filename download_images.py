@@ -1,39 +1,151 @@
+import argparse
+import hashlib
+import json
 import os
-import requests
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import BytesIO
+
 import pandas as pd
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# Load Amazon product dataset
-amazon_data = pd.read_csv('data/amazon-products.csv')  # Update the path if needed
+from hot_reload import replacing
 
-# Directory to store downloaded images
+# Directory to store downloaded images. Files are named by the SHA-256 of their content,
+# and manifest.json maps each product id to its file.
 image_dir = "data/downloaded_images"
-if not os.path.exists(image_dir):
-    os.makedirs(image_dir)
-
-# Function to download and save image
-def download_image(image_url, product_title):
-    try:
-        response = requests.get(image_url)
-        img = Image.open(BytesIO(response.content))
-        # Create a safe file name based on the product title
-        file_name = f"{product_title[:50].replace(' ', '_')}.jpg"  # Limit the file name length
-        file_path = os.path.join(image_dir, file_name)
-        img.save(file_path)
-        return file_path
-    except Exception as e:
-        print(f"Error downloading {image_url}: {e}")
-        return None
-
-# Download all product images
-def download_all_images():
-    for idx, row in amazon_data.iterrows():
-        image_url = row['image_url']
-        if pd.notna(image_url):
-            file_path = download_image(image_url, row['title'])
-            if file_path:
-                print(f"Downloaded: {file_path}")
+MANIFEST_NAME = "manifest.json"
+
+# Pre-resized copies written next to each original, by subdirectory
+DERIVATIVE_SIZES = {
+    'thumbnails': (100, 100),
+    'small': (224, 224),
+}
+
+# (connect, read) timeouts in seconds
+TIMEOUT = (5, 20)
+
+
+# Product id used as the manifest key: the ASIN when the product has one, else the row number
+def product_ids(df):
+    row_numbers = pd.Series(df.index.astype(str), index=df.index)
+    if 'asin' not in df.columns:
+        return row_numbers
+    # Missing ASINs would all become "nan" and share one manifest entry
+    asins = df['asin'].astype(object)
+    return asins.where(asins.notna(), row_numbers).astype(str)
+
+
+def load_manifest(directory=image_dir):
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, directory=image_dir):
+    with replacing(os.path.join(directory, MANIFEST_NAME)) as temp_path:
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+# One pooled session with retries and backoff, shared by all download threads
+def create_session(pool_size=16, retries=3, backoff=0.5):
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=['GET'])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# Function to resize images for the derivative copies (keeps the aspect ratio)
+def resize_image(image, size):
+    image = image.copy()
+    image.thumbnail(size)
+    return image
+
+
+# Write through a temporary file so readers never see a partial image
+def save_image(img, path):
+    with replacing(path) as temp_path:
+        img.save(temp_path, format='JPEG')
+
+
+# Function to download one image and store it, and its derivatives, under its content hash
+def download_image(session, image_url, directory=image_dir):
+    response = session.get(image_url, timeout=TIMEOUT)
+    response.raise_for_status()
+    digest = hashlib.sha256(response.content).hexdigest()
+    file_name = f"{digest}.jpg"
+    file_path = os.path.join(directory, file_name)
+
+    # Another product may already have fetched the same picture
+    if not os.path.exists(file_path):
+        img = Image.open(BytesIO(response.content)).convert('RGB')
+        for subdirectory, size in DERIVATIVE_SIZES.items():
+            save_image(resize_image(img, size), os.path.join(directory, subdirectory, file_name))
+        save_image(img, file_path)
+    return {'file': file_name, 'url': image_url, 'sha256': digest}
+
+
+def download_all_images(amazon_data, directory=image_dir, session=None, workers=16, save_every=100):
+    """Download every product image that is not already in the manifest.
+
+    Returns the manifest. Downloads are resumable: the manifest is saved every
+    `save_every` images, and a product is skipped when its URL is unchanged
+    and its file is still on disk.
+    """
+    for subdirectory in DERIVATIVE_SIZES:
+        os.makedirs(os.path.join(directory, subdirectory), exist_ok=True)
+    session = session or create_session(pool_size=workers)
+    manifest = load_manifest(directory)
+
+    # Group products by URL so a shared image is only fetched once
+    pending = {}
+    for product_id, image_url in zip(product_ids(amazon_data), amazon_data['image_url']):
+        if pd.isna(image_url):
+            continue
+        entry = manifest.get(product_id)
+        if entry and entry['url'] == image_url and os.path.exists(os.path.join(directory, entry['file'])):
+            continue
+        pending.setdefault(image_url, []).append(product_id)
+    print(f"{len(pending)} images to download")
+
+    completed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(download_image, session, image_url, directory): image_url
+                   for image_url in pending}
+        for future in as_completed(futures):
+            image_url = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                print(f"Error downloading {image_url}: {e}")
+                continue
+            for product_id in pending[image_url]:
+                manifest[product_id] = entry
+            completed += 1
+            if completed % save_every == 0:
+                save_manifest(manifest, directory)
+                print(f"Downloaded {completed}/{len(pending)}")
+
+    save_manifest(manifest, directory)
+    print(f"Downloaded {completed}/{len(pending)}")
+    return manifest
+
 
 if __name__ == "__main__":
-    download_all_images()
+    parser = argparse.ArgumentParser(description="Download product images into a content-addressed store.")
+    parser.add_argument('--source', default='data/amazon-products.csv', help="product CSV with image_url")
+    parser.add_argument('--image-dir', default=image_dir)
+    parser.add_argument('--workers', type=int, default=16, help="concurrent downloads")
+    args = parser.parse_args()
+
+    # Load Amazon product dataset
+    amazon_data = pd.read_csv(args.source)
+    download_all_images(amazon_data, args.image_dir, workers=args.workers)
@@ -0,0 +1,68 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+@contextlib.contextmanager
+def replacing(path):
+    """Yield a temporary path that is moved over `path` once the block succeeds.
+
+    The temporary name is private to this process and thread, so concurrent
+    writers never truncate each other's file, and readers only ever see the
+    old or the new complete file.
+    """
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        yield temp_path
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+
+
+def read_manifest(directory):
+    """The manifest.json of a directory of generations, or None when nothing was published yet."""
+    try:
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(directory, manifest):
+    """Make `manifest` current with one atomic rename; files it names must be written before."""
+    with replacing(os.path.join(directory, 'manifest.json')) as temp_path:
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+
+
+def remove_files(directory, names):
+    """Delete the files of a generation no reader uses any more."""
+    for name in names:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass  # Missing, or still mapped by a reader on Windows
+
+
+def poll_for_changes(name, interval, check, action):
+    """Call check() every `interval` seconds from a daemon thread named `name`.
+
+    A failing check is reported as "Failed to <action>" and retried on the
+    next poll, so the caller keeps serving its last good state (e.g. while a
+    file is half-written).
+    """
+    def poll():
+        while True:
+            time.sleep(interval)
+            try:
+                check()
+            except Exception as e:
+                print(f"Failed to {action}: {e}")
+
+    thread = threading.Thread(target=poll, name=name, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,72 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import requests
+from PIL import Image
+
+# Thumbnails shown next to results, and where they are kept between runs
+THUMBNAIL_SIZE = (100, 100)
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".smart_bot", "thumbnails")
+
+
+class ThumbnailCache:
+    """Thumbnail bytes by URL: a bounded in-memory LRU in front of an on-disk cache.
+
+    Misses are downloaded, shrunk to THUMBNAIL_SIZE and stored in both tiers, so
+    an image that has been shown once is never fetched again.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_items=256, session=None, timeout=5):
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.jpg')
+
+    def _remember(self, url, data):
+        with self.lock:
+            self.memory[url] = data
+            self.memory.move_to_end(url)
+            while len(self.memory) > self.max_items:
+                self.memory.popitem(last=False)
+
+    def get(self, url):
+        """Return JPEG thumbnail bytes for `url`, or None if it cannot be fetched."""
+        with self.lock:
+            if url in self.memory:
+                self.memory.move_to_end(url)
+                return self.memory[url]
+
+        path = self._disk_path(url)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            self._remember(url, data)
+            return data
+
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            image = Image.open(io.BytesIO(response.content)).convert('RGB')
+        except (requests.RequestException, IOError):
+            return None
+        image.thumbnail(THUMBNAIL_SIZE)
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG')
+        data = buffer.getvalue()
+
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self._remember(url, data)
+        return data
+
@@ -0,0 +1,310 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from hot_reload import read_manifest, remove_files, replacing, write_manifest
+
+# Directory where product images are downloaded and where their descriptors are stored
+IMAGE_DIR = "data/downloaded_images"
+INDEX_DIR = "data/image_index"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# ORB descriptors are 32 bytes per keypoint
+DESCRIPTOR_SIZE = 32
+
+# Number of visual words in the bag-of-visual-words signature used to shortlist candidates
+VOCABULARY_SIZE = 256
+VOCABULARY_SAMPLE = 100000
+
+
+# Function to compute ORB descriptors for a grayscale image array
+def describe_image(image):
+    import cv2
+
+    if image is None:
+        return None
+    orb = cv2.ORB_create()
+    keypoints, descriptors = orb.detectAndCompute(image, None)
+    return descriptors
+
+
+# Function to load an image from disk and compute its ORB descriptors
+def describe_image_file(image_path):
+    import cv2
+
+    return describe_image(cv2.imread(image_path, cv2.IMREAD_GRAYSCALE))
+
+
+# Function to decode an uploaded image straight from memory, shrunk so its longest side is at most max_side
+def decode_image(data, max_side=None):
+    import cv2
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is not None and max_side and max(image.shape) > max_side:
+        scale = max_side / max(image.shape)
+        size = (max(int(image.shape[1] * scale), 1), max(int(image.shape[0] * scale), 1))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    return image
+
+
+# Function to count ratio-test matches between two sets of ORB descriptors
+def match_descriptors(des1, des2):
+    import cv2
+
+    if des1 is None or des2 is None:
+        return 0
+
+    index_params = dict(algorithm=6, table_number=6, key_size=12, multi_probe_level=1)
+    search_params = dict(checks=50)
+
+    flann = cv2.FlannBasedMatcher(index_params, search_params)
+    matches = flann.knnMatch(des1, des2, k=2)
+
+    good_matches = []
+    for match_pair in matches:
+        if len(match_pair) == 2:  # Ensure there are at least two matches to unpack
+            m, n = match_pair
+            if m.distance < 0.7 * n.distance:
+                good_matches.append(m)
+
+    return len(good_matches)
+
+
+# Learn visual words by clustering a sample of ORB descriptors (bits treated as floats)
+def train_vocabulary(descriptors, size=VOCABULARY_SIZE, sample=VOCABULARY_SAMPLE):
+    from sklearn.cluster import MiniBatchKMeans
+
+    if len(descriptors) > sample:
+        rng = np.random.default_rng(0)
+        descriptors = descriptors[rng.choice(len(descriptors), sample, replace=False)]
+    bits = np.unpackbits(descriptors, axis=1).astype(np.float32)
+    kmeans = MiniBatchKMeans(n_clusters=min(size, len(bits)), random_state=0, n_init=3)
+    kmeans.fit(bits)
+    return np.packbits(kmeans.cluster_centers_ > 0.5, axis=1)
+
+
+# Global signature of an image: a normalised histogram of its descriptors' nearest visual words
+def bovw_signature(descriptors, vocabulary):
+    signature = np.zeros(len(vocabulary), dtype=np.float32)
+    if descriptors is None or len(descriptors) == 0 or len(vocabulary) == 0:
+        return signature
+    bits = np.unpackbits(descriptors, axis=1).astype(np.float32)
+    words = np.unpackbits(vocabulary, axis=1).astype(np.float32)
+    # Hamming distance between every descriptor and every word in one matrix product
+    distances = bits.sum(axis=1)[:, None] + words.sum(axis=1)[None, :] - 2 * bits @ words.T
+    counts = np.bincount(distances.argmin(axis=1), minlength=len(vocabulary)).astype(np.float32)
+    signature = np.sqrt(counts)
+    return signature / np.linalg.norm(signature)
+
+
+# List the images in the download directory with the file stats used to detect changes
+def scan_images(image_dir):
+    images = {}
+    if not os.path.isdir(image_dir):
+        return images
+    for entry in os.scandir(image_dir):
+        if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            stat = entry.stat()
+            images[entry.name] = {'size': stat.st_size, 'mtime': stat.st_mtime}
+    return images
+
+
+class ImageDescriptorIndex:
+    """ORB descriptors for every downloaded product image, stored on disk.
+
+    All descriptors live in one memory-mapped (rows, 32) uint8 array. offsets[i]
+    and offsets[i + 1] bound the rows that belong to entries[i]. signatures[i] is
+    the bag-of-visual-words vector of entries[i], used to shortlist candidates
+    before the exact ORB match. Every write goes to a new generation of files
+    and the manifest is swapped in last, so readers never see a half-written
+    index. The previous generation is kept for readers still loading it.
+
+    Only one process should write the index (python image_index.py); app
+    workers open it read-only, and outdated() tells them when to open the
+    new generation.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        self.load()
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def load(self):
+        self.generation = 0
+        self.entries = []
+        self.stats = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.descriptors = np.zeros((0, DESCRIPTOR_SIZE), dtype=np.uint8)
+        self.vocabulary = np.zeros((0, DESCRIPTOR_SIZE), dtype=np.uint8)
+        self.signatures = np.zeros((0, 0), dtype=np.float32)
+
+        # Stat before reading, so a manifest replaced in between is seen as outdated
+        self.manifest_mtime = self._manifest_mtime()
+        manifest = read_manifest(self.index_dir)
+        if manifest is not None:
+            self.generation = manifest['generation']
+            self.entries = [entry['name'] for entry in manifest['entries']]
+            self.stats = {entry['name']: {'size': entry['size'], 'mtime': entry['mtime']}
+                          for entry in manifest['entries']}
+            self.offsets = np.load(self._path(manifest['offsets']))
+            if self.offsets[-1] > 0:
+                self.descriptors = np.load(self._path(manifest['descriptors']), mmap_mode='r')
+                if 'vocabulary' in manifest:
+                    self.vocabulary = np.load(self._path(manifest['vocabulary']))
+                    self.signatures = np.load(self._path(manifest['signatures']), mmap_mode='r')
+
+        self.positions = {name: position for position, name in enumerate(self.entries)}
+
+    def _manifest_mtime(self):
+        try:
+            return os.stat(self._path('manifest.json')).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def outdated(self):
+        """True once another generation was written since load(); only stats the manifest, so it can be polled."""
+        return self._manifest_mtime() != self.manifest_mtime
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def get(self, name):
+        """Return the cached descriptors for an image, or None if it has none."""
+        position = self.positions.get(name)
+        if position is None:
+            return None
+        start, end = self.offsets[position], self.offsets[position + 1]
+        if start == end:
+            return None
+        return np.asarray(self.descriptors[start:end])
+
+    def signature(self, descriptors):
+        return bovw_signature(descriptors, self.vocabulary)
+
+    def shortlist(self, query_descriptors, positions, size):
+        """Return the `size` entries among `positions` whose signatures are closest to the query.
+
+        Positions come back ordered from most to least similar. With no
+        vocabulary (empty index) every position is returned unranked.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(self.vocabulary) == 0 or len(positions) == 0:
+            return positions
+        similarities = np.asarray(self.signatures[positions]) @ self.signature(query_descriptors)
+        if size < len(positions):
+            top = np.argpartition(-similarities, size)[:size]
+        else:
+            top = np.arange(len(positions))
+        return positions[top[np.argsort(-similarities[top], kind='stable')]]
+
+    def _changes(self, image_dir, rebuild=False):
+        current = scan_images(image_dir)
+        changed = [name for name, stat in current.items() if rebuild or self.stats.get(name) != stat]
+        removed = [name for name in self.entries if name not in current]
+        return current, changed, removed
+
+    def stale(self, image_dir=IMAGE_DIR):
+        """Number of images added, changed or deleted in `image_dir` since the index was written."""
+        _, changed, removed = self._changes(image_dir)
+        return len(changed) + len(removed)
+
+    def update(self, image_dir=IMAGE_DIR, rebuild=False):
+        """Describe new or changed images, drop deleted ones and write a new generation.
+
+        Returns (added, removed) counts. Unchanged images are copied from the
+        current index and never re-described. The visual vocabulary is only
+        retrained on a rebuild (or when there is none yet), so unchanged
+        signatures stay valid.
+        """
+        current, changed, removed = self._changes(image_dir, rebuild)
+        missing_signatures = self.offsets[-1] > 0 and len(self.vocabulary) == 0
+        if not changed and not removed and not missing_signatures:
+            return 0, 0
+
+        changed_set = set(changed)
+        names = sorted(current)
+        blocks = []
+        offsets = [0]
+        for name in names:
+            if name in changed_set:
+                descriptors = describe_image_file(os.path.join(image_dir, name))
+            else:
+                descriptors = self.get(name)
+            if descriptors is None:
+                descriptors = np.zeros((0, DESCRIPTOR_SIZE), dtype=np.uint8)
+            blocks.append(descriptors)
+            offsets.append(offsets[-1] + len(descriptors))
+
+        vocabulary = self.vocabulary
+        retrain = rebuild or len(vocabulary) == 0
+        if retrain and offsets[-1] > 0:
+            vocabulary = train_vocabulary(np.concatenate(blocks))
+        signatures = np.zeros((len(names), len(vocabulary)), dtype=np.float32)
+        for position, name in enumerate(names):
+            if retrain or name in changed_set:
+                signatures[position] = bovw_signature(blocks[position], vocabulary)
+            else:
+                signatures[position] = self.signatures[self.positions[name]]
+
+        self._write(names, current, blocks, np.array(offsets, dtype=np.int64), vocabulary, signatures)
+        self.load()
+        return len(changed), len(removed)
+
+    def rebuild(self, image_dir=IMAGE_DIR):
+        return self.update(image_dir, rebuild=True)
+
+    def _write(self, names, stats, blocks, offsets, vocabulary, signatures):
+        os.makedirs(self.index_dir, exist_ok=True)
+        previous = self.generation
+        generation = previous + 1
+        descriptors_name = f'descriptors-{generation}.npy'
+        offsets_name = f'offsets-{generation}.npy'
+        vocabulary_name = f'vocabulary-{generation}.npy'
+        signatures_name = f'signatures-{generation}.npy'
+
+        # Stream the descriptor blocks straight into the new memory-mapped file
+        with replacing(self._path(descriptors_name)) as temp_path:
+            descriptors = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.uint8,
+                                                    shape=(max(int(offsets[-1]), 1), DESCRIPTOR_SIZE))
+            for position, block in enumerate(blocks):
+                descriptors[offsets[position]:offsets[position + 1]] = block
+            descriptors.flush()
+            del descriptors
+        for name, array in ((offsets_name, offsets), (vocabulary_name, vocabulary), (signatures_name, signatures)):
+            with replacing(self._path(name)) as temp_path, open(temp_path, 'wb') as f:
+                np.save(f, array)
+
+        write_manifest(self.index_dir, {
+            'generation': generation,
+            'built_at': time.time(),
+            'descriptors': descriptors_name,
+            'offsets': offsets_name,
+            'vocabulary': vocabulary_name,
+            'signatures': signatures_name,
+            'entries': [dict(name=name, **stats[name]) for name in names],
+        })
+        # Keep the previous generation for readers that have not loaded this one yet
+        remove_files(self.index_dir, [f'{kind}-{previous - 1}.npy'
+                                      for kind in ('descriptors', 'offsets', 'vocabulary', 'signatures')])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update the ORB descriptor index for image search.")
+    parser.add_argument('--image-dir', default=IMAGE_DIR)
+    parser.add_argument('--index-dir', default=INDEX_DIR)
+    parser.add_argument('--rebuild', action='store_true', help="re-describe every image instead of only changed ones")
+    args = parser.parse_args()
+
+    index = ImageDescriptorIndex(args.index_dir)
+    if args.rebuild:
+        added, removed = index.rebuild(args.image_dir)
+    else:
+        added, removed = index.update(args.image_dir)
+    print(f"Indexed {len(index)} images ({added} described, {removed} removed)")
@@ -0,0 +1,95 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from image_index import INDEX_DIR, ImageDescriptorIndex, match_descriptors
+
+# Minimum number of good ORB matches for a catalog image to count as similar
+MATCH_THRESHOLD = 50
+
+# Index opened by each worker process; the descriptor file is memory-mapped, so
+# workers share the OS page cache and only touch the slices they are given
+_worker_index = None
+
+
+# Workers are started by a fork server instead of being forked from the app: by the first image
+# search the app runs warm-up and watcher threads, and a child forked while one of them holds a
+# lock would deadlock on it. Only this module is preloaded into the server, not __main__ (which
+# may be app.py, whose import starts those threads). Windows has no fork server, so it spawns.
+def _worker_context():
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def _init_worker(index_dir):
+    global _worker_index
+    _worker_index = ImageDescriptorIndex(index_dir)
+
+
+def _match_shard(query_descriptors, names, generation, threshold):
+    # Catch up with the generation the app matches against. A worker started after a rebuild may
+    # already be ahead of the app; it keeps its index rather than going back to the app's.
+    if _worker_index.generation < generation:
+        _worker_index.load()
+    return match_names(_worker_index, query_descriptors, names, threshold)
+
+
+# Function to match a query against catalog images one after another, in the given order
+def match_names(index, query_descriptors, names, threshold=MATCH_THRESHOLD, enough=0, deadline=None):
+    matches = []
+    for name in names:
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        similarity = match_descriptors(query_descriptors, index.get(name))
+        if similarity > threshold:
+            matches.append((name, similarity))
+            if enough and len(matches) >= enough:
+                break
+    return matches
+
+
+class ImageMatchPool:
+    """Runs ORB/FLANN matching in worker processes so it never holds the request thread's GIL.
+
+    Candidate images are cut into shards in the order given (most promising
+    first) and handed out to the workers. A few shards are kept in flight per
+    worker, so matching can stop early once `enough` matches are found or the
+    deadline passes.
+    """
+
+    def __init__(self, workers, index_dir=INDEX_DIR):
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=_worker_context(), initializer=_init_worker,
+                                            initargs=(index_dir,))
+
+    def match(self, index, query_descriptors, names, threshold=MATCH_THRESHOLD, enough=0, deadline=None):
+        """Match `names`, taken from the caller's loaded `index`; workers catch up with its generation first."""
+        shard_size = min(max(len(names) // (self.workers * 4), 4), 64)
+        shards = [names[start:start + shard_size] for start in range(0, len(names), shard_size)]
+        shards.reverse()
+
+        matches = []
+        pending = set()
+        while shards or pending:
+            while shards and len(pending) < self.workers * 2:
+                pending.add(self.executor.submit(_match_shard, query_descriptors, shards.pop(),
+                                                 index.generation, threshold))
+            timeout = None if deadline is None else max(deadline - time.perf_counter(), 0)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                matches.extend(future.result())
+            if enough and len(matches) >= enough:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+        # Shards that have not started yet are dropped; running ones finish in the background
+        for future in pending:
+            future.cancel()
+        return matches
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,126 @@
+import json
+import os
+import re
+import threading
+import warnings
+from collections import namedtuple
+from functools import lru_cache
+
+with warnings.catch_warnings():
+    # Without python-Levenshtein fuzzywuzzy falls back to difflib and warns on import; scoring only a shortlist keeps that fast
+    warnings.simplefilter('ignore')
+    from fuzzywuzzy import fuzz
+
+from hot_reload import poll_for_changes
+
+INTENT_REPLIES = 'intent_replies.json'
+
+NON_WORD_RE = re.compile(r"[^a-z0-9 ]+")
+SPACE_RE = re.compile(r'\s+')
+
+# Best intent for a query: its key and reply (None below the threshold), and a 0-100 confidence
+IntentMatch = namedtuple('IntentMatch', ['intent', 'reply', 'score'])
+
+
+# Lowercase words without punctuation, so "Where's my order??" and "wheres my order" compare equal
+def normalize_intent(text):
+    return SPACE_RE.sub(' ', NON_WORD_RE.sub('', str(text).lower().replace('-', ' '))).strip()
+
+
+def trigrams(text):
+    padded = f' {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class IntentIndex:
+    """Intent keys of one intent_replies.json, with a character trigram index over them.
+
+    A query is scored with fuzzywuzzy only against the few keys sharing the
+    most trigrams with it, instead of against every key.
+    """
+
+    def __init__(self, replies, shortlist_size=4, cache_size=4096):
+        self.replies = {}
+        for intent, reply in replies.items():
+            self.replies.setdefault(normalize_intent(intent), (intent, reply))
+        self.keys = list(self.replies)
+        self.sorted_keys = [' '.join(sorted(key.split())) for key in self.keys]
+        self.key_trigrams = [len(trigrams(key)) for key in self.keys]
+        self.postings = {}
+        for position, key in enumerate(self.keys):
+            for trigram in trigrams(key):
+                self.postings.setdefault(trigram, []).append(position)
+        self.shortlist_size = shortlist_size
+        self.best = lru_cache(maxsize=cache_size)(self._best)
+
+    def _best(self, query):
+        """(intent, reply, score) of the best matching key of a normalized query."""
+        exact = self.replies.get(query)
+        if exact is not None:
+            return exact + (100,)
+
+        query_trigrams = trigrams(query)
+        shared = {}
+        for trigram in query_trigrams:
+            for position in self.postings.get(trigram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        # Dice coefficient over trigrams picks the keys worth a fuzzy comparison
+        shortlist = sorted(shared, key=lambda position: -2 * shared[position] / (len(query_trigrams) + self.key_trigrams[position]))
+        sorted_query = ' '.join(sorted(query.split()))
+        best_key, best_score = None, 0
+        for position in shortlist[:self.shortlist_size]:
+            key = self.keys[position]
+            # Whole-string similarity, also with words sorted (fuzz.token_sort_ratio on pre-sorted keys);
+            # partial ratios would match "cart charger" to "cart"
+            score = fuzz.ratio(query, key)
+            if sorted_query != query or self.sorted_keys[position] != key:
+                score = max(score, fuzz.ratio(sorted_query, self.sorted_keys[position]))
+            if score > best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None, None, 0
+        return self.replies[best_key] + (best_score,)
+
+
+class IntentEngine:
+    """FAQ intents from intent_replies.json, matched fuzzily and reloaded when the file changes.
+
+    The index is loaded once. A reload builds a new one on the side and swaps
+    it in with one assignment, like OrderStore does with orders.
+    """
+
+    def __init__(self, source=INTENT_REPLIES, threshold=75, poll_interval=5):
+        self.source = source
+        self.threshold = threshold
+        self.poll_interval = poll_interval
+        self.reload_lock = threading.Lock()
+        self.fingerprint = None
+        self.index = IntentIndex({})
+        self.reload()
+
+    def _fingerprint(self):
+        stat = os.stat(self.source)
+        return stat.st_mtime, stat.st_size
+
+    def reload(self):
+        """Re-read the replies if the file changed. Returns True if a new index was swapped in."""
+        with self.reload_lock:
+            fingerprint = self._fingerprint()
+            if fingerprint == self.fingerprint:
+                return False
+            with open(self.source, encoding='utf-8') as f:
+                index = IntentIndex(json.load(f))
+            self.index = index
+            self.fingerprint = fingerprint
+            return True
+
+    def match(self, query, threshold=None):
+        """Best intent for `query` as an IntentMatch; intent and reply are None when it scores below the threshold."""
+        intent, reply, score = self.index.best(normalize_intent(query))
+        if score < (self.threshold if threshold is None else threshold):
+            return IntentMatch(None, None, score)
+        return IntentMatch(intent, reply, score)
+
+    def watch(self):
+        """Poll the replies file from a daemon thread and hot-reload it when it changes."""
+        return poll_for_changes('intent-watcher', self.poll_interval, self.reload, f'reload {self.source}')
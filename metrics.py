@@ -0,0 +1,145 @@
+import bisect
+import contextvars
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets, from fast cache hits to slow image searches
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Timer of the request being handled by the current thread (None outside requests or when disabled)
+current_timer = contextvars.ContextVar('current_timer', default=None)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as Prometheus exposes it."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class RequestTimer:
+    """Stage durations of one request, in the order the stages first ran."""
+
+    def __init__(self, endpoint, method):
+        self.endpoint = endpoint
+        self.method = method
+        self.start = time.perf_counter()
+        self.stages = {}
+
+    def server_timing(self, total):
+        """Server-Timing header value, durations in milliseconds."""
+        entries = [f'{stage};dur={seconds * 1000:.3f}' for stage, seconds in self.stages.items()]
+        entries.append(f'total;dur={total * 1000:.3f}')
+        return ', '.join(entries)
+
+
+class Span:
+    """Context manager adding the time spent in its block to a stage of the current request."""
+
+    __slots__ = ('stage', 'timer', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.timer = current_timer.get()
+        if self.timer is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timer is not None:
+            stages = self.timer.stages
+            stages[self.stage] = stages.get(self.stage, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class Metrics:
+    """Request counters, in-flight gauges and latency histograms per endpoint and stage.
+
+    start() and finish() bracket a request; span() times a stage of the
+    request running on the current thread and costs one context variable
+    lookup when no request is being timed. render() writes everything in the
+    Prometheus text exposition format.
+    """
+
+    def __init__(self, namespace='smart_bot'):
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.in_flight = {}
+        self.latency = {}
+        self.stage_latency = {}
+
+    def start(self, endpoint, method):
+        timer = RequestTimer(endpoint, method)
+        with self.lock:
+            self.in_flight[endpoint] = self.in_flight.get(endpoint, 0) + 1
+        return timer, current_timer.set(timer)
+
+    def finish(self, timer, token, status):
+        """Record a finished request and return its total duration in seconds."""
+        total = time.perf_counter() - timer.start
+        current_timer.reset(token)
+        endpoint = timer.endpoint
+        with self.lock:
+            self.in_flight[endpoint] -= 1
+            key = (endpoint, timer.method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault(endpoint, Histogram()).observe(total)
+            for stage, seconds in timer.stages.items():
+                self.stage_latency.setdefault((endpoint, stage), Histogram()).observe(seconds)
+        return total
+
+    @staticmethod
+    def span(stage):
+        return Span(stage)
+
+    def render(self, cache_stats=None):
+        """Prometheus text format of every metric, plus the response cache counters of `cache_stats`."""
+        name = self.namespace
+        lines = []
+        with self.lock:
+            lines.append(f'# HELP {name}_http_requests_total Requests handled, by endpoint, method and status.')
+            lines.append(f'# TYPE {name}_http_requests_total counter')
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'{name}_http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+            lines.append(f'# HELP {name}_http_requests_in_flight Requests being handled.')
+            lines.append(f'# TYPE {name}_http_requests_in_flight gauge')
+            for endpoint, count in sorted(self.in_flight.items()):
+                lines.append(f'{name}_http_requests_in_flight{{endpoint="{endpoint}"}} {count}')
+
+            lines.append(f'# HELP {name}_http_request_duration_seconds Request latency, by endpoint.')
+            lines.append(f'# TYPE {name}_http_request_duration_seconds histogram')
+            for endpoint, histogram in sorted(self.latency.items()):
+                lines.extend(histogram.lines(f'{name}_http_request_duration_seconds', f'endpoint="{endpoint}"'))
+
+            lines.append(f'# HELP {name}_stage_duration_seconds Time spent in each stage of a request.')
+            lines.append(f'# TYPE {name}_stage_duration_seconds histogram')
+            for (endpoint, stage), histogram in sorted(self.stage_latency.items()):
+                lines.extend(histogram.lines(f'{name}_stage_duration_seconds', f'endpoint="{endpoint}",stage="{stage}"'))
+
+        if cache_stats:
+            for metric, field, kind, description in (('cache_hits_total', 'hits', 'counter', 'Response cache hits.'),
+                                                     ('cache_misses_total', 'misses', 'counter', 'Response cache misses.'),
+                                                     ('cache_entries', 'entries', 'gauge', 'Responses currently cached.')):
+                lines.append(f'# HELP {name}_{metric} {description}')
+                lines.append(f'# TYPE {name}_{metric} {kind}')
+                for endpoint, stats in sorted(cache_stats.items()):
+                    lines.append(f'{name}_{metric}{{endpoint="{endpoint}"}} {stats[field]}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+from hot_reload import poll_for_changes, replacing
+
+# Order spreadsheet, and where its fast-loading Parquet copy is kept
+ORDERS_XLSX = 'data/orders_data.xlsx'
+CACHE_DIR = 'data/.cache'
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Order details as returned by /api/order-status: missing values become None
+def clean_order(order):
+    return {key: (None if value is pd.NA or pd.isna(value) else value) for key, value in order.items()}
+
+
+class OrderStore:
+    """Orders indexed by order_no, reloaded in the background when the spreadsheet changes.
+
+    The spreadsheet is converted once into a Parquet cache that is reused
+    while the source's mtime/size (or, failing that, its SHA-256) is unchanged.
+    A reload builds the new index on the side and swaps it in with one
+    assignment, so in-flight lookups keep using the index they started with.
+    """
+
+    def __init__(self, source=ORDERS_XLSX, cache_dir=CACHE_DIR, poll_interval=5):
+        self.source = source
+        self.cache_dir = cache_dir
+        self.poll_interval = poll_interval
+        self.reload_lock = threading.Lock()
+        self.changed = threading.Condition()
+        self.generation = 0
+        self.fingerprint = None
+        self.digest = None
+        self.orders = {}
+        self.reload()
+
+    def _fingerprint(self):
+        stat = os.stat(self.source)
+        return stat.st_mtime, stat.st_size
+
+    def _read(self, fingerprint):
+        name = os.path.splitext(os.path.basename(self.source))[0]
+        cache_path = os.path.join(self.cache_dir, f'{name}.parquet')
+        meta_path = os.path.join(self.cache_dir, f'{name}.meta.json')
+        mtime, size = fingerprint
+
+        meta = None
+        if os.path.exists(meta_path) and os.path.exists(cache_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta['mtime'] == mtime and meta['size'] == size:
+                return pd.read_parquet(cache_path), meta['sha256']
+
+        # The file was touched; only re-convert it if its content really changed
+        digest = file_hash(self.source)
+        if meta is None or meta['sha256'] != digest:
+            df = pd.read_excel(self.source)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Every worker converts the same spreadsheet, so each writes its own temporary file
+            with replacing(cache_path) as temp_path:
+                df.to_parquet(temp_path, index=False)
+        else:
+            df = pd.read_parquet(cache_path)
+
+        with replacing(meta_path) as temp_path:
+            with open(temp_path, 'w') as f:
+                json.dump({'mtime': mtime, 'size': size, 'sha256': digest}, f)
+        return df, digest
+
+    def reload(self):
+        """Re-read the orders if the spreadsheet changed. Returns True if a new index was swapped in."""
+        # Only one reload at a time; lookups never wait on this lock
+        with self.reload_lock:
+            fingerprint = self._fingerprint()
+            if fingerprint == self.fingerprint:
+                return False
+            df, digest = self._read(fingerprint)
+            self.fingerprint = fingerprint
+            if digest == self.digest:
+                return False
+            orders = {}
+            for order in df.to_dict('records'):
+                # Keep the first row of a repeated order number, like a boolean mask + iloc[0] did
+                orders.setdefault(order['order_no'], clean_order(order))
+            self.orders = orders
+            self.digest = digest
+            with self.changed:
+                self.generation += 1
+                self.changed.notify_all()
+            return True
+
+    def get(self, order_no):
+        """Return the details of an order, or None if it does not exist."""
+        return self.orders.get(order_no)
+
+    def get_many(self, order_nos):
+        """Resolve many order numbers against one snapshot of the index.
+
+        Returns (found, missing): details by order number, and the numbers
+        that do not exist.
+        """
+        orders = self.orders
+        found, missing = {}, []
+        for order_no in order_nos:
+            details = orders.get(order_no)
+            if details is None:
+                missing.append(order_no)
+            else:
+                found[order_no] = details
+        return found, missing
+
+    def wait_for_change(self, generation, timeout=None):
+        """Block until the orders are reloaded past `generation` (or timeout); return the current generation."""
+        with self.changed:
+            self.changed.wait_for(lambda: self.generation != generation, timeout=timeout)
+            return self.generation
+
+    def watch(self):
+        """Poll the spreadsheet from a daemon thread and hot-reload it when it changes."""
+        return poll_for_changes('order-store-watcher', self.poll_interval, self.reload, f'reload {self.source}')
@@ -0,0 +1,258 @@
+import cProfile
+import io
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_MODES = ('cprofile', 'sample')
+
+# Sort keys accepted for the function tables (pstats names)
+SORT_KEYS = ('tottime', 'cumulative', 'calls')
+
+
+def function_label(function_key):
+    file_name, line, name = function_key
+    if file_name == '~':
+        return name  # Built-in, e.g. <method 'sort' of 'list' objects>
+    return f'{name} ({file_name.rsplit("/", 1)[-1]}:{line})'
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({code.co_filename.rsplit("/", 1)[-1]}:{code.co_firstlineno})'
+
+
+def collapsed_from_stats(stats, max_depth=64, min_fraction=1e-3):
+    """Approximate collapsed stacks (microseconds of self time) from a pstats caller graph.
+
+    cProfile only records caller -> callee edges, so each function's self time
+    is split over its callers in proportion to the time spent through them,
+    recursively up to a root.
+    """
+    paths = {}
+
+    def caller_paths(function_key, visiting):
+        if function_key in paths:
+            return paths[function_key]
+        callers = stats[function_key][4]
+        total = sum(edge[3] for edge in callers.values())
+        if not callers or total <= 0 or len(visiting) >= max_depth:
+            result = [((function_key,), 1.0)]
+        else:
+            result = []
+            visiting = visiting | {function_key}
+            for caller, edge in callers.items():
+                if caller in visiting or caller not in stats:
+                    continue  # Recursion: the call is counted once, under its outermost caller
+                share = edge[3] / total
+                result.extend((path + (function_key,), fraction * share)
+                              for path, fraction in caller_paths(caller, visiting)
+                              if fraction * share >= min_fraction)
+            if not result:
+                result = [((function_key,), 1.0)]
+        paths[function_key] = result
+        return result
+
+    stacks = Counter()
+    for function_key, (_, _, tottime, _, _) in stats.items():
+        for path, fraction in caller_paths(function_key, frozenset()):
+            weight = round(tottime * fraction * 1e6)
+            if weight:
+                stacks[';'.join(function_label(key) for key in path)] += weight
+    return stacks
+
+
+class StackSampler:
+    """Daemon thread that records the stack of every registered thread each `interval` seconds.
+
+    Each sample is weighted by the microseconds since the previous one: the
+    thread only runs when it gets the GIL, which a busy request thread may
+    hold for up to the interpreter's switch interval (5 ms).
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.threads = {}
+        self.active = threading.Event()
+        self.thread = None
+
+    def start(self, thread_id):
+        stacks = Counter()
+        with self.lock:
+            self.threads[thread_id] = stacks
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self.thread.start()
+            self.active.set()
+        return stacks
+
+    def stop(self, thread_id):
+        with self.lock:
+            stacks = self.threads.pop(thread_id, Counter())
+            if not self.threads:
+                self.active.clear()
+        return stacks
+
+    def _run(self):
+        last = None
+        while True:
+            if not self.active.is_set():
+                self.active.wait()
+                last = None
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            weight = round(((now - last) if last is not None else self.interval) * 1e6)
+            last = now
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, stacks in self.threads.items():
+                    frame = frames.get(thread_id)
+                    labels = []
+                    while frame is not None:
+                        labels.append(frame_label(frame))
+                        frame = frame.f_back
+                    if labels:
+                        stacks[';'.join(reversed(labels))] += weight
+
+
+class RequestProfiler:
+    """Profiles a sampled fraction of requests and aggregates the results per endpoint.
+
+    A request is profiled when it is drawn at `sample_rate`, or when it sends
+    the profile token. At most one request is profiled at a time; the others
+    run untouched, so a small sample rate is safe to leave on. Results are
+    merged into per-endpoint buckets of `bucket_seconds` and reported over
+    the last `window_seconds`.
+
+    Modes: 'cprofile' records every call (exact call counts and times;
+    stacks are approximated from its caller graph), 'sample' records the
+    stack every `sample_interval` seconds (real stacks and lower overhead,
+    but only statistically right over many or slow requests, e.g. image
+    searches).
+    """
+
+    def __init__(self, sample_rate=0.0, mode='cprofile', window_seconds=600, bucket_seconds=60,
+                 sample_interval=0.001, token=''):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}, expected one of {PROFILE_MODES}")
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.token = token
+        self.busy = threading.Lock()
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.requests = Counter()
+        self.sampler = StackSampler(sample_interval) if mode == 'sample' else None
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or bool(self.token)
+
+    def wants(self, token=None):
+        """Whether to profile a request sending `token` (e.g. its X-Profile header)."""
+        return (bool(self.token) and token == self.token) or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def start(self):
+        """Start profiling the current thread; returns None when another request is being profiled."""
+        if not self.busy.acquire(blocking=False):
+            return None
+        if self.sampler is not None:
+            return self.sampler.start(threading.get_ident())
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish(self, endpoint, profile):
+        try:
+            if self.sampler is not None:
+                result = self.sampler.stop(threading.get_ident())
+            else:
+                profile.disable()
+                result = pstats.Stats(profile)
+        finally:
+            # Never leave profiling blocked for the requests that follow
+            self.busy.release()
+
+        bucket_start = int(time.time() // self.bucket_seconds * self.bucket_seconds)
+        with self.lock:
+            buckets = self.buckets.setdefault(endpoint, {})
+            if bucket_start not in buckets:
+                buckets[bucket_start] = result
+            elif self.sampler is not None:
+                buckets[bucket_start].update(result)
+            else:
+                buckets[bucket_start].add(result)
+            self.requests[endpoint, bucket_start] += 1
+            # Drop the buckets that left the window
+            oldest = time.time() - self.window_seconds
+            for old_start in [start for start in buckets if start + self.bucket_seconds < oldest]:
+                del buckets[old_start]
+                del self.requests[endpoint, old_start]
+
+    def endpoints(self):
+        """Profiled request count per endpoint within the window."""
+        oldest = time.time() - self.window_seconds
+        with self.lock:
+            counts = Counter()
+            for (endpoint, start), count in self.requests.items():
+                if start + self.bucket_seconds >= oldest:
+                    counts[endpoint] += count
+            return dict(counts)
+
+    def _merged(self, endpoint):
+        oldest = time.time() - self.window_seconds
+        with self.lock:
+            results = [result for start, result in self.buckets.get(endpoint, {}).items()
+                       if start + self.bucket_seconds >= oldest]
+            if self.sampler is not None:
+                return sum(results, Counter())
+            merged = pstats.Stats()
+            for result in results:
+                merged.add(result)
+            return merged
+
+    def table(self, endpoint, sort='tottime', limit=30):
+        """Hottest functions of `endpoint` as dicts, sorted by `sort` (seconds; calls are None when sampling)."""
+        merged = self._merged(endpoint)
+        rows = []
+        if self.sampler is not None:
+            self_time, total_time = Counter(), Counter()
+            for stack, microseconds in merged.items():
+                frames = stack.split(';')
+                self_time[frames[-1]] += microseconds
+                for label in set(frames):
+                    total_time[label] += microseconds
+            for label, microseconds in total_time.items():
+                rows.append({'function': label, 'calls': None, 'tottime': self_time[label] / 1e6,
+                             'cumulative': microseconds / 1e6})
+        else:
+            for function_key, (_, calls, tottime, cumulative, _) in merged.stats.items():
+                rows.append({'function': function_label(function_key), 'calls': calls,
+                             'tottime': tottime, 'cumulative': cumulative})
+        rows.sort(key=lambda row: row[sort] or 0, reverse=True)
+        return rows[:limit]
+
+    def text(self, endpoint, sort='tottime', limit=30):
+        """The classic pstats report (cprofile mode), or the table as text (sample mode)."""
+        if self.sampler is None:
+            stream = io.StringIO()
+            merged = self._merged(endpoint)
+            merged.stream = stream
+            merged.sort_stats(sort).print_stats(limit)
+            return stream.getvalue()
+        lines = [f"{'tottime':>10} {'cumulative':>10}  function"]
+        lines.extend(f"{row['tottime']:10.3f} {row['cumulative']:10.3f}  {row['function']}"
+                     for row in self.table(endpoint, sort, limit))
+        return '\n'.join(lines) + '\n'
+
+    def collapsed(self, endpoint):
+        """Collapsed stacks ("a;b;c microseconds" lines) for flamegraph.pl, speedscope and the like."""
+        merged = self._merged(endpoint)
+        stacks = merged if self.sampler is not None else collapsed_from_stats(merged.stats)
+        return ''.join(f'{stack} {weight}\n' for stack, weight in stacks.most_common())
@@ -0,0 +1,74 @@
+import numpy as np
+from scipy import sparse
+
+# Rankers /api/search can use: the original token-overlap count, BM25, title
+# embeddings (semantic_index.py), or embeddings blended with the token count
+SEARCH_RANKERS = ('legacy', 'bm25', 'semantic', 'hybrid')
+
+
+# Documents are already tokenized by the catalog build, so the vectorizer just counts them
+def _identity(tokens):
+    return tokens
+
+
+class BM25Ranker:
+    """BM25 over product titles (and optionally their categories), precomputed as a sparse matrix.
+
+    Every term weight is computed once at load time. The matrix is stored
+    column-major, so a query only touches the columns of its own terms.
+    Scoring is a single sparse matrix-vector product.
+    """
+
+    def __init__(self, title_tokens, category_lists=None, category_weight=0.3, k1=1.5, b=0.75):
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        self.vectorizer = CountVectorizer(analyzer=_identity)
+        counts = self.vectorizer.fit_transform(list(title_tokens))
+        self.vocabulary = self.vectorizer.vocabulary_
+        weights = self._bm25(counts, k1, b)
+
+        if category_lists is not None:
+            # Category names are tokenized on whitespace and share the title vocabulary
+            category_tokens = [[word for category in categories for word in category.lower().split()
+                                if word in self.vocabulary] for categories in category_lists]
+            category_counts = CountVectorizer(analyzer=_identity, vocabulary=self.vocabulary).transform(category_tokens)
+            weights = weights + category_weight * self._bm25(category_counts, k1, b)
+
+        self.matrix = weights.tocsc()
+
+    @staticmethod
+    def _bm25(counts, k1, b):
+        counts = sparse.csr_matrix(counts, dtype=np.float64)
+        documents = counts.shape[0]
+        lengths = np.asarray(counts.sum(axis=1)).ravel()
+        average_length = lengths.mean() if documents and lengths.mean() > 0 else 1.0
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log(1 + (documents - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        # Row of every stored value, to look up its document length
+        rows = np.repeat(np.arange(documents), np.diff(counts.indptr))
+        tf = counts.data
+        counts.data = idf[counts.indices] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[rows] / average_length))
+        return counts
+
+    def scores(self, processed_query):
+        """Return (row_ids, scores) of every product sharing at least one term with the query."""
+        columns = sorted({self.vocabulary[token] for token in processed_query if token in self.vocabulary})
+        if not columns:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        query = sparse.csc_matrix((np.ones(len(columns)), (columns, np.zeros(len(columns), dtype=np.int64))),
+                                  shape=(self.matrix.shape[1], 1))
+        result = (self.matrix @ query).tocsc()
+        return result.indices.astype(np.int64), result.data
+
+    def top_k(self, processed_query, k, tiebreak=None):
+        """Return the best `k` (row_id, score) pairs, ties broken by `tiebreak` (higher first) then row order."""
+        row_ids, scores = self.scores(processed_query)
+        if len(row_ids) > k:
+            # Keep everything scoring at least the k-th best, so ties at the cut-off are ranked fairly
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            keep = scores >= kth
+            row_ids, scores = row_ids[keep], scores[keep]
+        secondary = tiebreak[row_ids] if tiebreak is not None else np.zeros(len(row_ids))
+        order = np.lexsort((row_ids, -secondary, -scores))[:k]
+        return [(int(row_ids[i]), float(scores[i])) for i in order]
@@ -0,0 +1,47 @@
+import numpy as np
+
+# Orders a recommendation list can be sorted by
+RECOMMENDATION_ORDERS = ('sentiment', 'rating', 'blended')
+
+
+# Scores per order: sentiment is VADER compound (-1..1), rating is 0..5 stars,
+# blended averages both after scaling them to 0..1
+def recommendation_scores(sentiment_scores, ratings):
+    sentiment_scores = np.nan_to_num(np.asarray(sentiment_scores, dtype=np.float64))
+    ratings = np.nan_to_num(np.asarray(ratings, dtype=np.float64))
+    return {
+        'sentiment': sentiment_scores,
+        'rating': ratings,
+        'blended': 0.5 * (sentiment_scores + 1) / 2 + 0.5 * ratings / 5,
+    }
+
+
+class CategoryRecommendationIndex:
+    """Pre-sorted top-K products for every category path, built when the catalog is loaded.
+
+    Keys are the lowercase category paths of the products' parsed category
+    lists, e.g. ('women', 'clothing', 'dresses'), so a leaf shared by two
+    departments is not mixed. The empty path holds every product: the old
+    substring scan matched all of them for a product without a category.
+    Ties keep catalog order, like a stable sort over a full scan would.
+    """
+
+    def __init__(self, category_lists, sentiment_scores, ratings, top_k=20):
+        members = {(): []}
+        for row_id, categories in enumerate(category_lists):
+            members[()].append(row_id)
+            path = tuple(category.lower() for category in categories)
+            if path:
+                members.setdefault(path, []).append(row_id)
+
+        self.top_k = top_k
+        self.index = {order: {} for order in RECOMMENDATION_ORDERS}
+        for order, scores in recommendation_scores(sentiment_scores, ratings).items():
+            for path, row_ids in members.items():
+                row_ids = np.asarray(row_ids, dtype=np.int64)
+                ranked = row_ids[np.argsort(-scores[row_ids], kind='stable')[:top_k]]
+                self.index[order][path] = ranked.tolist()
+
+    def recommend(self, categories, order='sentiment', k=5):
+        """Row ids of the top `k` products whose category path is exactly `categories`."""
+        return self.index[order].get(tuple(category.lower() for category in categories), [])[:k]
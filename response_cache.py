@@ -0,0 +1,70 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# A cached response: JSON body bytes, HTTP status, strong ETag and expiry time
+CacheEntry = namedtuple('CacheEntry', ['body', 'status', 'etag', 'expires'])
+
+
+class ResponseCache:
+    """Size-bounded LRU of serialized JSON responses, keyed by (endpoint, normalized request).
+
+    Every endpoint has its own TTL (0 disables caching it). Entries are
+    stored serialized, so a hit costs no JSON encoding and its ETag is
+    computed once. Anything with the same get/put/invalidate/stats methods
+    can stand in for it, e.g. a cache shared between worker processes.
+    """
+
+    def __init__(self, max_items=1024, ttls=None):
+        self.max_items = max_items
+        self.ttls = dict(ttls or {})
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+
+    def get(self, endpoint, key):
+        """Return the live CacheEntry for `key`, or None (counted as a miss)."""
+        with self.lock:
+            entry = self.entries.get((endpoint, key))
+            if entry is not None and entry.expires <= time.monotonic():
+                del self.entries[(endpoint, key)]
+                entry = None
+            if entry is None:
+                self.misses[endpoint] = self.misses.get(endpoint, 0) + 1
+                return None
+            self.entries.move_to_end((endpoint, key))
+            self.hits[endpoint] = self.hits.get(endpoint, 0) + 1
+            return entry
+
+    def put(self, endpoint, key, body, status=200):
+        """Store a serialized response and return its CacheEntry (not stored when the endpoint's TTL is 0)."""
+        entry = CacheEntry(body, status, hashlib.sha1(body).hexdigest(),
+                           time.monotonic() + self.ttls.get(endpoint, 0))
+        if self.ttls.get(endpoint, 0) <= 0 or self.max_items <= 0:
+            return entry
+        with self.lock:
+            self.entries[(endpoint, key)] = entry
+            self.entries.move_to_end((endpoint, key))
+            while len(self.entries) > self.max_items:
+                self.entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, *endpoints):
+        """Drop the entries of `endpoints`, or every entry when none are given."""
+        with self.lock:
+            if not endpoints:
+                self.entries.clear()
+                return
+            for cache_key in [cache_key for cache_key in self.entries if cache_key[0] in endpoints]:
+                del self.entries[cache_key]
+
+    def stats(self):
+        with self.lock:
+            sizes = {}
+            for endpoint, _ in self.entries:
+                sizes[endpoint] = sizes.get(endpoint, 0) + 1
+            return {endpoint: {'hits': self.hits.get(endpoint, 0), 'misses': self.misses.get(endpoint, 0),
+                               'entries': sizes.get(endpoint, 0), 'ttl': ttl}
+                    for endpoint, ttl in self.ttls.items()}
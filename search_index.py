@@ -0,0 +1,221 @@
+import bisect
+import hashlib
+import itertools
+import re
+from collections import defaultdict
+
+import numpy as np
+
+# Raw lowercase words, used to narrow down candidates for the phrase fallback
+WORD_RE = re.compile(r'\w+')
+
+# NLTK data used by preprocess_text and by the catalog's VADER sentiment scores, by download
+# name and path inside nltk_data
+NLTK_RESOURCES = {'punkt_tab': 'tokenizers/punkt_tab/english/', 'stopwords': 'corpora/stopwords',
+                  'vader_lexicon': 'sentiment/vader_lexicon.zip'}
+
+_stop_words = None
+
+
+# Look the NLTK data up on disk and only go to the network for what is missing
+def ensure_nltk_data(resources=NLTK_RESOURCES):
+    import nltk
+
+    for name, path in resources.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            print(f"NLTK resource {name} is missing, downloading it")
+            nltk.download(name, quiet=True)
+
+
+# Load the English stopword set once instead of on every call
+def get_stop_words():
+    global _stop_words
+    if _stop_words is None:
+        from nltk.corpus import stopwords
+
+        _stop_words = set(stopwords.words('english'))
+    return _stop_words
+
+
+# Preprocess text (remove stopwords, tokenize, and lower case)
+def preprocess_text(text):
+    from nltk.tokenize import word_tokenize
+
+    tokens = word_tokenize(text.lower())
+    stop_words = get_stop_words()
+    tokens = [word for word in tokens if word not in stop_words and word.isalnum()]
+    return tokens
+
+
+def _encode(text):
+    return text.encode('utf-8', 'surrogatepass')
+
+
+# 64-bit hash of a lowercased title, for exact-title lookups without a dictionary of titles
+def _title_hash(lower_title):
+    return int.from_bytes(hashlib.blake2b(_encode(lower_title), digest_size=8).digest(), 'little')
+
+
+class PostingLists:
+    """Ascending row ids per term, stored as flat arrays that can be saved and memory-mapped.
+
+    The terms' UTF-8 bytes are concatenated in sorted order, term i being
+    term_bytes[term_offsets[i]:term_offsets[i + 1]], so a term is found with
+    bisect. Its rows are rows[indptr[i]:indptr[i + 1]].
+    """
+
+    ARRAYS = ('term_bytes', 'term_offsets', 'indptr', 'rows')
+
+    def __init__(self, term_bytes, term_offsets, indptr, rows):
+        self.term_bytes = term_bytes
+        self.term_offsets = term_offsets
+        self.indptr = indptr
+        self.rows = rows
+
+    @classmethod
+    def build(cls, postings):
+        """PostingLists of a {term: ascending row ids} dictionary."""
+        terms = sorted((_encode(term), rows) for term, rows in postings.items())
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        term_offsets[1:] = np.cumsum([len(term) for term, _ in terms])
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(rows) for _, rows in terms])
+        return cls(np.frombuffer(b''.join(term for term, _ in terms), dtype=np.uint8), term_offsets, indptr,
+                   np.fromiter(itertools.chain.from_iterable(rows for _, rows in terms), dtype=np.int32,
+                               count=indptr[-1]))
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def _term(self, i):
+        return self.term_bytes[self.term_offsets[i]:self.term_offsets[i + 1]].tobytes()
+
+    def get(self, term):
+        """The ascending rows of `term` (empty when it is not indexed)."""
+        key = _encode(term)
+        i = bisect.bisect_left(range(len(self)), key, key=self._term)
+        if i < len(self) and self._term(i) == key:
+            return self.rows[self.indptr[i]:self.indptr[i + 1]]
+        return self.rows[:0]
+
+
+class ProductSearchIndex:
+    """Inverted index over product titles, built once per catalog generation.
+
+    Row ids are positions in the catalog DataFrame. Posting lists are kept in
+    ascending row order so results come out in the same order as a full scan.
+    Apart from the titles the index is only flat arrays (see arrays()), so the
+    shared catalog saves it with each generation and workers map it instead
+    of building their own copy.
+    """
+
+    POSTINGS = ('postings', 'word_postings', 'title_words')
+    ARRAYS = ('exact_hashes', 'exact_rows') + tuple(
+        f'{name}.{array}' for name in POSTINGS for array in PostingLists.ARRAYS)
+
+    def __init__(self, titles, title_tokens=None):
+        postings = defaultdict(list)
+        word_postings = defaultdict(list)
+        title_words = defaultdict(list)
+        exact_titles = {}
+
+        for row_id, title in enumerate(titles):
+            title = title if isinstance(title, str) else ''
+            lower_title = title.lower()
+            exact_titles.setdefault(lower_title, row_id)
+
+            tokens = title_tokens[row_id] if title_tokens is not None else preprocess_text(title)
+            for token in set(tokens):
+                postings[token].append(row_id)
+            for word in set(WORD_RE.findall(lower_title)):
+                word_postings[word].append(row_id)
+            for word in set(lower_title.split()):
+                title_words[word].append(row_id)
+
+        self.titles = titles
+        # First row of each distinct title by title hash; a lookup compares the titles too
+        hashes = np.fromiter(map(_title_hash, exact_titles), dtype=np.uint64, count=len(exact_titles))
+        order = np.argsort(hashes, kind='stable')
+        self.exact_hashes = hashes[order]
+        self.exact_rows = np.fromiter(exact_titles.values(), dtype=np.int32, count=len(exact_titles))[order]
+        self.postings = PostingLists.build(postings)
+        self.word_postings = PostingLists.build(word_postings)
+        self.title_words = PostingLists.build(title_words)
+
+    @classmethod
+    def from_arrays(cls, titles, arrays):
+        """The index of `titles` from the arrays() of an index built over the same titles."""
+        index = cls.__new__(cls)
+        index.titles = titles
+        index.exact_hashes = arrays['exact_hashes']
+        index.exact_rows = arrays['exact_rows']
+        for name in cls.POSTINGS:
+            setattr(index, name, PostingLists(*(arrays[f'{name}.{array}'] for array in PostingLists.ARRAYS)))
+        return index
+
+    def arrays(self):
+        """{name: NumPy array} of everything but the titles, named as in ARRAYS."""
+        arrays = {'exact_hashes': self.exact_hashes, 'exact_rows': self.exact_rows}
+        for name in self.POSTINGS:
+            for array in PostingLists.ARRAYS:
+                arrays[f'{name}.{array}'] = getattr(getattr(self, name), array)
+        return arrays
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _lower_title(self, row_id):
+        title = self.titles[row_id]
+        return title.lower() if isinstance(title, str) else ''
+
+    def exact_match(self, query):
+        """Return the first row whose title equals the query (case-insensitive), or None."""
+        lower_query = query.lower()
+        query_hash = np.uint64(_title_hash(lower_query))
+        start = np.searchsorted(self.exact_hashes, query_hash, 'left')
+        end = np.searchsorted(self.exact_hashes, query_hash, 'right')
+        for row_id in self.exact_rows[start:end].tolist():
+            if self._lower_title(row_id) == lower_query:
+                return row_id
+        return None
+
+    def title_word_matches(self, word):
+        """Rows whose title has `word` as one of its whitespace-separated words (case-insensitive)."""
+        return self.title_words.get(word.lower())
+
+    def match_scores(self, processed_query):
+        """Count how many distinct query tokens appear in each matching title."""
+        scores = defaultdict(int)
+        for token in set(processed_query):
+            for row_id in self.postings.get(token).tolist():
+                scores[row_id] += 1
+        return scores
+
+    def phrase_matches(self, query):
+        """Rows whose title contains the whole query as a word-bounded phrase."""
+        lower_query = query.lower()
+        pattern = re.compile(r'\b' + re.escape(lower_query) + r'\b')
+        words = set(WORD_RE.findall(lower_query))
+
+        if words:
+            # Every word of the phrase must appear as a full word in the title
+            posting_lists = sorted((self.word_postings.get(word) for word in words), key=len)
+            candidates = posting_lists[0]
+            for posting in posting_lists[1:]:
+                if not len(candidates):
+                    break
+                candidates = np.intersect1d(candidates, posting, assume_unique=True)
+            candidates = candidates.tolist()
+        else:
+            candidates = range(len(self))
+
+        return [row_id for row_id in candidates if pattern.search(self._lower_title(row_id))]
+
+    def search(self, query, processed_query):
+        """Return {row_id: match_score} for every row matched by tokens or by phrase."""
+        scores = self.match_scores(processed_query)
+        for row_id in self.phrase_matches(query):
+            scores.setdefault(row_id, 0)
+        return dict(sorted(scores.items()))
@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import os
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from hot_reload import read_manifest, remove_files, replacing, write_manifest
+
+# Small sentence-embedding model run on CPU, and where the title embeddings are stored
+EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+EMBEDDING_DIR = 'data/embeddings'
+
+# Rows scored per matrix product when scanning the index
+BLOCK_SIZE = 65536
+
+
+# Fingerprint of the catalog titles an index was built from, to detect a stale index
+def titles_digest(titles):
+    digest = hashlib.sha256()
+    for title in titles:
+        digest.update(str(title).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+# Symmetric int8 quantization with one scale per vector
+def quantize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    quantized = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class TitleEncoder:
+    """Mean-pooled, L2-normalised sentence embeddings from a transformers model on CPU.
+
+    torch and transformers are imported on first use, so the app starts
+    without them when semantic search is not used.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, max_length=64):
+        from transformers import AutoModel, AutoTokenizer
+
+        self.model_name = model_name
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+
+    def encode(self, texts, batch_size=64):
+        import torch
+
+        batches = []
+        with torch.inference_mode():
+            for start in range(0, len(texts), batch_size):
+                tokens = self.tokenizer([str(text) for text in texts[start:start + batch_size]], padding=True,
+                                        truncation=True, max_length=self.max_length, return_tensors='pt')
+                hidden = self.model(**tokens).last_hidden_state
+                mask = tokens['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                batches.append(torch.nn.functional.normalize(pooled, dim=1).numpy())
+        if not batches:
+            return np.zeros((0, self.model.config.hidden_size), dtype=np.float32)
+        return np.concatenate(batches).astype(np.float32)
+
+
+class SemanticIndex:
+    """int8 title embeddings in a memory-mapped file, scanned with blocked dot products.
+
+    vectors[i] * scales[i] approximates the embedding of catalog row
+    row_ids[i]. With IVF partitioning, the vectors are stored grouped by their
+    nearest centroid (offsets[p] to offsets[p + 1] is partition p), so a query
+    only scans the `nprobe` partitions closest to it. Every worker maps the
+    same file, so the OS page cache holds a single copy. Queries are encoded
+    with `encoder_class` (TitleEncoder unless a test passes another), loaded
+    once by load_encoder() or by the first query.
+    """
+
+    def __init__(self, index_dir=EMBEDDING_DIR, cache_size=1024, encoder_class=TitleEncoder):
+        self.index_dir = index_dir
+        self.encoder_class = encoder_class
+        self.encoder = None
+        self.encoder_lock = threading.Lock()
+        # Repeated queries skip the transformer forward pass
+        self.embed_query = lru_cache(maxsize=cache_size)(self._embed_query)
+        self.load()
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def load(self):
+        self.manifest = read_manifest(self.index_dir)
+        if self.manifest is None:
+            return False
+        self.vectors = np.load(self._path(self.manifest['vectors']), mmap_mode='r')
+        self.scales = np.load(self._path(self.manifest['scales']))
+        self.row_ids = np.load(self._path(self.manifest['row_ids']))
+        self.centroids = np.load(self._path(self.manifest['centroids']))
+        self.offsets = np.load(self._path(self.manifest['offsets']))
+        self.positions = np.empty(len(self.row_ids), dtype=np.int64)
+        self.positions[self.row_ids] = np.arange(len(self.row_ids))
+        self.embed_query.cache_clear()
+        return True
+
+    def is_current(self, titles):
+        """True if the index was built from exactly these catalog titles."""
+        return self.manifest is not None and self.manifest['titles_sha256'] == titles_digest(titles)
+
+    def load_encoder(self):
+        """Load the query encoder of the indexed model; concurrent callers wait for the same load."""
+        with self.encoder_lock:
+            if self.encoder is None:
+                self.encoder = self.encoder_class(self.manifest['model'])
+        return self.encoder
+
+    def _embed_query(self, query):
+        encoder = self.encoder if self.encoder is not None else self.load_encoder()
+        return encoder.encode([query])[0]
+
+    def _scan(self, query_vector, start, end, k):
+        """Top `k` (positions, scores) among stored vectors [start, end), one block at a time."""
+        best_positions, best_scores = [], []
+        for block_start in range(start, end, BLOCK_SIZE):
+            block_end = min(block_start + BLOCK_SIZE, end)
+            scores = (self.vectors[block_start:block_end].astype(np.float32) @ query_vector) \
+                * self.scales[block_start:block_end]
+            if len(scores) > k:
+                keep = np.argpartition(-scores, k - 1)[:k]
+            else:
+                keep = np.arange(len(scores))
+            best_positions.append(keep + block_start)
+            best_scores.append(scores[keep])
+        if not best_positions:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return np.concatenate(best_positions), np.concatenate(best_scores)
+
+    def search(self, query, k=5, nprobe=8):
+        """Return the `k` (row_id, score) pairs whose titles are closest to `query`, best first."""
+        query_vector = self.embed_query(query)
+        if len(self.centroids) > 1:
+            partitions = np.argsort(-(self.centroids @ query_vector), kind='stable')[:nprobe]
+        else:
+            partitions = range(len(self.offsets) - 1)
+        results = [self._scan(query_vector, self.offsets[p], self.offsets[p + 1], k) for p in partitions]
+        positions = np.concatenate([positions for positions, _ in results])
+        scores = np.concatenate([scores for _, scores in results])
+        row_ids = self.row_ids[positions]
+        order = np.lexsort((row_ids, -scores))[:k]
+        return [(int(row_ids[i]), float(scores[i])) for i in order]
+
+    def scores(self, query, row_ids):
+        """Similarity of `query` to the given catalog rows, e.g. to rerank lexical candidates."""
+        positions = self.positions[np.asarray(row_ids, dtype=np.int64)]
+        return (self.vectors[positions].astype(np.float32) @ self.embed_query(query)) * self.scales[positions]
+
+    def build(self, titles, model_name=EMBEDDING_MODEL, batch_size=64, partitions=0):
+        """Encode every title and write a new index, swapping the manifest in last."""
+        os.makedirs(self.index_dir, exist_ok=True)
+        titles = list(titles)
+        encoder = self.encoder_class(model_name)
+        quantized, scales = quantize(encoder.encode(titles, batch_size))
+
+        # IVF: group the vectors by their nearest k-means centroid
+        if partitions > 1 and len(titles) > partitions:
+            from sklearn.cluster import MiniBatchKMeans
+
+            kmeans = MiniBatchKMeans(n_clusters=partitions, random_state=0, n_init=3)
+            assignments = kmeans.fit_predict(quantized.astype(np.float32) * scales[:, None])
+            centroids = kmeans.cluster_centers_.astype(np.float32)
+            row_ids = np.argsort(assignments, kind='stable')
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=partitions))])
+        else:
+            centroids = np.zeros((0, quantized.shape[1]), dtype=np.float32)
+            row_ids = np.arange(len(titles))
+            offsets = np.array([0, len(titles)])
+
+        generation = (self.manifest or {}).get('generation', 0) + 1
+        arrays = {'vectors': quantized[row_ids], 'scales': scales[row_ids], 'row_ids': row_ids.astype(np.int64),
+                  'centroids': centroids, 'offsets': offsets.astype(np.int64)}
+        files = {kind: f'{kind}-{generation}.npy' for kind in arrays}
+        for kind, array in arrays.items():
+            with replacing(self._path(files[kind])) as temp_path, open(temp_path, 'wb') as f:
+                np.save(f, array)
+
+        write_manifest(self.index_dir, dict(files, generation=generation, built_at=time.time(), model=model_name,
+                                            rows=len(titles), titles_sha256=titles_digest(titles)))
+        # Keep the previous generation for workers that have not reloaded yet
+        remove_files(self.index_dir, [f'{kind}-{generation - 2}.npy' for kind in arrays])
+        self.load()
+
+
+if __name__ == "__main__":
+    from catalog import load_catalog
+
+    parser = argparse.ArgumentParser(description="Encode product titles into the int8 semantic search index.")
+    parser.add_argument('--index-dir', default=EMBEDDING_DIR)
+    parser.add_argument('--model', default=EMBEDDING_MODEL)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--partitions', type=int, default=0,
+                        help="IVF partitions for large catalogs, e.g. the square root of the product count")
+    args = parser.parse_args()
+
+    start = time.time()
+    index = SemanticIndex(args.index_dir)
+    index.build(load_catalog()['title'], args.model, args.batch_size, args.partitions)
+    print(f"Encoded {index.manifest['rows']} titles with {args.model} in {time.time() - start:.1f}s")
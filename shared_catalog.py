@@ -0,0 +1,110 @@
+import os
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from catalog import CATALOG_PATH, SOURCE_CSV, catalog_source, load_catalog, pandas_dtype
+from hot_reload import poll_for_changes, read_manifest, remove_files, replacing, write_manifest
+from search_index import ProductSearchIndex
+
+# Where the published catalog generations are kept
+SHARED_DIR = 'data/shared'
+
+
+def source_fingerprint(path):
+    """[path, mtime, size] of the file a generation is published from, as recorded in the manifest."""
+    stat = os.stat(path)
+    return [path, stat.st_mtime, stat.st_size]
+
+
+class SharedCatalog:
+    """The enriched catalog and its title search index, published once as memory-mapped files.
+
+    Every worker process maps the same catalog-<generation>.arrow file and
+    search-<generation>-*.npy arrays read-only, so their pages live once in
+    the OS page cache instead of once per worker. The DataFrame built on top
+    keeps text and list columns as the mapped Arrow arrays, and numeric
+    columns without missing values as NumPy views of them; numeric columns
+    with missing values and categorical codes are copied. publish() writes a
+    new generation and swaps the manifest in last. Workers pick it up with
+    attach(), or automatically with watch(), without restarting.
+    """
+
+    def __init__(self, shared_dir=SHARED_DIR, poll_interval=5):
+        self.shared_dir = shared_dir
+        self.poll_interval = poll_interval
+        self.generation = 0
+        self.products_df = None
+        self.search_index = None
+
+    def _path(self, name):
+        return os.path.join(self.shared_dir, name)
+
+    @staticmethod
+    def _search_files(generation):
+        return {name: f'search-{generation}-{name}.npy' for name in ProductSearchIndex.ARRAYS}
+
+    def publish(self, products_df, source=None):
+        """Write `products_df` as a new generation and make it current. Returns the generation."""
+        os.makedirs(self.shared_dir, exist_ok=True)
+        manifest = read_manifest(self.shared_dir)
+        previous = manifest['generation'] if manifest else 0
+        generation = previous + 1
+        file_name = f'catalog-{generation}.arrow'
+
+        table = pa.Table.from_pandas(products_df, preserve_index=False)
+        with replacing(self._path(file_name)) as temp_path:
+            with ipc.new_file(temp_path, table.schema) as writer:
+                writer.write_table(table)
+        search_files = self._search_files(generation)
+        search_index = ProductSearchIndex(products_df['title'].array, products_df['title_tokens'])
+        for name, array in search_index.arrays().items():
+            with replacing(self._path(search_files[name])) as temp_path, open(temp_path, 'wb') as f:
+                np.save(f, array)
+
+        write_manifest(self.shared_dir, {'generation': generation, 'file': file_name, 'search': search_files,
+                                         'rows': table.num_rows, 'published_at': time.time(),
+                                         'source': source})
+        # Keep the previous generation for workers that have not swapped yet
+        remove_files(self.shared_dir, [f'catalog-{previous - 1}.arrow', *self._search_files(previous - 1).values()])
+        return generation
+
+    def attach(self):
+        """Map the current generation if it is newer than the attached one. Returns True if it changed."""
+        manifest = read_manifest(self.shared_dir)
+        if manifest is None or manifest['generation'] == self.generation:
+            return False
+        table = ipc.open_file(pa.memory_map(self._path(manifest['file']), 'r')).read_all()
+        # One block per column, so NumPy columns can be views of the mapped buffers
+        products_df = table.to_pandas(types_mapper=pandas_dtype, split_blocks=True)
+        if 'search' in manifest:
+            search_index = ProductSearchIndex.from_arrays(products_df['title'].array, {
+                name: np.load(self._path(file_name), mmap_mode='r') for name, file_name in manifest['search'].items()})
+        else:
+            # Published before the search index was saved with the catalog
+            search_index = ProductSearchIndex(products_df['title'].array, products_df['title_tokens'])
+        self.products_df, self.search_index = products_df, search_index
+        self.generation = manifest['generation']
+        return True
+
+    def load(self, catalog_path=CATALOG_PATH, source_csv=SOURCE_CSV):
+        """Attach to the published catalog, publishing it first if it is missing or was not published from
+        the current `catalog_path` (or `source_csv`, when the artifact is missing or older than it)."""
+        manifest = read_manifest(self.shared_dir)
+        source = catalog_source(catalog_path, source_csv)
+        fingerprint = source_fingerprint(source) if os.path.exists(source) else None
+        if manifest is None or (fingerprint is not None and manifest.get('source') != fingerprint):
+            self.publish(load_catalog(catalog_path, source_csv), fingerprint)
+        self.attach()
+        return self.products_df
+
+    def watch(self, on_change):
+        """Poll the manifest from a daemon thread and call on_change(products_df, search_index, generation)
+        on new generations."""
+        def check():
+            if self.attach():
+                on_change(self.products_df, self.search_index, self.generation)
+
+        return poll_for_changes('shared-catalog-watcher', self.poll_interval, check, 'attach catalog generation')
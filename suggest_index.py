@@ -0,0 +1,124 @@
+import bisect
+import re
+from functools import lru_cache
+
+import numpy as np
+
+SPACE_RE = re.compile(r'\s+')
+
+
+# Lowercase with single spaces, the form both titles and typed prefixes are compared in.
+# NUL separates the texts of the suggest index, so it is dropped.
+def normalize_query(text):
+    return SPACE_RE.sub(' ', str(text).lower().replace('\0', '')).strip()
+
+
+class PrefixSuggestIndex:
+    """Typeahead completions from sorted keys into the normalized texts, searched with bisect.
+
+    Titles are indexed from the start of each of their words, so "pho"
+    completes "Classic Smart Phone" too. Popular queries are indexed as whole
+    phrases and weigh more than any product. A prefix selects one contiguous
+    range of keys, and the best-weighted distinct entries in it are returned.
+
+    The normalized texts are stored once, UTF-8 encoded in one NUL-separated
+    buffer, and a key is only the offset in it where an indexed word starts:
+    keys compare by the bytes that follow them, and a prefix is compared with
+    just as many of those bytes. Titles are looked up in `titles` for the
+    returned completions only.
+    """
+
+    def __init__(self, titles, weights, popular_queries=None, cache_size=4096):
+        self.titles = titles
+        texts = []
+        rows = []  # Row in `titles` of each product entry
+        entry_weights = []
+        entries_by_text = {}
+
+        for row, (title, weight) in enumerate(zip(titles, weights)):
+            if not isinstance(title, str) or not title.strip():
+                continue
+            normalized = normalize_query(title)
+            entry = entries_by_text.get(normalized)
+            if entry is not None:
+                # Products sharing a title are suggested once, with the best weight
+                entry_weights[entry] = max(entry_weights[entry], weight)
+                continue
+            entries_by_text[normalized] = len(texts)
+            texts.append(normalized)
+            rows.append(row)
+            entry_weights.append(weight)
+
+        self.queries = []
+        if popular_queries:
+            most_searched = max(popular_queries.values())
+            for query, count in popular_queries.items():
+                normalized = normalize_query(query)
+                if not normalized:
+                    continue
+                entry = entries_by_text.get(normalized)
+                if entry is not None:
+                    # A popular query that is also a title promotes the product instead
+                    entry_weights[entry] = max(entry_weights[entry], 1 + count / most_searched)
+                    continue
+                entries_by_text[normalized] = len(texts)
+                texts.append(normalized)
+                self.queries.append(normalized)
+                entry_weights.append(1 + count / most_searched)
+
+        encoded = [text.encode('utf-8') for text in texts]
+        self.buffer = b'\0'.join(encoded) + b'\0'
+        lengths = np.fromiter((len(text) for text in encoded), dtype=np.int64, count=len(encoded))
+        self.text_starts = np.cumsum(lengths + 1) - (lengths + 1)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.entry_weights = np.asarray(entry_weights, dtype=np.float64)
+
+        # Product entries are keyed at each word start, popular queries at their start only
+        data = np.frombuffer(self.buffer, dtype=np.uint8)
+        queries_start = self.text_starts[len(rows)] if self.queries else len(data)
+        previous = np.r_[np.uint8(0), data[:-1]]
+        word_starts = np.flatnonzero((data[:queries_start] != 0) & ((previous[:queries_start] == ord(' '))
+                                                                    | (previous[:queries_start] == 0)))
+        positions = np.concatenate([word_starts, self.text_starts[len(rows):]])
+        ends = (self.text_starts + lengths)[np.searchsorted(self.text_starts, positions, 'right') - 1]
+        # Ordered by the bytes from each key to the end of its text; the sort is stable, so equal
+        # suffixes stay in offset order
+        suffixes = [self.buffer[start:end] for start, end in zip(positions.tolist(), ends.tolist())]
+        order = sorted(range(len(suffixes)), key=suffixes.__getitem__)
+        self.keys = positions[order].astype(np.uint32 if len(data) < 2 ** 32 else np.int64)
+        self.entries = (np.searchsorted(self.text_starts, self.keys, 'right') - 1).astype(np.int32)
+        # Short prefixes select large ranges and are also the most frequent, so results are memoized
+        self.complete = lru_cache(maxsize=cache_size)(self._complete)
+
+    def __len__(self):
+        return len(self.entry_weights)
+
+    def _text(self, entry):
+        if entry < len(self.rows):
+            return {'text': self.titles[self.rows[entry]].strip(), 'kind': 'product'}
+        return {'text': self.queries[entry - len(self.rows)], 'kind': 'query'}
+
+    def _complete(self, prefix, limit=8):
+        """Up to `limit` {'text', 'kind'} completions of a normalized prefix, best weighted first."""
+        prefix = prefix.encode('utf-8')
+
+        def key_start(position):
+            return self.buffer[position:position + len(prefix)]
+
+        start = bisect.bisect_left(self.keys, prefix, key=key_start)
+        end = bisect.bisect_right(self.keys, prefix, start, key=key_start)
+        if start == end:
+            return []
+
+        entries = self.entries[start:end]
+        weights = self.entry_weights[entries]
+        # A title can match through several of its words, so look at a few more keys than needed
+        candidates = np.arange(len(weights))
+        if len(weights) > 4 * limit:
+            candidates = np.argpartition(-weights, 4 * limit - 1)[:4 * limit]
+        ranked = candidates[np.lexsort((entries[candidates], -weights[candidates]))]
+        ranked_entries = list(dict.fromkeys(entries[ranked].tolist()))
+        if len(ranked_entries) < limit < len(set(entries.tolist())):
+            ranked = np.lexsort((entries, -weights))
+            ranked_entries = list(dict.fromkeys(entries[ranked].tolist()))
+        return [self._text(entry) for entry in ranked_entries[:limit]]
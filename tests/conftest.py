@@ -0,0 +1,80 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Two products with clearly different images (drawn from these seeds), and the orders
+# the app reads at startup
+PRODUCTS = {'Red Patterned Mug': 1, 'Blue Patterned Vase': 2}
+ORDERS = [
+    {'order_no': '171-0000001', 'order_status': 'In Transit', 'current_location': 'Kolkata'},
+    {'order_no': '171-0000002', 'order_status': 'Delivered to buyer', 'current_location': 'Delivered'},
+    {'order_no': '171-0000003', 'order_status': 'Shipped', 'current_location': 'Mumbai'},
+]
+
+
+def pattern_image(seed, size=320):
+    """A grayscale image of overlapping rectangles, full of corners for ORB to describe."""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    image = np.full((size, size), 255, dtype=np.uint8)
+    for _ in range(60):
+        x, y = rng.integers(0, size, 2)
+        width, height = rng.integers(8, 64, 2)
+        cv2.rectangle(image, (int(x), int(y)), (int(x + width), int(y + height)), int(rng.integers(0, 220)), -1)
+    return image
+
+
+def write_orders(path, orders):
+    pd.DataFrame(orders).to_excel(path, index=False)
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The app, serving a tiny catalog, its images and an order file from a temporary data directory."""
+    import cv2
+
+    root = tmp_path_factory.mktemp('shop')
+    image_dir = root / 'data' / 'downloaded_images'
+    image_dir.mkdir(parents=True)
+    pd.DataFrame({
+        'asin': [f'B00000000{position}' for position in range(len(PRODUCTS))],
+        'title': list(PRODUCTS),
+        'url': [f'https://example.com/p/{position}' for position in range(len(PRODUCTS))],
+        'initial_price': ['[19.99]'] * len(PRODUCTS),
+        'image_url': [f'https://example.com/img/{position}.jpg' for position in range(len(PRODUCTS))],
+        'rating': [4.5] * len(PRODUCTS),
+        'top_review': ['Great quality'] * len(PRODUCTS),
+        'categories': ['["Home", "Kitchen"]'] * len(PRODUCTS),
+        'availability': ['In Stock'] * len(PRODUCTS),
+    }).to_csv(root / 'data' / 'amazon-products.csv', index=False)
+    # Without a download manifest, a product's image is named after its title
+    for title, seed in PRODUCTS.items():
+        cv2.imwrite(str(image_dir / f"{title.replace(' ', '_')}.jpg"), pattern_image(seed))
+    write_orders(root / 'data' / 'orders_data.xlsx', ORDERS)
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(root)
+        # Load subsystems on first use only, so no warm-up thread races the tests
+        monkeypatch.setenv('WARM_UP', '')
+        monkeypatch.setenv('IMAGE_MATCH_WORKERS', '2')
+        from image_index import ImageDescriptorIndex
+
+        # The app only reads the image index; python image_index.py writes it
+        ImageDescriptorIndex().update()
+        import app
+
+        yield app
+        if app.image_match_pool is not None:
+            app.image_match_pool.shutdown()
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,70 @@
+import os
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+from PIL import Image
+
+from conftest import pattern_image
+from download_images import DERIVATIVE_SIZES, create_session, download_all_images
+
+
+@pytest.fixture
+def image_server():
+    """A local image host: /<seed>.jpg is a pattern image, and /flaky/<seed>.jpg fails twice with a 503 first."""
+    import cv2
+
+    hits = Counter()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] += 1
+            if self.path.startswith('/flaky/') and hits[self.path] <= 2:
+                self.send_response(503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            ok, data = cv2.imencode('.jpg', pattern_image(int(os.path.basename(self.path).split('.')[0]), size=400))
+            assert ok
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data.tobytes())
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}', hits
+    server.shutdown()
+    server.server_close()
+
+
+def test_downloads_retry_skip_unchanged_images_and_write_derivatives(image_server, tmp_path):
+    base_url, hits = image_server
+    products = pd.DataFrame({
+        'asin': ['B000000001', None, 'B000000003', 'B000000004'],
+        'image_url': [f'{base_url}/1.jpg', f'{base_url}/2.jpg', f'{base_url}/flaky/3.jpg', f'{base_url}/1.jpg'],
+    })
+    session = create_session(pool_size=4, backoff=0)
+
+    manifest = download_all_images(products, str(tmp_path), session=session, workers=4)
+
+    # The product without an ASIN is keyed by its row number
+    assert sorted(manifest) == ['1', 'B000000001', 'B000000003', 'B000000004']
+    # A shared URL is fetched once, and a 503 is retried until it succeeds
+    assert hits == {'/1.jpg': 1, '/2.jpg': 1, '/flaky/3.jpg': 3}
+    assert manifest['B000000001'] == manifest['B000000004']
+    for entry in manifest.values():
+        assert Image.open(tmp_path / entry['file']).size == (400, 400)
+        for subdirectory, size in DERIVATIVE_SIZES.items():
+            assert Image.open(tmp_path / subdirectory / entry['file']).size == size
+
+    # Nothing is fetched again while the URLs are unchanged and the files are on disk
+    assert download_all_images(products, str(tmp_path), session=session, workers=4) == manifest
+    assert sum(hits.values()) == 5
@@ -0,0 +1,107 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from conftest import PRODUCTS, pattern_image
+from image_index import ImageDescriptorIndex
+
+
+def encode_jpeg(image):
+    import cv2
+
+    ok, data = cv2.imencode('.jpg', image)
+    assert ok
+    return data.tobytes()
+
+
+def upload(client, data):
+    return client.post('/api/image-search', data={'image': (BytesIO(data), 'query.jpg')},
+                       content_type='multipart/form-data')
+
+
+def search_in_parallel(app_module, uploads, titles):
+    def search(title):
+        # One client per thread; the uploads are decoded in memory, never through a shared file
+        return upload(app_module.app.test_client(), uploads[title])
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        return list(executor.map(search, titles))
+
+
+def count_index_loads():
+    """Run in a match worker: count the reloads of its index from now on, and return (pid, reloads so far)."""
+    import image_matcher
+
+    index = image_matcher._worker_index
+    if 'load' not in vars(index):
+        load = index.load
+
+        def counted_load():
+            index.reloads += 1
+            load()
+
+        index.reloads = 0
+        index.load = counted_load
+    # Stay busy for a moment, so the other workers pick up the calls submitted with this one
+    time.sleep(0.1)
+    return os.getpid(), index.reloads
+
+
+def worker_reloads(pool):
+    """{pid: reloads} of every match worker."""
+    reloads = {}
+    for _ in range(50):
+        futures = [pool.executor.submit(count_index_loads) for _ in range(pool.workers)]
+        reloads.update(future.result() for future in futures)
+        if len(reloads) == pool.workers:
+            return reloads
+    raise AssertionError(f"only {len(reloads)} of {pool.workers} match workers answered")
+
+
+def test_parallel_uploads_each_match_their_own_image(app_module):
+    uploads = {title: encode_jpeg(pattern_image(seed)) for title, seed in PRODUCTS.items()}
+    titles = list(PRODUCTS) * 8
+    responses = search_in_parallel(app_module, uploads, titles)
+
+    for title, response in zip(titles, responses):
+        assert response.status_code == 200
+        assert response.get_json()['search_results'][0]['title'] == title
+
+
+def test_invalid_upload_is_rejected(client):
+    assert upload(client, b'not an image').status_code == 400
+
+
+def test_oversized_upload_is_rejected(app_module, client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'IMAGE_MAX_PIXELS', 100)
+    response = upload(client, encode_jpeg(pattern_image(1)))
+    assert response.status_code == 413
+
+
+def test_rebuilt_index_is_matched_after_one_reload_per_worker(app_module, client):
+    import cv2
+
+    pool = app_module.image_match_pool
+    assert upload(client, encode_jpeg(pattern_image(PRODUCTS['Blue Patterned Vase']))).status_code == 200
+    assert set(worker_reloads(pool).values()) == {0}
+
+    image_path = os.path.join('data', 'downloaded_images', 'Blue_Patterned_Vase.jpg')
+    cv2.imwrite(image_path, pattern_image(3))
+    try:
+        ImageDescriptorIndex().update()
+        # What the app's image index watcher does on its next poll
+        app_module.reload_image_index()
+
+        responses = search_in_parallel(app_module, {'Blue Patterned Vase': encode_jpeg(pattern_image(3))},
+                                       ['Blue Patterned Vase'] * 8)
+        for response in responses:
+            assert response.status_code == 200
+            assert response.get_json()['search_results'][0]['title'] == 'Blue Patterned Vase'
+        # A worker reloads on its first shard of the new generation and never again
+        # (one that got no shard of these searches has not reloaded yet)
+        assert max(worker_reloads(pool).values()) == 1
+    finally:
+        cv2.imwrite(image_path, pattern_image(PRODUCTS['Blue Patterned Vase']))
+        ImageDescriptorIndex().update()
+        app_module.reload_image_index()
@@ -0,0 +1,58 @@
+import json
+import time
+
+from conftest import ORDERS, write_orders
+from order_store import OrderStore
+
+
+def test_batch_returns_found_and_missing_orders(client):
+    response = client.post('/api/order-status/batch',
+                           json={'orderNos': ['171-0000001', 'no-such-order', '171-0000003']})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert sorted(body['orders']) == ['171-0000001', '171-0000003']
+    assert body['orders']['171-0000001']['current_location'] == 'Kolkata'
+    assert body['missing'] == ['no-such-order']
+
+
+def test_batch_requires_a_list(client):
+    assert client.post('/api/order-status/batch', json={'orderNos': '171-0000001'}).status_code == 400
+
+
+def test_batch_rejects_more_than_max_batch_orders(app_module, client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'MAX_BATCH_ORDERS', 2)
+    response = client.post('/api/order-status/batch', json={'orderNos': [order['order_no'] for order in ORDERS]})
+    assert response.status_code == 400
+
+
+def test_stream_pushes_updates_when_the_order_file_changes(app_module, client, monkeypatch, tmp_path):
+    # Load the app's order store first, so the endpoint does not replace the one swapped in below
+    app_module.subsystems['orders'].ensure()
+    source = tmp_path / 'orders.xlsx'
+    write_orders(source, ORDERS)
+    store = OrderStore(str(source), str(tmp_path / 'cache'), poll_interval=0.1)
+    store.watch()
+    monkeypatch.setattr(app_module, 'order_store', store)
+    monkeypatch.setitem(app_module.app.config, 'ORDER_STREAM_KEEPALIVE', 1)
+
+    response = client.get('/api/order-status/stream', query_string={'orderNo': '171-0000001,171-0000002'},
+                          buffered=False)
+    try:
+        chunks = iter(response.response)
+        snapshot = next(chunks).decode()
+        assert snapshot.startswith('event: snapshot')
+        assert json.loads(snapshot.split('data: ', 1)[1])['orders']['171-0000001']['current_location'] == 'Kolkata'
+
+        write_orders(source, [dict(ORDERS[0], current_location='Mumbai')] + ORDERS[1:])
+        deadline = time.monotonic() + 10
+        for chunk in chunks:
+            chunk = chunk.decode()
+            if chunk.startswith('event: order-update'):
+                break
+            assert time.monotonic() < deadline, "no order-update after the order file changed"
+
+        update = json.loads(chunk.split('data: ', 1)[1])
+        assert update['order_no'] == '171-0000001'
+        assert update['order']['current_location'] == 'Mumbai'
+    finally:
+        response.close()
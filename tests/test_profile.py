@@ -0,0 +1,21 @@
+from profiler import RequestProfiler
+
+
+def test_reports_are_disabled_without_a_token(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, 'profiler', RequestProfiler(sample_rate=1.0))
+    client.get('/api/ready')
+    assert client.get('/api/debug/profile').status_code == 404
+
+
+def test_profiled_requests_are_reported_to_the_token_holder(app_module, client, monkeypatch):
+    profiler = RequestProfiler(token='secret')
+    monkeypatch.setattr(app_module, 'profiler', profiler)
+
+    assert client.get('/api/order-status/batch', headers={'X-Profile': 'secret'}).status_code == 405
+    client.get('/api/ready', headers={'X-Profile': 'secret'})
+    assert not profiler.busy.locked()
+
+    assert client.get('/api/debug/profile').status_code == 403
+    response = client.get('/api/debug/profile', headers={'X-Profile': 'secret'})
+    assert response.status_code == 200
+    assert response.get_json()['endpoints']['/api/ready'] == 1
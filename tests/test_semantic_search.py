@@ -0,0 +1,60 @@
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from conftest import PRODUCTS
+from semantic_index import SemanticIndex
+
+
+class StubEncoder:
+    """Bag-of-words embeddings standing in for the transformers model, counting how often it is loaded."""
+
+    loads = 0
+
+    def __init__(self, model_name):
+        StubEncoder.loads += 1
+        # A slow model load, so concurrent first queries overlap it
+        time.sleep(0.2)
+
+    def encode(self, texts, batch_size=64):
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for position, text in enumerate(texts):
+            for word in str(text).lower().split():
+                vectors[position, zlib.crc32(word.encode('utf-8')) % 64] += 1
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-9)
+
+
+def build_index(index_dir, titles):
+    SemanticIndex(str(index_dir), encoder_class=StubEncoder).build(titles)
+    StubEncoder.loads = 0
+    return SemanticIndex(str(index_dir), encoder_class=StubEncoder)
+
+
+def test_concurrent_first_queries_load_the_encoder_once(tmp_path):
+    index = build_index(tmp_path, list(PRODUCTS))
+    queries = ['red mug', 'blue vase'] * 4
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda query: index.search(query, 1), queries))
+
+    assert StubEncoder.loads == 1
+    assert [result[0][0] for result in results] == [0, 1] * 4
+
+
+def test_hybrid_search_loads_the_semantic_subsystem(app_module, client, monkeypatch, tmp_path):
+    app_module.subsystems['catalog'].ensure()
+    index = build_index(tmp_path, app_module.catalog.products_df['title'])
+    monkeypatch.setattr(app_module, 'semantic_index', index)
+    monkeypatch.setattr(app_module, 'catalog', app_module.catalog._replace(semantic_ready=True))
+    monkeypatch.setattr(app_module.subsystems['semantic'], 'state', 'cold')
+
+    response = client.get('/api/search', query_string={'query': 'patterned vase', 'ranker': 'hybrid'})
+    assert response.status_code == 200
+    top = response.get_json()['search_results'][0]
+    assert top['title'] == 'Blue Patterned Vase'
+    assert 'relevance_score' in top
+    assert app_module.subsystems.is_warm('semantic')
+    assert StubEncoder.loads == 1
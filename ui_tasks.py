@@ -0,0 +1,99 @@
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) timeouts for calls to the backend
+REQUEST_TIMEOUT = (5, 30)
+
+
+# One pooled HTTP session shared by every request the client makes
+def create_session(pool_size=8):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class ETagCache:
+    """Last response per GET URL, revalidated with If-None-Match.
+
+    When the backend answers 304 Not Modified, the stored response is
+    returned instead, so an unchanged result is not downloaded again.
+    """
+
+    def __init__(self, session, max_items=64):
+        self.session = session
+        self.max_items = max_items
+        self.responses = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, **kwargs):
+        key = requests.Request('GET', url, params=params).prepare().url
+        with self.lock:
+            cached = self.responses.get(key)
+        headers = {'If-None-Match': cached.headers['ETag']} if cached is not None else {}
+        response = self.session.get(url, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            return cached
+        if 'ETag' in response.headers:
+            with self.lock:
+                self.responses[key] = response
+                self.responses.move_to_end(key)
+                while len(self.responses) > self.max_items:
+                    self.responses.popitem(last=False)
+        return response
+
+
+class TaskRunner:
+    """Runs blocking work (HTTP calls, speech recognition) on worker threads.
+
+    Results are put on a queue that the Tk main loop drains with root.after, so
+    callbacks always run on the UI thread and the window keeps repainting while
+    calls are in flight. Tasks submitted on the same channel supersede each
+    other: when a newer one is submitted, the older result is dropped.
+    """
+
+    def __init__(self, root, workers=8, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.results = queue.Queue()
+        self.generations = {}
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, work, on_success, on_error=None, channel=None):
+        """Run work() off the UI thread, then on_success(result) or on_error(exception) on it."""
+        generation = None
+        if channel is not None:
+            generation = self.generations.get(channel, 0) + 1
+            self.generations[channel] = generation
+        return self.executor.submit(self._run, work, on_success, on_error, channel, generation)
+
+    def cancel(self, channel):
+        """Drop the result of whatever is still running on `channel`."""
+        self.generations[channel] = self.generations.get(channel, 0) + 1
+
+    def _run(self, work, on_success, on_error, channel, generation):
+        try:
+            self.results.put((on_success, work(), channel, generation))
+        except Exception as e:
+            self.results.put((on_error, e, channel, generation))
+
+    def _poll(self):
+        while True:
+            try:
+                callback, value, channel, generation = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if channel is not None and self.generations.get(channel) != generation:
+                continue  # Superseded by a newer task on the same channel
+            if callback is not None:
+                callback(value)
+            elif isinstance(value, Exception):
+                print(f"Background task failed: {value}")
+        self.root.after(self.poll_ms, self._poll)
@@ -0,0 +1,98 @@
+import contextlib
+import functools
+import threading
+import time
+
+
+class Subsystem:
+    """A part of the app that is loaded once, on first use or by the warm-up thread."""
+
+    def __init__(self, name, load):
+        self.name = name
+        self.load = load
+        self.lock = threading.Lock()
+        self.state = 'cold'
+        self.error = None
+        self.load_seconds = None
+
+    @property
+    def warm(self):
+        return self.state == 'warm'
+
+    def ensure(self):
+        """Load the subsystem unless it is warm; concurrent callers wait for the same load."""
+        if self.warm:
+            return
+        with self.lock:
+            if self.warm:
+                return
+            self.state = 'loading'
+            start = time.perf_counter()
+            try:
+                self.load()
+            except Exception as e:
+                # A later call retries, e.g. once a missing artifact has been built
+                self.state = 'failed'
+                self.error = str(e)
+                raise
+            self.load_seconds = time.perf_counter() - start
+            self.state = 'warm'
+            self.error = None
+
+    def status(self):
+        return {'state': self.state, 'load_seconds': self.load_seconds, 'error': self.error}
+
+
+class Subsystems:
+    """The lazily loaded parts of the app, in the order they were registered.
+
+    Routes declare what they need with @subsystems.require(...), so a worker
+    that only serves order status never loads the catalog or the image index.
+    warm_up() loads subsystems ahead of the first request from a daemon
+    thread. `span(name)`, when given, times the loads done on behalf of a
+    request, e.g. as a stage of the request's metrics.
+    """
+
+    def __init__(self, span=None):
+        self.subsystems = {}
+        self.span = span
+
+    def register(self, name, load):
+        self.subsystems[name] = Subsystem(name, load)
+        return self.subsystems[name]
+
+    def __getitem__(self, name):
+        return self.subsystems[name]
+
+    def is_warm(self, name):
+        return self.subsystems[name].warm
+
+    def require(self, *names):
+        """Decorator that loads the named subsystems before the wrapped function runs."""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                for name in names:
+                    subsystem = self.subsystems[name]
+                    if not subsystem.warm:
+                        with self.span(f'load_{name}') if self.span else contextlib.nullcontext():
+                            subsystem.ensure()
+                return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def warm_up(self, names):
+        """Load `names` one after the other from a daemon thread."""
+        def load_all():
+            for name in names:
+                try:
+                    self.subsystems[name].ensure()
+                except Exception as e:
+                    print(f"Failed to warm up {name}: {e}")
+
+        thread = threading.Thread(target=load_all, name='warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        return {name: subsystem.status() for name, subsystem in self.subsystems.items()}